@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Measure attribute write throughput of classes with annotated attributes,
+with and without typesafety checking the assignments.
+'''
+
+import argparse
+import os.path
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from typesafety.attributes import decorate_attributes  # noqa: E402
+
+
+def make_classes():
+    class Plain(object):
+        count: int
+        name: str
+
+    class Slotted(object):
+        __slots__ = ('count', 'name')
+        count: int
+        name: str
+
+    return Plain, Slotted
+
+
+def measure(label, cls, number):
+    obj = cls()
+
+    def write():
+        obj.count = 1
+        obj.name = 'a'
+
+    seconds = min(timeit.repeat(write, number=number, repeat=5))
+    print('{:<30} {:>12,.0f} writes/s'.format(label, 2 * number / seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--number', type=int, default=500000)
+    args = parser.parse_args()
+
+    plain, slotted = make_classes()
+    checked_plain, checked_slotted = make_classes()
+    decorate_attributes(checked_plain)
+    decorate_attributes(checked_slotted)
+
+    measure('plain unchecked', plain, args.number)
+    measure('plain checked', checked_plain, args.number)
+    measure('__slots__ unchecked', slotted, args.number)
+    measure('__slots__ checked', checked_slotted, args.number)
+
+
+if __name__ == '__main__':
+    main()
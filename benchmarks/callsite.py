@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Measure what recording the call stack of violations costs: passing calls
+with and without it, failing calls at several depths, and the calls
+queued by the shadow checker.
+'''
+
+import argparse
+import os.path
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from typesafety.shadow import ShadowChecker  # noqa: E402
+from typesafety.validator import TypesafetyError, Validator  # noqa: E402
+
+
+def function(value: int, name: str = 'name') -> int:
+    return value
+
+
+def make_validator(depth):
+    return type('Depth{}Validator'.format(depth), (Validator,), {'CALL_STACK_DEPTH': depth})
+
+
+def measure(label, call, number):
+    elapsed = min(timeit.repeat(call, number=number, repeat=5))
+    print('{:<24} {:>8.0f} ns/call'.format(label, elapsed / number * 1e9))
+
+
+def measure_passing(label, func, number):
+    measure(label, lambda: func(1, 'other'), number)
+
+
+def measure_failing(label, func, number):
+    def call():
+        try:
+            func('a', 'other')
+
+        except TypesafetyError:
+            pass
+
+    measure(label, call, number)
+
+
+def measure_shadow(label, depth, number):
+    checker = ShadowChecker(queue_size=number * 5 + 1, call_stack_depth=depth)
+    decorated = checker.decorate(function)
+    measure_passing(label, decorated, number)
+    checker.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--number', type=int, default=100000)
+    args = parser.parse_args()
+
+    for depth in (0, 1):
+        measure_passing('passing, depth {}'.format(depth), make_validator(depth).decorate(function), args.number)
+
+    for depth in (0, 1, 5):
+        measure_failing('failing, depth {}'.format(depth), make_validator(depth).decorate(function), args.number)
+
+    for depth in (0, 1):
+        measure_shadow('shadow queue, depth {}'.format(depth), depth, args.number // 10)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Measure the time to first output of a command line tool importing a
+checked package, without the checker, with the modules decorated on
+import and with them decorated in the background.
+'''
+
+import argparse
+import compileall
+import os
+import os.path
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PACKAGE = 'deferred_benchmark'
+
+TOOL = '''
+import sys
+sys.path[:0] = [{root!r}, {directory!r}]
+import typesafety
+def is_benchmarked(name):
+    return name.startswith({package!r})
+if {mode!r} != 'unchecked':
+    typesafety.activate(filter_func=is_benchmarked, deferred={mode!r} == 'deferred')
+for index in range({modules}):
+    module = __import__('{package}.module_{{}}'.format(index), fromlist=['*'])
+print(module.function_0(1), flush=True)
+'''
+
+
+def write_package(directory, module_count, function_count):
+    package = os.path.join(directory, PACKAGE)
+    os.mkdir(package)
+    with open(os.path.join(package, '__init__.py'), 'w') as init:
+        init.write('')
+
+    for module in range(module_count):
+        with open(os.path.join(package, 'module_{}.py'.format(module)), 'w') as source:
+            source.write('import typing\n\n')
+            for function in range(function_count):
+                source.write(
+                    'def function_{0}(value_{1}_{0}: int, name: typing.Optional[str] = None) -> int:\n'
+                    '    return value_{1}_{0}\n\n'.format(function, module)
+                )
+
+
+def run(directory, module_count, mode):
+    script = TOOL.format(root=ROOT, directory=directory, package=PACKAGE, modules=module_count, mode=mode)
+    start = time.perf_counter()
+    tool = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE)
+    tool.stdout.readline()
+    first_output = time.perf_counter() - start
+    tool.wait()
+    return first_output, time.perf_counter() - start
+
+
+def measure(directory, module_count, mode, repeat):
+    first_output, total = min(run(directory, module_count, mode) for _ in range(repeat))
+    print('{:<12} first output {:>8.1f} ms  exit {:>8.1f} ms'.format(mode, first_output * 1e3, total * 1e3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-m', '--modules', type=int, default=50)
+    parser.add_argument('-f', '--functions', type=int, default=100)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        write_package(directory, args.modules, args.functions)
+        compileall.compile_dir(directory, quiet=1)
+        for mode in ('unchecked', 'eager', 'deferred'):
+            measure(directory, args.modules, mode, args.repeat)
+
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Measure the method call overhead on a class with 50 annotated methods,
+unchecked, checked as plain functions and checked as methods.
+'''
+
+import argparse
+import os.path
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from typesafety.autodecorator import decorate_module  # noqa: E402
+from typesafety.validator import Validator  # noqa: E402
+
+METHOD_COUNT = 50
+
+
+def make_class():
+    namespace = {}
+    source = ''.join(
+        'def method_{0}(self, value: int, scale: int = 1) -> int:\n'
+        '    return value * scale\n'.format(index)
+        for index in range(METHOD_COUNT)
+    )
+    exec(source, namespace)  # pylint: disable=exec-used
+    methods = {name: value for name, value in namespace.items() if name.startswith('method_')}
+    return type('Sample', (object,), methods)
+
+
+def measure(label, cls, number):
+    obj = cls()
+    names = ['method_{}'.format(index) for index in range(METHOD_COUNT)]
+    methods = [getattr(obj, name) for name in names]
+
+    def call_all():
+        for method in methods:
+            method(1)
+
+    def bind_and_call_all():
+        for name in names:
+            getattr(obj, name)(1)
+
+    bound = min(timeit.repeat(call_all, number=number, repeat=5))
+    unbound = min(timeit.repeat(bind_and_call_all, number=number, repeat=5))
+    print('{:<30} {:>8.0f} ns/call {:>8.0f} ns/call with binding'.format(
+        label,
+        bound / number / METHOD_COUNT * 1e9,
+        unbound / number / METHOD_COUNT * 1e9
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    unchecked = make_class()
+    functions = make_class()
+    methods = make_class()
+    decorate_module(functions, decorator=Validator.decorate)
+    decorate_module(methods, decorator=Validator.decorate, method_decorator=Validator.decorate)
+
+    measure('unchecked', unchecked, args.number)
+    measure('checked as functions', functions, args.number)
+    measure('checked as methods', methods, args.number)
+
+
+if __name__ == '__main__':
+    main()
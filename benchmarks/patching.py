@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Compare checking a function by replacing it with a wrapper and by
+patching its code in place: the call overhead and the time it takes to
+decorate many functions.
+'''
+
+import argparse
+import os.path
+import sys
+import time
+import timeit
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from typesafety.patching import copy_function, patch_function  # noqa: E402
+from typesafety.validator import Validator  # noqa: E402
+
+
+def function(value: int, name: str = 'name') -> int:
+    return value
+
+
+def measure_call(label, func, number):
+    def call():
+        func(1, 'other')
+
+    elapsed = min(timeit.repeat(call, number=number, repeat=5))
+    print('{:<20} {:>8.0f} ns/call'.format(label, elapsed / number * 1e9))
+
+
+def measure_decoration(label, decorate, count):
+    functions = [copy_function(function) for _ in range(count)]
+    start = time.perf_counter()
+    for func in functions:
+        decorate(func)
+
+    elapsed = time.perf_counter() - start
+    print('{:<20} {:>8.1f} us/function'.format(label, elapsed / count * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--number', type=int, default=200000)
+    parser.add_argument('-f', '--functions', type=int, default=5000)
+    args = parser.parse_args()
+
+    measure_call('unchecked', function, args.number)
+    measure_call('wrapper', Validator.decorate(copy_function(function)), args.number)
+    patched = patch_function(copy_function(function), decorator=Validator.decorate)
+    assert isinstance(patched, types.FunctionType) and patched.__code__ is not function.__code__
+    measure_call('patched in place', patched, args.number)
+
+    measure_decoration('wrapper', Validator.decorate, args.functions)
+    measure_decoration('patched in place', lambda func: patch_function(func, decorator=Validator.decorate),
+                       args.functions)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Measure the time of importing a checked package in a new process, without
+the plan cache, with an empty cache and with a populated cache.
+'''
+
+import argparse
+import compileall
+import os
+import os.path
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PACKAGE = 'plancache_benchmark'
+
+IMPORTER = '''
+import sys, time
+sys.path[:0] = [{root!r}, {directory!r}]
+import typesafety
+def is_benchmarked(name):
+    return name.startswith({package!r})
+typesafety.activate(filter_func=is_benchmarked, cache_dir={cache_dir!r})
+start = time.perf_counter()
+for index in range({modules}):
+    __import__('{package}.module_{{}}'.format(index))
+print(time.perf_counter() - start)
+'''
+
+
+def write_package(directory, module_count, function_count):
+    package = os.path.join(directory, PACKAGE)
+    os.mkdir(package)
+    with open(os.path.join(package, '__init__.py'), 'w') as init:
+        init.write('')
+
+    for module in range(module_count):
+        with open(os.path.join(package, 'module_{}.py'.format(module)), 'w') as source:
+            source.write('import typing\n\n')
+            for function in range(function_count):
+                # Vary the parameters, so every wrapper has its own code
+                source.write(
+                    'def function_{0}(value_{1}_{0}: int, name: typing.Optional[str] = None) -> int:\n'
+                    '    return value_{1}_{0}\n\n'.format(function, module)
+                )
+
+
+def run(directory, module_count, cache_dir):
+    script = IMPORTER.format(
+        root=ROOT, directory=directory, package=PACKAGE, modules=module_count, cache_dir=cache_dir
+    )
+    return float(subprocess.check_output([sys.executable, '-c', script]))
+
+
+def measure(label, directory, module_count, cache_dir, repeat):
+    times = [run(directory, module_count, cache_dir) for _ in range(repeat)]
+    print('{:<16} {:>8.1f} ms'.format(label, min(times) * 1e3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-m', '--modules', type=int, default=50)
+    parser.add_argument('-f', '--functions', type=int, default=100)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        write_package(directory, args.modules, args.functions)
+        # Keep compiling the package itself out of the measurement
+        compileall.compile_dir(directory, quiet=1)
+        cache_dir = os.path.join(directory, 'cache')
+        measure('no cache', directory, args.modules, None, args.repeat)
+        print('{:<16} {:>8.1f} ms'.format(
+            'cold cache', run(directory, args.modules, cache_dir) * 1e3
+        ))
+        measure('warm cache', directory, args.modules, cache_dir, args.repeat)
+
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
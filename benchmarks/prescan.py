@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Measure the time it takes to decorate a large generated module with few
+annotated definitions, visiting everything and visiting only the
+definitions found by the prescan.
+'''
+
+import argparse
+import importlib.util
+import os.path
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from typesafety.autodecorator import decorate_module  # noqa: E402
+from typesafety.prescan import get_index  # noqa: E402
+from typesafety.validator import Validator  # noqa: E402
+
+
+def write_module(directory, class_count, method_count, annotated_every):
+    filename = os.path.join(directory, 'prescan_benchmark.py')
+    with open(filename, 'w') as source:
+        for cls in range(class_count):
+            source.write('class Class_{}(object):\n'.format(cls))
+            for method in range(method_count):
+                if (cls * method_count + method) % annotated_every == 0:
+                    source.write('    def method_{}(self, value: int) -> int:\n'.format(method))
+
+                else:
+                    source.write('    def method_{}(self, value):\n'.format(method))
+
+                source.write('        return value\n\n')
+
+    return filename
+
+
+def load_module(filename):
+    spec = importlib.util.spec_from_file_location('prescan_benchmark', filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(label, filename, use_index):
+    module = load_module(filename)
+    start = time.perf_counter()
+    index = get_index(module) if use_index else None
+    decorate_module(module, decorator=Validator.decorate, index=index)
+    elapsed = time.perf_counter() - start
+    print('{:<20} {:>8.1f} ms'.format(label, elapsed * 1e3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-c', '--classes', type=int, default=200)
+    parser.add_argument('-m', '--methods', type=int, default=50)
+    parser.add_argument('-a', '--annotated-every', type=int, default=100)
+    args = parser.parse_args()
+
+    # The index is cached next to the bytecode
+    sys.dont_write_bytecode = False
+    directory = tempfile.mkdtemp()
+    try:
+        filename = write_module(directory, args.classes, args.methods, args.annotated_every)
+        measure('full walk', filename, use_index=False)
+        measure('prescan, cold', filename, use_index=True)
+        measure('prescan, cached', filename, use_index=True)
+
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Measure how many NamedTuple and dataclass records can be constructed per
+second with and without typesafety checking the fields.
+'''
+
+import argparse
+import dataclasses
+import os.path
+import sys
+import timeit
+import typing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from typesafety.autodecorator import decorate_module  # noqa: E402
+from typesafety.validator import Validator  # noqa: E402
+
+
+def make_record_types():
+    class Point(typing.NamedTuple):
+        x: int
+        y: int
+        label: str = ''
+
+    @dataclasses.dataclass
+    class Sample(object):
+        name: str
+        value: float
+        count: int = 0
+
+    return Point, Sample
+
+
+def measure(label, factory, number):
+    seconds = min(timeit.repeat(factory, number=number, repeat=5))
+    print('{:<30} {:>12,.0f} records/s'.format(label, number / seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--number', type=int, default=200000)
+    args = parser.parse_args()
+
+    point, sample = make_record_types()
+    checked_point, checked_sample = make_record_types()
+    decorate_module(checked_point, decorator=Validator.decorate)
+    decorate_module(checked_sample, decorator=Validator.decorate)
+
+    measure('NamedTuple unchecked', lambda: point(1, 2, 'a'), args.number)
+    measure('NamedTuple checked', lambda: checked_point(1, 2, 'a'), args.number)
+    measure('dataclass unchecked', lambda: sample('a', 1.0, 2), args.number)
+    measure('dataclass checked', lambda: checked_sample('a', 1.0, 2), args.number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Measure the time it takes to decorate a set of modules whose classes are
+also reachable from the classes of a facade module, with each module
+tracking its own visited classes and with them shared by all modules.
+'''
+
+import argparse
+import os.path
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from typesafety.autodecorator import decorate_module, VisitedSet  # noqa: E402
+from typesafety.validator import Validator  # noqa: E402
+
+
+def make_module(name, namespace, source):
+    module = types.ModuleType(name)
+    vars(module).update(namespace)
+    exec(source, vars(module))  # pylint: disable=exec-used
+    return module
+
+
+def make_modules(module_count, class_count, method_count):
+    # Like most code, only some of the methods are annotated
+    methods = ''.join(
+        '    def method_{0}(self, value: int, name: typing.Optional[str] = None) -> int:\n'
+        '        return value\n'
+        '    def helper_{0}(self, value, name=None):\n'
+        '        return value\n'.format(index)
+        for index in range(method_count)
+    )
+    modules = [
+        make_module('module_{}'.format(module), {'__name__': 'module_{}'.format(module)}, 'import typing\n' + ''.join(
+            'class Class_{}(object):\n{}'.format(index, methods) for index in range(class_count)
+        ))
+        for module in range(module_count)
+    ]
+
+    # The facade exposes every class of the other modules as a class
+    # attribute of its own namespaces
+    namespace = {'module_{}'.format(index): module for index, module in enumerate(modules)}
+    facade = make_module('facade', namespace, ''.join(
+        'class Api_{0}(object):\n{1}'.format(module, ''.join(
+            '    Class_{1} = module_{0}.Class_{1}\n'.format(module, index) for index in range(class_count)
+        ))
+        for module in range(module_count)
+    ))
+    return modules + [facade]
+
+
+def decorate(modules, visited):
+    start = time.perf_counter()
+    for module in modules:
+        decorate_module(module, decorator=Validator.decorate, method_decorator=Validator.decorate, visited=visited)
+
+    return time.perf_counter() - start
+
+
+def measure(label, modules, shared):
+    visited = VisitedSet() if shared else None
+    elapsed = decorate(modules[:-1], visited)
+    facade = decorate(modules[-1:], visited)
+    skipped = ' ({} classes skipped)'.format(visited.skipped_classes) if shared else ''
+    print('{:<12} modules {:>8.1f} ms  facade {:>8.1f} ms{}'.format(label, elapsed * 1e3, facade * 1e3, skipped))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-m', '--modules', type=int, default=20)
+    parser.add_argument('-c', '--classes', type=int, default=20)
+    parser.add_argument('-f', '--methods', type=int, default=10)
+    args = parser.parse_args()
+
+    measure('per module', make_modules(args.modules, args.classes, args.methods), shared=False)
+    measure('shared', make_modules(args.modules, args.classes, args.methods), shared=True)
+
+
+if __name__ == '__main__':
+    main()
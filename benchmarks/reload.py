@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Measure the time it takes to decorate a large module again after one of
+its functions was edited and the module reloaded, decorating every
+function again and reusing the unchanged ones.
+'''
+
+import argparse
+import importlib.util
+import os
+import os.path
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from typesafety.autodecorator import ModuleDecorator, decorate_module  # noqa: E402
+from typesafety.options import DecorationOptions  # noqa: E402
+from typesafety.validator import Validator  # noqa: E402
+
+
+def write_module(filename, function_count, version):
+    with open(filename, 'w') as source:
+        source.write('import typing\n\n')
+        for function in range(function_count):
+            source.write(
+                'def function_{0}(value_{0}: int, name: typing.Optional[str] = None) -> int:\n'
+                '    return value_{0}\n\n'.format(function)
+            )
+
+        # Only the last function changes, so the others keep their lines
+        source.write('def edited(value: int) -> int:\n    return value + {}\n'.format(version))
+
+    os.utime(filename, ns=(version, version))
+
+
+def measure(label, filename, function_count, reuse):
+    write_module(filename, function_count, 0)
+    spec = importlib.util.spec_from_file_location('reload_benchmark', filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module_decorator = ModuleDecorator(DecorationOptions(Validator.decorate))
+    module_decorator.decorate(module)
+
+    write_module(filename, function_count, 1)
+    spec.loader.exec_module(module)
+    start = time.perf_counter()
+    decorate_module(module, decorator=Validator.decorate, previous=module_decorator.decorations if reuse else None)
+    elapsed = time.perf_counter() - start
+    print('{:<20} {:>8.1f} ms'.format(label, elapsed * 1e3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-f', '--functions', type=int, default=2000)
+    args = parser.parse_args()
+
+    sys.dont_write_bytecode = True
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, 'reload_benchmark.py')
+        measure('decorate again', filename, args.functions, reuse=False)
+        measure('reuse unchanged', filename, args.functions, reuse=True)
+
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
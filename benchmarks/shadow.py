@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Measure the per-call latency distribution of a function checked in the
+caller and checked in the background by the shadow checker.
+'''
+
+import argparse
+import collections.abc
+import os.path
+import sys
+import time
+import typing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from typesafety.shadow import ShadowChecker  # noqa: E402
+from typesafety.validator import Validator  # noqa: E402
+
+
+def handler(
+        request: collections.abc.Mapping,
+        body: collections.abc.Sequence,
+        user: typing.Optional[str] = None
+) -> collections.abc.Mapping:
+    return request
+
+
+def measure(label, func, number, pause):
+    request = {'path': '/'}
+    body = [1, 2, 3]
+    clock = time.perf_counter_ns
+    samples = []
+    scheduled = clock()
+    for _ in range(number):
+        if pause:
+            # Spins instead of sleeping to keep the GIL, and measures from
+            # when the call was due, so waiting for the GIL counts as well
+            scheduled += pause
+            while clock() < scheduled:
+                pass
+
+        else:
+            scheduled = clock()
+
+        func(request, body, user='user')
+        samples.append(clock() - scheduled)
+
+    samples.sort()
+    print('{:<12} p50 {:>6} ns  p99 {:>6} ns  p99.9 {:>6} ns'.format(
+        label,
+        samples[number // 2],
+        samples[number * 99 // 100],
+        samples[number * 999 // 1000]
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--number', type=int, default=200000)
+    parser.add_argument('-q', '--queue-size', type=int, default=10000)
+    parser.add_argument('-b', '--batch-size', type=int, default=16)
+    parser.add_argument('-p', '--pause', type=int, default=0, help='nanoseconds between the calls')
+    args = parser.parse_args()
+
+    measure('unchecked', handler, args.number, args.pause)
+    measure('checked', Validator.decorate(handler), args.number, args.pause)
+
+    checker = ShadowChecker(queue_size=args.queue_size, batch_size=args.batch_size)
+    checker.start()
+    measure('shadow', checker.decorate(handler), args.number, args.pause)
+    checker.stop()
+    print('shadow checked {} calls, dropped {}'.format(checker.checked, checker.dropped))
+
+
+if __name__ == '__main__':
+    main()
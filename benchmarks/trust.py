@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Measure the call overhead of a function annotated with abstract base
+classes and unions, checked in full and with adaptive type trust.
+'''
+
+import argparse
+import collections.abc
+import os.path
+import sys
+import timeit
+import typing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from typesafety.validator import Validator  # noqa: E402
+
+
+class TrustingValidator(Validator):
+    TRUST_THRESHOLD = 8
+
+
+def function(
+        items: collections.abc.Sequence,
+        options: typing.Optional[collections.abc.Mapping]
+) -> typing.Union[int, float, str, bytes]:
+    return len(items)
+
+
+def measure(label, func, number):
+    items = [1, 2, 3]
+    options = {}
+
+    def call():
+        func(items, options)
+
+    elapsed = min(timeit.repeat(call, number=number, repeat=5))
+    print('{:<20} {:>8.0f} ns/call'.format(label, elapsed / number * 1e9))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--number', type=int, default=200000)
+    args = parser.parse_args()
+
+    measure('unchecked', function, args.number)
+    measure('checked', Validator.decorate(function), args.number)
+    measure('trusted', TrustingValidator.decorate(function), args.number)
+
+
+if __name__ == '__main__':
+    main()
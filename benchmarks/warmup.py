@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Measure the first request latency and the private memory of forked
+workers, without and with warming up the validators in the master.
+'''
+
+import argparse
+import gc
+import os
+import os.path
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import typesafety  # noqa: E402
+
+PACKAGE = 'warmup_benchmark'
+
+
+def write_package(directory, module_count, function_count):
+    package = os.path.join(directory, PACKAGE)
+    os.mkdir(package)
+    with open(os.path.join(package, '__init__.py'), 'w') as init:
+        init.write('')
+
+    for module in range(module_count):
+        with open(os.path.join(package, 'module_{}.py'.format(module)), 'w') as source:
+            source.write('from __future__ import annotations\nimport typing\n\n')
+            for function in range(function_count):
+                source.write(
+                    'def function_{}(value: int, name: typing.Optional[str] = None) -> int:\n'
+                    '    return value\n\n'.format(function)
+                )
+
+
+def get_private_memory():
+    # Pages written by this process only, shared pages are not counted
+    with open('/proc/self/smaps_rollup') as smaps:
+        return sum(
+            int(line.split()[1])
+            for line in smaps
+            if line.startswith(('Private_Dirty:', 'Private_Clean:'))
+        )
+
+
+def handle_request(functions):
+    for function in functions:
+        function(1)
+
+
+def measure_worker(label, functions):
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        start = time.perf_counter()
+        handle_request(functions)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        handle_request(functions)
+        second = time.perf_counter() - start
+        gc.collect()
+        os.write(write_end, '{} {} {}'.format(first, second, get_private_memory()).encode())
+        os._exit(0)  # pylint: disable=protected-access
+
+    os.close(write_end)
+    with os.fdopen(read_end) as result:
+        first, second, memory = result.read().split()
+
+    os.waitpid(pid, 0)
+    print('{:<16} first request {:>8.1f} ms  next request {:>6.1f} ms  private memory {:>7} kB'.format(
+        label, float(first) * 1e3, float(second) * 1e3, memory
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-m', '--modules', type=int, default=50)
+    parser.add_argument('-f', '--functions', type=int, default=100)
+    parser.add_argument('--no-freeze', dest='freeze', action='store_false')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        write_package(directory, args.modules, args.functions)
+        sys.path.insert(0, directory)
+        typesafety.activate(filter_func=lambda name: name.startswith(PACKAGE))
+
+        modules = [
+            __import__('{}.module_{}'.format(PACKAGE, index), fromlist=['*'])
+            for index in range(args.modules)
+        ]
+        functions = [
+            getattr(module, 'function_{}'.format(index))
+            for module in modules
+            for index in range(args.functions)
+        ]
+
+        measure_worker('cold workers', functions)
+        count = typesafety.warmup([PACKAGE], freeze=args.freeze)
+        measure_worker('warm workers', functions)
+        print('{} validators prepared'.format(count))
+
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -49,9 +49,7 @@ are valid.
         'Operating System :: OS Independent',
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.8',
         'Topic :: Software Development',
         'Topic :: Software Development :: Testing',
         'Topic :: Documentation :: Sphinx',
@@ -59,6 +57,7 @@ are valid.
     zip_safe=True,
     use_2to3=False,
     packages=['typesafety'],
+    python_requires='>=3.8',
     entry_points={
         'nose.plugins.0.10': [
             'typesafety = typesafety.noseplugin:TypesafetyPlugin'
@@ -26,16 +26,35 @@ any of the annotations does not conform to this rule the annotation
 will be ignored.
 '''
 
+import functools
+import os
+import threading
+import warnings
+
 from .validator import Validator, TypesafetyError
 from .finder import ModuleFinder
+from .options import DecorationOptions, Options
+from .attributes import decorate_attributes
+from .context import checking
+from .shadow import ShadowChecker
+from .aggregate import ViolationReport
+from .warmup import warmup
+
+# Encoded activation options inherited by child processes, see
+# activate_from_environment()
+CONFIGURATION_VARIABLE = 'TYPESAFETY_CONFIGURATION'
 
 
 class Typesafety(object):
     '''
     Singleton class for managing the type safety checker.
+
+    Activation and deactivation may be called from any thread, they are
+    serialized by a lock. Checked calls never take it.
     '''
 
     __instance = None
+    __instance_lock = threading.Lock()
 
     @classmethod
     def instance(cls):
@@ -44,12 +63,17 @@ class Typesafety(object):
         '''
 
         if cls.__instance is None:
-            cls.__instance = cls()
+            with cls.__instance_lock:
+                if cls.__instance is None:
+                    cls.__instance = cls()
 
         return cls.__instance
 
     def __init__(self):
+        self.__lock = threading.RLock()
         self.__module_finder = None
+        self.__shadow_checker = None
+        self.__report = None
 
     @property
     def active(self):
@@ -59,19 +83,109 @@ class Typesafety(object):
 
         return self.__module_finder is not None
 
-    def activate(self, *, filter_func=None):
+    @property
+    def shadow_checker(self):
+        '''
+        The :class:`typesafety.shadow.ShadowChecker` checking the calls in
+        the shadow mode, or None.
+        '''
+
+        return self.__shadow_checker
+
+    @property
+    def visited(self):
+        '''
+        The :class:`typesafety.autodecorator.VisitedSet` of the classes and
+        functions decorated since the activation, or None if inactive.
+        '''
+
+        if self.__module_finder is None:
+            return None
+
+        return self.__module_finder.visited
+
+    @property
+    def report(self):
+        '''
+        The :class:`typesafety.aggregate.ViolationReport` collecting the
+        violations of this process and its children, or None.
+        '''
+
+        return self.__report
+
+    def activate(self, options=None, **kwargs):
         '''
         Activate the type safety checker. After the call all functions
         that need to be checked will be.
+
+        The options are given either as an :class:`typesafety.options.Options`
+        in `options` or as its fields in keyword arguments, which override
+        the ones in `options`.
+
+        If a violation report is collected, the options are stored in the
+        environment, so child processes started with the spawn method can
+        activate the checker with the same options by calling
+        :func:`activate_from_environment`, for example as the initializer of
+        a `multiprocessing.Pool`, and add their violations to the report.
+        The `filter_func` has to be a module level function for that, see
+        :meth:`typesafety.options.Options.encode`. Forked child processes
+        inherit the active checker.
         '''
 
-        if self.active:
-            raise RuntimeError("Type safety check already active")
+        options = Options(**kwargs) if options is None else options._replace(**kwargs)
+        if options.report_path is not None and not options.shadow:
+            raise ValueError("Violation reports need the shadow mode")
+
+        with self.__lock:
+            if self.active:
+                raise RuntimeError("Type safety check already active")
+
+            if options.report_path is not None:
+                self.__export_options(options)
+
+            self.__module_finder = ModuleFinder(self.__get_decoration_options(options))
+            if options.filter_func is not None:
+                self.__module_finder.set_filter(options.filter_func)
+            self.__module_finder.install()
+
+    def __get_decoration_options(self, options):
+        if options.shadow:
+            decorator = self.__start_shadow_checker(options)
+            property_decorator = None
+
+        else:
+            decorator = functools.partial(
+                Validator.decorate,
+                boundary_only=options.boundary_only,
+                enabled=options.enabled
+            )
+            property_decorator = functools.partial(Validator.decorate_property, enabled=options.enabled)
 
-        self.__module_finder = ModuleFinder(Validator.decorate)
-        if filter_func is not None:
-            self.__module_finder.set_filter(filter_func)
-        self.__module_finder.install()
+        return DecorationOptions(
+            decorator,
+            class_decorator=decorate_attributes if options.check_attributes else None,
+            method_decorator=decorator,
+            property_decorator=property_decorator,
+            public_only=options.public_only,
+            in_place=options.in_place,
+            cache_dir=options.cache_dir,
+            prescan=options.prescan,
+            deferred=options.deferred
+        )
+
+    def __start_shadow_checker(self, options):
+        # Returns the decorator queueing the calls for the shadow checker
+        on_violation = None
+        if options.report_path is not None:
+            self.__report = ViolationReport(options.report_path)
+            on_violation = self.__report.record
+
+        self.__shadow_checker = ShadowChecker(on_violation=on_violation, call_stack_depth=options.call_stack_depth)
+        if self.__report is not None:
+            self.__report.attach(self.__shadow_checker)
+
+        self.__shadow_checker.start()
+        return functools.partial(self.__shadow_checker.decorate, enabled=options.enabled)
 
     def deactivate(self):
         '''
@@ -79,18 +193,70 @@ class Typesafety(object):
         will be checked.
         '''
 
-        if not self.active:
-            raise RuntimeError("Type safety check inactive")
+        with self.__lock:
+            if not self.active:
+                raise RuntimeError("Type safety check inactive")
+
+            self.__module_finder.uninstall()
+
+            if self.__shadow_checker is not None:
+                self.__shadow_checker.stop()
+                self.__shadow_checker = None
+
+            if self.__report is not None:
+                self.__report.write_statistics()
+                self.__report.detach()
+                self.__report = None
+
+            os.environ.pop(CONFIGURATION_VARIABLE, None)
+
+    def wait_ready(self, timeout=None):
+        '''
+        Wait until the modules imported so far are decorated, see
+        :meth:`typesafety.finder.ModuleFinder.wait_ready`. Returns False if
+        `timeout` seconds passed first.
+        '''
+
+        module_finder = self.__module_finder
+        if module_finder is None:
+            return True
+
+        return module_finder.wait_ready(timeout=timeout)
+
+    def __export_options(self, options):
+        try:
+            encoded = options.encode()
 
-        self.__module_finder.uninstall()
+        except ValueError as error:
+            warnings.warn(
+                'The type safety options cannot be passed to child processes: {}'.format(error),
+                category=RuntimeWarning
+            )
+            return
 
+        os.environ[CONFIGURATION_VARIABLE] = encoded
 
-def activate(*, filter_func=None):
+
+def activate(options=None, **kwargs):
     '''
     Shorthand function for activating the type checking.
     '''
 
-    Typesafety.instance().activate(filter_func=filter_func)
+    Typesafety.instance().activate(options, **kwargs)
+
+
+def activate_from_environment():
+    '''
+    Activate the type checking with the options of the parent process, if
+    it had the checking active. Returns True if the checking is active.
+    '''
+
+    typesafety = Typesafety.instance()
+    encoded = os.environ.get(CONFIGURATION_VARIABLE)
+    if encoded is not None and not typesafety.active:
+        typesafety.activate(Options.decode(encoded))
+
+    return typesafety.active
 
 
 def deactivate():
@@ -101,4 +267,16 @@ def deactivate():
     Typesafety.instance().deactivate()
 
 
-__all__ = ['Typesafety', 'TypesafetyError', 'activate', 'deactivate']
+def wait_ready(timeout=None):
+    '''
+    Shorthand function for waiting until the imported modules are
+    decorated in the deferred mode.
+    '''
+
+    return Typesafety.instance().wait_ready(timeout=timeout)
+
+
+__all__ = [
+    'Options', 'Typesafety', 'TypesafetyError', 'activate', 'activate_from_environment', 'checking', 'deactivate',
+    'wait_ready', 'warmup'
+]
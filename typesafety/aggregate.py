@@ -0,0 +1,218 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Collect the violations of several processes into a single report.
+
+Every process appends its violations and statistics, one JSON object per
+line, to a shared file. A single `write()` of a line to a file opened in
+append mode is not interleaved with the writes of other processes, so no
+further locking is needed. Each process keeps only a few counters in
+memory; after `limit` violations only the statistics are written.
+
+The parent process reads the file with :meth:`ViolationReport.read`,
+which merges the records of all processes.
+'''
+
+import atexit
+import collections
+import json
+import multiprocessing.util
+import os
+import threading
+import weakref
+
+from typesafety.counter import ShardedCounter
+
+# Messages longer than this are truncated, so that a record fits into a
+# single write
+MESSAGE_LIMIT = 1000
+
+
+class ViolationReport(object):
+    '''
+    Violation report shared by a process and its children through the
+    file at `path`. At most `limit` violations are written per process.
+
+    :meth:`record` can be passed as the `on_violation` callback of a
+    :class:`typesafety.shadow.ShadowChecker`; :meth:`attach` makes the
+    statistics of the checker be written when the process exits.
+    '''
+
+    def __init__(self, path, *, limit=1000):
+        self.__path = path
+        self.__limit = limit
+        # The process id and the descriptor of the file opened by it
+        self.__output = None
+        self.__lock = threading.Lock()
+        self.__written = ShardedCounter()
+        self.__checker = None
+        self.__finalizer = None
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.__call_if_alive(weakref.WeakMethod(self.__after_fork)))
+
+        # Processes started by multiprocessing clear the finalizers of the
+        # parent after the fork hooks ran, register them again afterwards
+        multiprocessing.util.register_after_fork(self, ViolationReport.__register_worker_exit)
+
+    @property
+    def path(self):
+        return self.__path
+
+    def record(self, function, error):
+        '''
+        Append a violation raised as `error` by a call of `function`,
+        with the callers in its `call_stack`, if any.
+        '''
+
+        if self.__written.value >= self.__limit:
+            return
+
+        self.__written.increment()
+        record = {
+            'kind': 'violation',
+            'function': '{}.{}'.format(
+                getattr(function, '__module__', None),
+                getattr(function, '__qualname__', repr(function))
+            ),
+            'message': str(error)[:MESSAGE_LIMIT],
+        }
+        call_stack = getattr(error, 'call_stack', ())
+        if call_stack:
+            record['call_stack'] = [list(frame) for frame in call_stack]
+
+        self.__write(record)
+
+    def attach(self, checker):
+        '''
+        Write the statistics of `checker` when the current process, or a
+        process forked from it, exits.
+        '''
+
+        self.__checker = checker
+        atexit.register(self.write_statistics)
+        self.__register_worker_exit()
+
+    def detach(self):
+        '''
+        Stop writing the statistics of the attached checker at exit.
+        '''
+
+        self.__checker = None
+        atexit.unregister(self.write_statistics)
+        if self.__finalizer is not None:
+            self.__finalizer.cancel()
+            self.__finalizer = None
+
+    def write_statistics(self):
+        '''
+        Append the statistics of the attached checker. The queued calls are
+        checked first. Only the last statistics of a process are used.
+        '''
+
+        checker = self.__checker
+        if checker is None:
+            return
+
+        checker.flush()
+        self.__write({
+            'kind': 'statistics',
+            'checked': checker.checked,
+            'dropped': checker.dropped,
+            'violations': checker.violation_count,
+        })
+
+    def read(self):
+        '''
+        Merge the records of all processes. Returns a dictionary with the
+        process ids, the total number of checked, dropped and violating
+        calls, and the number of written violations by function.
+        '''
+
+        statistics = {}
+        functions = collections.Counter()
+        processes = set()
+        written = collections.Counter()
+        try:
+            with open(self.__path) as records:
+                for line in records:
+                    try:
+                        entry = json.loads(line)
+
+                    # A process killed in the middle of a write leaves a
+                    # partial line behind
+                    except ValueError:
+                        continue
+
+                    processes.add(entry['pid'])
+                    if entry['kind'] == 'statistics':
+                        statistics[entry['pid']] = entry
+
+                    else:
+                        functions[entry['function']] += 1
+                        written[entry['pid']] += 1
+
+        except FileNotFoundError:
+            pass
+
+        # Processes that exited without statistics still have violations
+        violations = sum(
+            statistics[pid]['violations'] if pid in statistics else written[pid]
+            for pid in processes
+        )
+        return {
+            'processes': sorted(processes),
+            'checked': sum(entry['checked'] for entry in statistics.values()),
+            'dropped': sum(entry['dropped'] for entry in statistics.values()),
+            'violations': violations,
+            'functions': dict(functions),
+        }
+
+    def __write(self, entry):
+        entry['pid'] = os.getpid()
+        line = (json.dumps(entry) + '\n').encode('utf-8')
+        with self.__lock:
+            if self.__output is None or self.__output[0] != entry['pid']:
+                self.__output = (entry['pid'], os.open(self.__path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644))
+
+            os.write(self.__output[1], line)
+
+    def __register_worker_exit(self):
+        # Workers of multiprocessing exit without running the atexit
+        # handlers, but with the finalizers registered in their own process
+        if self.__checker is not None:
+            self.__finalizer = multiprocessing.util.Finalize(None, self.write_statistics, exitpriority=100)
+
+    def __after_fork(self):
+        self.__lock = threading.Lock()
+        self.__written = ShardedCounter()
+        self.__register_worker_exit()
+
+    @staticmethod
+    def __call_if_alive(reference):
+        # Fork hooks cannot be unregistered, so they must not keep the
+        # report alive
+        def __call():
+            method = reference()
+            if method is not None:
+                method()
+
+        return __call
+
+
+__all__ = ['ViolationReport']
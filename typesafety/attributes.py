@@ -0,0 +1,213 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Check assignments to annotated class attributes.
+
+For each attribute annotated in the class body a :class:`TypedAttribute`
+data descriptor is installed, which checks the value on assignment and
+stores it either in the instance dictionary or, for classes using
+`__slots__`, in the slot it replaces. Other attributes are not affected,
+so there is no `__setattr__` override slowing down every assignment.
+
+String annotations, such as the ones created by ``from __future__ import
+annotations``, are evaluated in the namespace of the module of the class
+on the first assignment, when the names they refer to are defined.
+'''
+
+import enum
+import inspect
+import sys
+
+from typesafety.callstack import get_call_stack
+from typesafety.checker import compile_annotation, format_annotation, is_checkable_type_hint
+from typesafety.typing_inspect import (
+    has_forward_references,
+    is_protocol_type,
+    is_typed_dict_type,
+    resolve_annotation,
+)
+from typesafety.validator import TypesafetyError, Validator
+
+
+class TypedAttribute(object):
+    '''
+    Data descriptor checking the values assigned to an attribute.
+
+    The `storage` argument is the slot descriptor the attribute replaces,
+    or None if the value is stored in the instance dictionary. A class
+    level default value can be given in `default`.
+
+    If `annotation` is a string or contains forward references, it is
+    resolved on the first assignment. Values of attributes whose
+    annotation cannot be resolved to a checkable type hint are accepted.
+    '''
+
+    ATTR_TYPE_ERROR_MESSAGE = "Attribute {0!r} of class {1!r} is invalid " + \
+                              "(expected: {2}; got: {3})"
+
+    __slots__ = ('__name', '__owner', '__annotation', '__checker', '__storage', '__default')
+    __no_default = object()
+
+    def __init__(self, owner, name, annotation, *, storage=None, default=__no_default):
+        self.__owner = owner
+        self.__name = name
+        self.__annotation = annotation
+        self.__checker = None if has_forward_references(annotation) else compile_annotation(annotation)
+        self.__storage = storage
+        self.__default = default
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def annotation(self):
+        return self.__annotation
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            if self.__default is not self.__no_default:
+                return self.__default
+
+            return self
+
+        if self.__storage is not None:
+            return self.__storage.__get__(instance, owner)
+
+        try:
+            return instance.__dict__[self.__name]
+
+        except KeyError:
+            if self.__default is not self.__no_default:
+                return self.__default
+
+            raise AttributeError(self.__name) from None
+
+    def __set__(self, instance, value):
+        checker = self.__checker
+        if checker is None:
+            checker = self.__resolve()
+
+        if not checker(value):
+            error = TypesafetyError(self.ATTR_TYPE_ERROR_MESSAGE.format(
+                self.__name,
+                self.__owner.__name__,
+                format_annotation(self.__annotation),
+                value.__class__.__name__
+            ))
+            if Validator.CALL_STACK_DEPTH:
+                frame = sys._getframe(1)  # pylint: disable=protected-access
+                error.call_stack = get_call_stack(frame, Validator.CALL_STACK_DEPTH)
+
+            raise error
+
+        if self.__storage is not None:
+            self.__storage.__set__(instance, value)
+
+        else:
+            instance.__dict__[self.__name] = value
+
+    def __resolve(self):
+        # Resolving more than once is harmless, so there is no lock. The
+        # annotation is replaced first, as it is used in the error messages
+        module = sys.modules.get(self.__owner.__module__)
+        try:
+            annotation = resolve_annotation(self.__annotation, vars(module) if module is not None else {})
+
+        # Annotations that cannot be evaluated are ignored, the same way as
+        # in the function annotations
+        except Exception:  # pylint: disable=broad-except
+            annotation = None
+
+        if annotation is not None and is_checkable_type_hint(annotation):
+            self.__annotation = annotation
+            self.__checker = compile_annotation(annotation)
+
+        else:
+            self.__checker = self.__accept_any
+
+        return self.__checker
+
+    @staticmethod
+    def __accept_any(value):  # pylint: disable=unused-argument
+        return True
+
+    def __delete__(self, instance):
+        if self.__storage is not None:
+            self.__storage.__delete__(instance)
+            return
+
+        try:
+            del instance.__dict__[self.__name]
+
+        except KeyError:
+            raise AttributeError(self.__name) from None
+
+
+def decorate_attributes(cls):
+    '''
+    Install :class:`TypedAttribute` descriptors for the annotated
+    attributes of `cls`. Only the annotations of the class body are used,
+    inherited attributes are handled by the base class.
+
+    Named tuples are skipped since their fields are read-only, as are
+    enums, TypedDicts and protocols, whose annotations do not describe
+    instance attributes. Attributes that already have a descriptor other
+    than a slot (such as a property) or whose annotation is not a
+    checkable type hint are left alone. String annotations are only
+    resolved on the first assignment, see :class:`TypedAttribute`.
+    '''
+
+    annotations = cls.__dict__.get('__annotations__', {})
+    if not annotations or __has_special_annotations(cls):
+        return
+
+    for name, annotation in annotations.items():
+        if not is_checkable_type_hint(annotation) and not has_forward_references(annotation):
+            continue
+
+        attribute = __make_attribute(cls, name, annotation)
+        if attribute is not None:
+            setattr(cls, name, attribute)
+
+
+def __has_special_annotations(cls):
+    return (issubclass(cls, tuple) and hasattr(cls, '_fields')) or \
+        issubclass(cls, enum.Enum) or \
+        is_typed_dict_type(cls) or \
+        is_protocol_type(cls)
+
+
+def __make_attribute(cls, name, annotation):
+    if name not in cls.__dict__:
+        return TypedAttribute(cls, name, annotation)
+
+    value = cls.__dict__[name]
+    if isinstance(value, TypedAttribute):
+        return None
+
+    if inspect.ismemberdescriptor(value):
+        return TypedAttribute(cls, name, annotation, storage=value)
+
+    if hasattr(type(value), '__get__') or hasattr(type(value), '__set__'):
+        return None
+
+    return TypedAttribute(cls, name, annotation, default=value)
+
+
+__all__ = ['TypedAttribute', 'decorate_attributes']
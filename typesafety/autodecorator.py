@@ -36,8 +36,87 @@ Called function mymethod
 0
 '''
 
+import functools
 import inspect
+import threading
 import warnings
+import weakref
+
+from typesafety.counter import ShardedCounter
+from typesafety.options import DecorationOptions
+from typesafety.patching import copy_patch, is_patched, patch_function
+from typesafety.typing_inspect import has_forward_references
+
+try:
+    import dataclasses
+
+except ImportError:
+    dataclasses = None
+
+
+class VisitedSet(object):
+    '''
+    The classes and functions already decorated. Sharing one between the
+    module decorators of an activation decorates an object reachable under
+    several names or from several classes only once. The counts of the
+    duplicates skipped are in :attr:`skipped_classes` and
+    :attr:`skipped_functions`.
+
+    The objects are referenced weakly, so they can still be collected once
+    their module is unloaded.
+    '''
+
+    def __init__(self):
+        self.__classes = weakref.WeakSet()
+        self.__functions = weakref.WeakKeyDictionary()
+        self.__lock = threading.Lock()
+        self.__skipped_classes = 0
+        self.__skipped_functions = 0
+
+    @property
+    def skipped_classes(self):
+        return self.__skipped_classes
+
+    @property
+    def skipped_functions(self):
+        return self.__skipped_functions
+
+    def visit_class(self, cls):
+        '''
+        Mark `cls` visited. Return False if it was visited already.
+        '''
+
+        with self.__lock:
+            if cls in self.__classes:
+                self.__skipped_classes += 1
+                return False
+
+            self.__classes.add(cls)
+            return True
+
+    def get_decorated(self, function, *, receiver):
+        '''
+        Return the result of decorating `function` with the same `receiver`
+        before, or None.
+        '''
+
+        with self.__lock:
+            reference = self.__functions.get(function, {}).get(receiver)
+            decorated = reference() if reference is not None else None
+            if decorated is not None:
+                self.__skipped_functions += 1
+
+            return decorated
+
+    def set_decorated(self, function, decorated, *, receiver):
+        try:
+            reference = weakref.ref(decorated)
+
+        except TypeError:
+            return
+
+        with self.__lock:
+            self.__functions.setdefault(function, {})[receiver] = reference
 
 
 class ModuleDecorator(object):
@@ -45,18 +124,80 @@ class ModuleDecorator(object):
     Decorate a module automatically with the supplied decorator.
     This is just a helper class for the :func:`decorate` module function.
 
-    The `decorator` argument is the decorator to be applied to functions.
+    The decorators and how they are applied are given in `options`, see
+    :class:`typesafety.options.DecorationOptions`.
+
+    Each class and function is decorated once, even if it is found under
+    several names. Pass the same :class:`VisitedSet` as `visited` to the
+    decorators of several modules to share that across them.
+
+    When a module is reloaded, pass the :attr:`decorations` of the decorator
+    of its previous version as `previous`. The functions that did not
+    change since (see :func:`get_fingerprint`) get their previous decorated
+    version back instead of being decorated again. When they are patched
+    in place, the new functions are patched to call the previous wrappers
+    instead, as the module may have kept references to them already.
     '''
 
-    def __init__(self, decorator):
-        self.__decorator = decorator
+    def __init__(self, options, *, visited=None, previous=None):
+        decorator = options.decorator
+        method_decorator = options.method_decorator
+        if options.in_place:
+            decorator = functools.partial(patch_function, decorator=decorator)
+            if method_decorator is not None:
+                method_decorator = functools.partial(patch_function, decorator=method_decorator)
+
+        decorator = functools.partial(self.__reuse_previous, decorator=decorator)
+        if method_decorator is not None:
+            method_decorator = functools.partial(self.__reuse_previous, decorator=method_decorator)
+
+        self.__options = options._replace(decorator=decorator, method_decorator=method_decorator)
+        self.__previous = previous if previous is not None else {}
+        self.__decorations = {}
+        self.__reused = ShardedCounter()
+        self.__visited = visited if visited is not None else VisitedSet()
+
+    @property
+    def decorations(self):
+        '''
+        The functions decorated so far with their fingerprint and decorated
+        version, to be passed as `previous` when the module is reloaded.
+        '''
+
+        return self.__decorations
+
+    @property
+    def reused(self):
+        '''
+        The number of functions whose previous decorated version was reused.
+        '''
+
+        return self.__reused.value
+
+    def decorate(self, module, *, index=None):
+        '''
+        Decorate the functions and classes of `module`. If an `index` of
+        the annotated definitions is given (see
+        :func:`typesafety.prescan.get_index`), only the ones in it are
+        visited.
+        '''
 
-    def decorate(self, module):
         if inspect.isclass(module):
-            self.__decorate_class(module, use_dict=module.__dict__)
+            self.__decorate_class(module, use_dict=module.__dict__, index=index)
 
         else:
-            self.__decorate_module(module, use_dict=module.__dict__)
+            self.__decorate_module(module, use_dict=module.__dict__, index=index)
+
+    def __set_decorated(self, module, key, function, *args, origin=None, **kwargs):
+        # Run function(*args, **kwargs) and set the result as the `key`
+        # attribute of `module`. The result is recorded as the decorated
+        # version of `origin`, a (function, receiver) pair, if given.
+        result = function(*args, **kwargs)
+        if origin is not None:
+            decorated, receiver = origin
+            self.__visited.set_decorated(decorated, result, receiver=receiver)
+
+        self.__set_attribute(module, key, result)
 
     def __is_attribute_mutable(self, object_dict, attr):
         if '__slots__' not in object_dict:
@@ -64,33 +205,86 @@ class ModuleDecorator(object):
 
         return attr in object_dict['__slots__']
 
-    def __decorate_module(self, module, *, use_dict):
-        for key, value in self.__iterate_decorables(use_dict):
+    def __decorate_module(self, module, *, use_dict, index):
+        for key, value, member_index in self.__iterate_decorables(use_dict, index):
             if self.__is_object_external(module, value):
                 continue
 
-            self.__decorate_item(module, key, value)
+            self.__decorate_item(module, key, value, index=member_index)
 
     def __is_object_external(self, module, obj):
         return hasattr(obj, '__module__') and obj.__module__ != module.__name__
 
-    def __decorate_class(self, cls, *, use_dict):
-        for key, value in self.__iterate_decorables(use_dict):
-            self.__decorate_item(cls, key, value)
+    def __decorate_class(self, cls, *, use_dict, index):
+        if not self.__visited.visit_class(cls):
+            return
+
+        for key, value, member_index in self.__iterate_decorables(use_dict, index):
+            self.__decorate_item(cls, key, value, index=member_index)
+
+        # Record types usually define __slots__, which hides their
+        # generated constructor from the loop above
+        constructor = self.__get_record_constructor_name(cls)
+        if constructor is not None and constructor in use_dict and \
+                not self.__is_attribute_mutable(use_dict, constructor):
+            self.__decorate_item(cls, constructor, use_dict[constructor], index=None)
+
+        # NamedTuple._make, and _replace through it, build the record
+        # without calling the constructor decorated above
+        if constructor == '__new__' and isinstance(use_dict.get('_make'), classmethod):
+            self.__set_attribute(cls, '_make', self.__make_constructor_factory(use_dict['_make'].__func__))
+
+        if self.__options.class_decorator is not None:
+            self.__options.class_decorator(cls)
+
+    @staticmethod
+    def __make_constructor_factory(make):
+        @functools.wraps(make)
+        def __make(cls, iterable):
+            record = make(cls, iterable)
+            return cls.__new__(cls, *record)
+
+        return classmethod(__make)
+
+    def __get_record_constructor_name(self, cls):
+        if issubclass(cls, tuple) and hasattr(cls, '_fields'):
+            return '__new__'
+
+        if dataclasses is not None and dataclasses.is_dataclass(cls):
+            return '__init__'
+
+        return None
+
+    def __iterate_decorables(self, use_dict, index):
+        # Without an index everything is visited, otherwise only the names
+        # in it, along with the index of their members. The namespace is
+        # copied first, as in the deferred mode the importing thread may
+        # add submodules to it meanwhile.
+        if index is None:
+            items = [(key, value, None) for key, value in list(use_dict.items())]
+
+        else:
+            items = [(key, use_dict[key], index[key]) for key in index if key in use_dict]
 
-    def __iterate_decorables(self, use_dict):
-        for key, value in use_dict.items():
+        for key, value, member_index in items:
             if not self.__is_attribute_mutable(use_dict, key):
                 continue
 
-            yield key, value
+            yield key, value, member_index
+
+    def __is_private_name(self, key):
+        is_special = key.startswith('__') and key.endswith('__')
+        return key.startswith('_') and not is_special
+
+    def __decorate_item(self, module, key, value, *, index):
+        if self.__options.public_only and self.__is_private_name(key) and not inspect.isclass(value):
+            return
 
-    def __decorate_item(self, module, key, value):
         if inspect.isfunction(value):
             self.__decorate_function(module, key, value)
 
         elif inspect.isclass(value):
-            self.__decorate_class(value, use_dict=value.__dict__)
+            self.__decorate_class(value, use_dict=value.__dict__, index=index)
 
         elif isinstance(value, property):
             self.__decorate_property(module, key, value)
@@ -99,31 +293,97 @@ class ModuleDecorator(object):
             self.__decorate_special_method(module, key, value)
 
     def __decorate_function(self, module, key, value):
-        self.__set_attribute(module, key, self.__decorator(value))
+        receiver = inspect.isclass(module)
+        decorated = self.__visited.get_decorated(value, receiver=receiver)
+        if decorated is not None:
+            self.__set_attribute(module, key, decorated)
+
+        elif receiver:
+            self.__set_decorated(module, key, self.__decorate_method, value, receiver=True, origin=(value, True))
+
+        else:
+            self.__set_decorated(module, key, self.__options.decorator, value, origin=(value, False))
+
+    def __reuse_previous(self, function, *, decorator, **kwargs):
+        key = (function.__qualname__, kwargs.get('receiver'))
+        fingerprint = get_fingerprint(function)
+        previous = self.__previous.get(key)
+        decorated = None
+        if previous is not None and self.__is_same_fingerprint(previous[0], fingerprint):
+            decorated = self.__get_reusable(previous[1], function)
+
+        if decorated is not None:
+            self.__reused.increment()
+
+        else:
+            decorated = decorator(function, **kwargs)
+
+        if fingerprint is not None:
+            self.__decorations[key] = (fingerprint, decorated)
+
+        return decorated
+
+    def __get_reusable(self, decorated, function):
+        # Patched functions may be referenced by the module already, so the
+        # new function is patched like the previous one instead of being
+        # replaced by it. Returns None if `decorated` cannot be reused.
+        if not self.__options.in_place:
+            return decorated
+
+        if is_patched(decorated):
+            return copy_patch(decorated, function)
+
+        return None
+
+    @staticmethod
+    def __is_same_fingerprint(previous, fingerprint):
+        if previous is None or fingerprint is None:
+            return False
+
+        try:
+            return bool(previous == fingerprint)
+
+        # Defaults and annotations may compare in unexpected ways
+        except Exception:  # pylint: disable=broad-except
+            return False
+
+    def __decorate_method(self, function, *, receiver):
+        if self.__options.method_decorator is None:
+            return self.__options.decorator(function)
+
+        return self.__options.method_decorator(function, receiver=receiver)
 
     def __decorate_property(self, module, key, value):
+        if self.__options.property_decorator is not None:
+            self.__set_decorated(module, key, self.__options.property_decorator, value)
+
+        else:
+            self.__set_decorated(module, key, self.__decorate_accessors, value)
+
+    def __decorate_accessors(self, value):
         fget = None
         fset = None
         fdel = None
 
         if value.fget is not None:
-            fget = self.__decorator(value.fget)
+            fget = self.__decorate_method(value.fget, receiver=True)
 
         if value.fset is not None:
-            fset = self.__decorator(value.fset)
+            fset = self.__decorate_method(value.fset, receiver=True)
 
         if value.fdel is not None:
-            fdel = self.__decorator(value.fdel)
+            fdel = self.__decorate_method(value.fdel, receiver=True)
 
-        self.__set_attribute(
-            module, key, property(fget=fget, fset=fset, fdel=fdel)
-        )
+        return property(fget=fget, fset=fset, fdel=fdel)
 
     def __decorate_special_method(self, module, key, value):
-        func = self.__decorator(value.__func__)
-        decorated = value.__class__(func)
+        # __new__ is a static method, but gets the class explicitly
+        receiver = isinstance(value, classmethod) or key == '__new__'
+        self.__set_decorated(module, key, self.__decorate_wrapped_method, value, receiver=receiver)
 
-        self.__set_attribute(module, key, decorated)
+    def __decorate_wrapped_method(self, value, *, receiver):
+        func = self.__decorate_method(value.__func__, receiver=receiver)
+        return value.__class__(func)
 
     def __submodule_of(self, basemodule, submodule):
         return submodule.startswith(basemodule + '.')
@@ -148,8 +408,45 @@ class ModuleDecorator(object):
             )
 
 
-def decorate_module(module, *, decorator):
-    ModuleDecorator(decorator).decorate(module)
+def get_fingerprint(function):
+    '''
+    Return what decorating `function` depends on, or None if its previous
+    decorated version cannot be reused: if it has a closure, which would
+    refer to the previous version of its class or scope, or annotations
+    evaluated only later.
+
+    The code objects compare equal only if the line numbers are the same
+    as well, so the tracebacks of reused functions stay correct.
+    '''
+
+    if not inspect.isfunction(function) or function.__closure__ is not None:
+        return None
+
+    annotations = getattr(function, '__annotations__', {})
+    if any(has_forward_references(annotation) for annotation in annotations.values()):
+        return None
+
+    return (
+        function.__code__,
+        function.__defaults__,
+        function.__kwdefaults__,
+        tuple(annotations.items()),
+        dict(function.__dict__)
+    )
+
+
+def decorate_module(module, options=None, *, index=None, visited=None, previous=None, **kwargs):
+    '''
+    Decorate `module` with a :class:`ModuleDecorator`, see
+    :meth:`ModuleDecorator.decorate`.
+
+    The decorators are given either in `options` or as the fields of
+    :class:`typesafety.options.DecorationOptions` in keyword arguments,
+    which override the ones in `options`.
+    '''
+
+    options = DecorationOptions(**kwargs) if options is None else options._replace(**kwargs)
+    ModuleDecorator(options, visited=visited, previous=previous).decorate(module, index=index)
 
 
-__all__ = ['decorate_module']
+__all__ = ['ModuleDecorator', 'VisitedSet', 'decorate_module', 'get_fingerprint']
@@ -0,0 +1,82 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Information about the callers of checked functions: the call stack
+recorded for the calls failing a type check and the package of the
+caller, which decides whether a call is checked in boundary only mode.
+'''
+
+# Modules whose frames are skipped when looking for the caller
+__INTERNAL_MODULES = frozenset((
+    'typesafety.validator',
+    'typesafety.attributes',
+    'typesafety.shadow',
+    'typesafety.patching',
+))
+
+# Top level package names keyed on the names of the modules calling
+# functions decorated in boundary only mode. Entries are only ever
+# added, and concurrent writers add the same value, so no lock is
+# needed. The generated wrappers look names up here directly.
+CALLER_PACKAGES = {}
+
+
+def get_call_stack(frame, depth):
+    '''
+    Return the `(filename, line, function name)` of at most `depth` frames
+    starting from `frame`, skipping the frames of the checks and of the
+    generated wrappers.
+    '''
+
+    call_stack = []
+    while frame is not None and len(call_stack) < depth:
+        code = frame.f_code
+        if not code.co_filename.startswith('<typesafety') and \
+                frame.f_globals.get('__name__') not in __INTERNAL_MODULES:
+            call_stack.append((code.co_filename, frame.f_lineno, code.co_name))
+
+        frame = frame.f_back
+
+    return tuple(call_stack)
+
+
+def get_package(function):
+    '''
+    Return the top level package of the module defining `function`.
+    '''
+
+    return (getattr(function, '__module__', None) or '').partition('.')[0]
+
+
+def get_caller_package(frame):
+    '''
+    Return the top level package of the module running in `frame`. Module
+    names are mapped to their package once, so later calls only cost a
+    dictionary lookup instead of inspecting the frame.
+    '''
+
+    name = frame.f_globals.get('__name__')
+    package = CALLER_PACKAGES.get(name)
+    if package is None:
+        package = (name or '').partition('.')[0]
+        CALLER_PACKAGES[name] = package
+
+    return package
+
+
+__all__ = ['CALLER_PACKAGES', 'get_call_stack', 'get_caller_package', 'get_package']
@@ -0,0 +1,591 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Compile annotations into checker functions.
+
+A checker is a callable that takes a single value and returns True if the
+value conforms to the annotation it was compiled from. Annotations are
+compiled once, when the :class:`typesafety.validator.Validator` is created,
+so the annotation does not have to be interpreted again on every call.
+
+The annotations are expected to be valid typecheck annotations, see
+:class:`typesafety.validator.Validator` for the accepted forms.
+'''
+
+import abc
+import inspect
+import sys
+import threading
+import typing
+import weakref
+
+from typesafety.counter import ShardedCounter
+from typesafety.typing_inspect import (
+    is_union_type,
+    get_union_args,
+    is_literal_type,
+    get_literal_args,
+    is_protocol_type,
+    get_protocol_members,
+    is_callable_type,
+    get_callable_args,
+    is_typed_dict_type,
+    get_typed_dict_fields,
+)
+
+# The maximum number of allowed values listed in an error message
+LITERAL_FORMAT_LIMIT = 10
+
+# Whether protocol checks should also compare the number of positional
+# arguments of the protocol methods with the implementation
+PROTOCOL_CHECK_ARITY = False
+
+# Nesting depth up to which TypedDict values are checked field by field,
+# deeper TypedDict values are only checked to be dictionaries. None means
+# there is no limit.
+TYPED_DICT_MAX_DEPTH = None
+
+# Serializes the writes of the caches below. Reads take no lock, a thread
+# missing an entry that is being added just computes it again.
+__cache_lock = threading.Lock()
+
+# Protocol verdicts keyed on the concrete class, then on the protocol
+__protocol_verdicts = weakref.WeakKeyDictionary()
+
+# Marker for missing dictionary keys
+__missing = object()
+
+# Positional arity of callables keyed on code objects (or the callable
+# itself if it has no code object)
+__callable_arities = weakref.WeakKeyDictionary()
+
+
+def compile_annotation(annotation):
+    '''
+    Return a checker function for `annotation`.
+    '''
+
+    return __compile(annotation, depth=0)
+
+
+def __compile(annotation, *, depth):
+    if isinstance(annotation, tuple):
+        return __compile_any_of(annotation, depth=depth)
+
+    checker = __compile_typing_construct(annotation, depth=depth)
+    if checker is not None:
+        return checker
+
+    if isinstance(annotation, type):
+        return __compile_instance_check(annotation)
+
+    if callable(annotation):
+        return annotation
+
+    if annotation is None:
+        return __is_none
+
+    # This line will probably never be reached
+    return __accept_all
+
+
+def __compile_typing_construct(annotation, *, depth):
+    # Returns None if the annotation is not one of the typing constructs
+    # checked specially. Also takes the typing.TypedDict and
+    # typing.Protocol classes, which are classes as well.
+    if is_union_type(annotation):
+        return __compile_any_of(get_union_args(annotation), depth=depth)
+
+    if is_typed_dict_type(annotation):
+        return __compile_typed_dict(annotation, depth=depth)
+
+    if is_literal_type(annotation):
+        return __compile_literal(get_literal_args(annotation))
+
+    if is_callable_type(annotation):
+        parameters, _ = get_callable_args(annotation)
+        return __compile_callable(parameters)
+
+    if is_protocol_type(annotation):
+        return __compile_protocol(annotation, check_arity=PROTOCOL_CHECK_ARITY)
+
+    return None
+
+
+def format_annotation(annotation):
+    '''
+    Return a human readable representation of `annotation` for error
+    messages.
+    '''
+
+    if is_union_type(annotation):
+        return 'typing.Union[{}]'.format(
+            ', '.join(format_annotation(entry) for entry in get_union_args(annotation))
+        )
+
+    if is_literal_type(annotation):
+        return __format_literal(get_literal_args(annotation))
+
+    if isinstance(annotation, tuple):
+        return "({})".format(
+            ", ".join(format_annotation(a) for a in annotation)
+        )
+
+    if annotation is None:
+        return "None"
+
+    if is_callable_type(annotation):
+        return str(annotation)
+
+    return getattr(annotation, '__name__', str(annotation))
+
+
+def is_checkable_type_hint(annotation):
+    '''
+    Return True if `annotation` is an ordinary type hint the checker
+    understands. Unlike function annotations, callables are not accepted
+    as predicates here, so this is used for annotations that were not
+    written with typesafety in mind (TypedDict fields, class attributes).
+    '''
+
+    if isinstance(annotation, tuple) or is_union_type(annotation):
+        args = annotation if isinstance(annotation, tuple) else get_union_args(annotation)
+        return all(is_checkable_type_hint(arg) for arg in args)
+
+    if annotation is None:
+        return True
+
+    if annotation is typing.Any:
+        return False
+
+    return isinstance(annotation, type) or \
+        is_literal_type(annotation) or \
+        is_callable_type(annotation)
+
+
+def get_instance_check_classes(annotation):
+    '''
+    Return the tuple of classes to pass to isinstance() if checking
+    `annotation` is a plain isinstance() call, otherwise None. Code
+    generators can use this to inline the check.
+    '''
+
+    if isinstance(annotation, tuple) or is_union_type(annotation):
+        args = annotation if isinstance(annotation, tuple) else get_union_args(annotation)
+        classes = ()
+        for arg in args:
+            arg_classes = get_instance_check_classes(arg)
+            if arg_classes is None:
+                return None
+
+            classes += arg_classes
+
+        return classes
+
+    if annotation is None:
+        return (type(None),)
+
+    if __is_plain_class(annotation):
+        return (annotation,)
+
+    return None
+
+
+def invalidate_protocol_cache(cls=None):
+    '''
+    Forget the cached protocol verdicts of `cls`, or of every class if `cls`
+    is None. Call this after adding or removing methods of a class that is
+    checked against a protocol, since such changes are not detected
+    automatically.
+    '''
+
+    with __cache_lock:
+        if cls is None:
+            __protocol_verdicts.clear()
+
+        else:
+            __protocol_verdicts.pop(cls, None)
+
+
+def is_type_determined(annotation):
+    '''
+    Return True if whether a value conforms to `annotation` only depends on
+    the concrete type of the value, that is the annotation is checked by a
+    plain isinstance() call whose classes do not customize it.
+    '''
+
+    classes = get_instance_check_classes(annotation)
+    return classes is not None and all(
+        type(cls).__instancecheck__ in (type.__instancecheck__, abc.ABCMeta.__instancecheck__)
+        for cls in classes
+    )
+
+
+class TypeTrust(object):
+    '''
+    Adaptive check of a single parameter or return value whose annotation
+    is type determined (see :func:`is_type_determined`).
+
+    Calling the object checks the value with `checker`. Once `threshold`
+    consecutive values of the same concrete type have passed, that type
+    becomes the `trusted_type`. Generated code tests
+    `type(value) is trust.trusted_type` first and only calls the object on
+    a mismatch, so checking a value of the trusted type is a single
+    identity comparison.
+
+    The state is public for debugging: `candidate_type` is the type of the
+    last checked values, `hits` is the number of consecutive passed values
+    of that type, and `fallbacks` is the number of values checked in full
+    after a type has been trusted.
+
+    Concurrent calls may interleave the updates of `candidate_type` and
+    `hits`, so a type may be trusted after more or fewer values than
+    `threshold`. This is harmless, since a type is only trusted after one
+    of its values has passed the full check, which decides for all values
+    of the type. `fallbacks` is counted per thread, so it is exact.
+    '''
+
+    __slots__ = ('__checker', '__threshold', '__fallbacks', 'trusted_type', 'candidate_type', 'hits')
+
+    def __init__(self, checker, threshold):
+        self.__checker = checker
+        self.__threshold = threshold
+        self.__fallbacks = ShardedCounter()
+        self.trusted_type = None
+        self.candidate_type = None
+        self.hits = 0
+
+    @property
+    def fallbacks(self):
+        return self.__fallbacks.value
+
+    def __call__(self, value):
+        value_type = type(value)
+        if value_type is self.trusted_type:
+            return True
+
+        if self.trusted_type is not None:
+            self.__fallbacks.increment()
+
+        if not self.__checker(value):
+            self.candidate_type = None
+            self.hits = 0
+            return False
+
+        if value_type is self.candidate_type:
+            self.hits += 1
+
+        else:
+            self.candidate_type = value_type
+            self.hits = 1
+
+        if self.hits >= self.__threshold:
+            self.trusted_type = value_type
+
+        return True
+
+    def __repr__(self):
+        return '<TypeTrust trusted={!r} candidate={!r} hits={} fallbacks={}>'.format(
+            self.trusted_type, self.candidate_type, self.hits, self.fallbacks
+        )
+
+
+def __is_none(value):
+    return value is None
+
+
+def __accept_all(value):  # pylint: disable=unused-argument
+    return True
+
+
+def __compile_instance_check(cls):
+    def __check(value):
+        return isinstance(value, cls)
+
+    return __check
+
+
+def __is_plain_class(annotation):
+    return isinstance(annotation, type) and \
+        not is_typed_dict_type(annotation) and \
+        not is_protocol_type(annotation)
+
+
+def __compile_any_of(annotations, *, depth):
+    # Plain classes are merged into a single isinstance() call, the rest
+    # of the annotations are checked one by one.
+    classes = []
+    checkers = []
+    for annotation in annotations:
+        if annotation is None:
+            classes.append(type(None))
+
+        elif __is_plain_class(annotation):
+            classes.append(annotation)
+
+        else:
+            checkers.append(__compile(annotation, depth=depth))
+
+    if classes:
+        checkers.insert(0, __compile_instance_check(tuple(classes)))
+
+    if len(checkers) == 1:
+        return checkers[0]
+
+    def __check(value):
+        for checker in checkers:
+            if checker(value):
+                return True
+
+        return False
+
+    return __check
+
+
+def __compile_typed_dict(cls, *, depth):
+    if TYPED_DICT_MAX_DEPTH is not None and depth >= TYPED_DICT_MAX_DEPTH:
+        return __compile_instance_check(dict)
+
+    # The key table is built on the first check, so self referencing
+    # TypedDicts do not recurse while compiling.
+    table = None
+
+    def __check(value):
+        nonlocal table
+        if not isinstance(value, dict):
+            return False
+
+        if table is None:
+            table = __build_typed_dict_table(cls, depth=depth)
+
+        for key, required, checker in table:
+            item = value.get(key, __missing)
+            if item is __missing:
+                if required:
+                    return False
+
+            elif checker is not None and not checker(item):
+                return False
+
+        return True
+
+    return __check
+
+
+def __build_typed_dict_table(cls, *, depth):
+    # Entries are (key, required, checker); the checker is None if the
+    # field annotation cannot be checked. Required keys come first so
+    # missing keys are found early.
+    annotations, required_keys = get_typed_dict_fields(cls)
+    table = []
+    for key, annotation in annotations.items():
+        checker = None
+        if is_checkable_type_hint(annotation):
+            checker = __compile(annotation, depth=depth + 1)
+
+        table.append((key, key in required_keys, checker))
+
+    table.sort(key=lambda entry: not entry[1])
+    return tuple(table)
+
+
+def __compile_literal(values):
+    # Literal values are keyed on their exact type as well, otherwise
+    # Literal[1] would accept True and 1.0, since they hash and compare
+    # equal to 1. Unhashable values are compared one by one.
+    hashable = set()
+    unhashable = []
+    for value in values:
+        try:
+            hashable.add((type(value), value))
+
+        except TypeError:
+            unhashable.append(value)
+
+    hashable = frozenset(hashable)
+
+    def __check(value):
+        try:
+            if (type(value), value) in hashable:
+                return True
+
+        except TypeError:
+            pass
+
+        return any(type(value) is type(entry) and value == entry for entry in unhashable)
+
+    return __check
+
+
+def __compile_protocol(protocol, *, check_arity):
+    # Methods are looked up on the class of the value and the verdict is
+    # cached per class. Data members may be set on the instance only, so
+    # they are checked on the value itself.
+    members = get_protocol_members(protocol)
+    methods = sorted(name for name in members if callable(getattr(protocol, name, None)))
+    attributes = sorted(members.difference(methods))
+    key = (protocol, check_arity)
+
+    def __check(value):
+        cls = type(value)
+        try:
+            verdict = __protocol_verdicts[cls][key]
+
+        except KeyError:
+            verdict = __is_protocol_implemented(protocol, cls, methods, check_arity=check_arity)
+            with __cache_lock:
+                __protocol_verdicts.setdefault(cls, {})[key] = verdict
+
+        if not verdict:
+            return False
+
+        for name in attributes:
+            if not hasattr(value, name):
+                return False
+
+        return True
+
+    return __check
+
+
+def __is_protocol_implemented(protocol, cls, methods, *, check_arity):
+    for name in methods:
+        implementation = getattr(cls, name, None)
+        if not callable(implementation):
+            return False
+
+        # Static and class methods are not bound to the instance, so only
+        # plain functions have their arity compared
+        if check_arity and not __is_arity_compatible(
+                getattr(protocol, name), inspect.getattr_static(cls, name)):
+            return False
+
+    return True
+
+
+def __count_positional_arguments(parameters):
+    # Returns the number of required and accepted positional arguments;
+    # None as maximum means any number is accepted.
+    positional = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+
+    required = sum(
+        1 for parameter in parameters
+        if parameter.kind in positional and parameter.default is inspect.Parameter.empty
+    )
+    if any(parameter.kind == inspect.Parameter.VAR_POSITIONAL for parameter in parameters):
+        return required, None
+
+    return required, sum(1 for parameter in parameters if parameter.kind in positional)
+
+
+def __count_method_arguments(function):
+    return __count_positional_arguments(list(inspect.signature(function).parameters.values())[1:])
+
+
+def __is_arity_compatible(expected, implementation):
+    if not inspect.isfunction(expected) or not inspect.isfunction(implementation):
+        return True
+
+    expected_required, _ = __count_method_arguments(expected)
+    required, maximum = __count_method_arguments(implementation)
+
+    return required <= expected_required and (maximum is None or maximum >= expected_required)
+
+
+def __compile_callable(parameters):
+    if parameters is Ellipsis:
+        return callable
+
+    count = len(parameters)
+
+    def __check(value):
+        if not callable(value):
+            return False
+
+        required, maximum = __get_callable_arity(value)
+        return required <= count and (maximum is None or count <= maximum)
+
+    return __check
+
+
+def __get_callable_arity(value):
+    # Functions sharing a code object share their signature as well, so
+    # the arity is cached on the code object. Bound methods reuse the
+    # arity of their function minus the receiver.
+    offset = 0
+    if inspect.ismethod(value) and inspect.isfunction(value.__func__):
+        value = value.__func__
+        offset = 1
+
+    key = value.__code__ if inspect.isfunction(value) else value
+
+    try:
+        arity = __callable_arities.get(key)
+
+    except TypeError:
+        # Not weak referenceable, cannot be cached
+        key = None
+        arity = None
+
+    if arity is None:
+        arity = __compute_callable_arity(value)
+        if key is not None:
+            with __cache_lock:
+                __callable_arities[key] = arity
+
+    required, maximum = arity
+    if offset:
+        required = max(required - offset, 0)
+        maximum = None if maximum is None else maximum - offset
+
+    return required, maximum
+
+
+def __compute_callable_arity(value):
+    try:
+        parameters = list(inspect.signature(value).parameters.values())
+
+    except (TypeError, ValueError):
+        # No signature available (some builtins), accept any call
+        return 0, None
+
+    if any(parameter.kind == inspect.Parameter.KEYWORD_ONLY and
+           parameter.default is inspect.Parameter.empty for parameter in parameters):
+        # Required keyword only arguments can never be passed positionally
+        return sys.maxsize, None
+
+    return __count_positional_arguments(parameters)
+
+
+def __format_literal(values):
+    entries = [repr(value) for value in values[:LITERAL_FORMAT_LIMIT]]
+    if len(values) > LITERAL_FORMAT_LIMIT:
+        entries.append('... ({} more)'.format(len(values) - LITERAL_FORMAT_LIMIT))
+
+    return 'typing.Literal[{}]'.format(', '.join(entries))
+
+
+__all__ = [
+    'compile_annotation',
+    'format_annotation',
+    'get_instance_check_classes',
+    'is_checkable_type_hint',
+    'is_type_determined',
+    'invalidate_protocol_cache',
+    'TypeTrust',
+]
@@ -0,0 +1,85 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Scope the type checking to a task or a thread.
+
+The checking mode is stored in a context variable, so a mode set with
+:func:`checking` applies to everything called in the current thread or
+asyncio task, including the tasks created inside the scope, but not to
+other requests served concurrently.
+
+Usage:
+
+>>> def call_without_checks():
+...     return get_mode(FULL)
+>>> with checking(enabled=False):
+...     call_without_checks()
+'off'
+'''
+
+import contextlib
+import contextvars
+
+# Every call is checked
+FULL = 'full'
+
+# Only calls coming from outside of the package of the function are checked
+BOUNDARY = 'boundary'
+
+# No calls are checked
+OFF = 'off'
+
+MODES = (FULL, BOUNDARY, OFF)
+
+# Unset unless a checking() scope is entered, so decorated functions fall
+# back to the mode they were decorated with
+__mode = contextvars.ContextVar('typesafety_mode')
+
+# Called by the wrappers with their default mode, this is the only context
+# variable access on the hot path
+get_mode = __mode.get
+
+
+@contextlib.contextmanager
+def checking(enabled=True, *, mode=None):
+    '''
+    Enter a scope in which calls to decorated functions are checked
+    according to `mode`, which is one of :data:`FULL`, :data:`BOUNDARY` or
+    :data:`OFF`. If `enabled` is False, checking is turned off regardless
+    of `mode`; otherwise `mode` defaults to :data:`FULL`.
+    '''
+
+    if mode is not None and mode not in MODES:
+        raise ValueError('Unknown checking mode: {!r}'.format(mode))
+
+    if not enabled:
+        mode = OFF
+
+    elif mode is None:
+        mode = FULL
+
+    # Use the module constants, so wrappers can compare by identity
+    token = __mode.set(MODES[MODES.index(mode)])
+    try:
+        yield
+
+    finally:
+        __mode.reset(token)
+
+
+__all__ = ['FULL', 'BOUNDARY', 'OFF', 'checking', 'get_mode']
@@ -0,0 +1,106 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Statistics counters that can be incremented from many threads at once.
+'''
+
+import threading
+import weakref
+
+
+class ShardedCounter(object):
+    '''
+    Counter with one cell per thread. A thread only ever increments its
+    own cell, so no update is lost and there is no lock to take on
+    increment, even without the GIL. The cells are summed when the value
+    is read. When a thread finishes, its cell is folded into a common
+    total, so the number of cells, see :attr:`shards`, stays bounded by
+    the number of live threads.
+    '''
+
+    __slots__ = ('__local', '__cells', '__retired', '__lock')
+
+    class _Cell(object):
+        __slots__ = ('value',)
+
+        def __init__(self):
+            self.value = 0
+
+    class _Owner(object):
+        # Lives as long as the thread-local data of the thread owning a
+        # cell, the cell is folded into the total when it is collected
+        __slots__ = ('__weakref__',)
+
+    def __init__(self):
+        self.__local = threading.local()
+        self.__cells = set()
+        self.__retired = [0]
+        self.__lock = threading.Lock()
+
+    def increment(self, amount=1):
+        try:
+            cell = self.__local.cell
+
+        except AttributeError:
+            cell = self.__add_cell()
+
+        cell.value += amount
+
+    @property
+    def value(self):
+        with self.__lock:
+            return self.__retired[0] + sum(cell.value for cell in self.__cells)
+
+    @property
+    def shards(self):
+        '''
+        The number of cells, one for each live thread that incremented the
+        counter.
+        '''
+
+        with self.__lock:
+            return len(self.__cells)
+
+    def __add_cell(self):
+        cell = self._Cell()
+        owner = self._Owner()
+        with self.__lock:
+            self.__cells.add(cell)
+
+        # Only the shared state is passed, the finalizer does not keep the
+        # counter itself alive
+        finalizer = weakref.finalize(owner, self.__retire_cell, self.__lock, self.__cells, self.__retired, cell)
+        finalizer.atexit = False
+        self.__local.owner = owner
+        self.__local.cell = cell
+        return cell
+
+    @staticmethod
+    def __retire_cell(lock, cells, retired, cell):
+        with lock:
+            cells.discard(cell)
+            retired[0] += cell.value
+
+    def __int__(self):
+        return self.value
+
+    def __repr__(self):
+        return '<ShardedCounter {}>'.format(self.value)
+
+
+__all__ = ['ShardedCounter']
@@ -19,10 +19,17 @@
 On import decorate imported modules with the supplied decorator.
 '''
 
+import concurrent.futures
+import contextlib
 import imp
 import importlib.abc
+import queue
 import sys
+import threading
 from . import autodecorator
+from . import prescan as prescanner
+from .plancache import PlanCache
+from .validator import Validator
 
 
 class ModuleLoader(object):
@@ -63,12 +70,38 @@ class ModuleLoader(object):
         return self.__finder.load_module(self)
 
 
-class ModuleFinder(object):
+# Holds its options, the loaded modules and the state of the background decoration.
+class ModuleFinder(object):  # pylint: disable=too-many-instance-attributes
     '''
     Module finder and loader. When installed, modules will be
     automatically decorated with the supplied decorator.
 
-    The `decorator` is the decorator function to apply.
+    The decorators to apply and how are given in `options`, see
+    :class:`typesafety.options.DecorationOptions` and
+    :class:`typesafety.autodecorator.ModuleDecorator`.
+
+    If `cache_dir` is given, the code generated for the decorated modules
+    is stored there and reused by later processes, see
+    :class:`typesafety.plancache.PlanCache`.
+
+    If `prescan` is True, only the annotated definitions found in the
+    source of the modules are visited, see :mod:`typesafety.prescan`.
+
+    Classes and functions reachable from several modules are decorated
+    only once, the duplicates skipped are counted in :attr:`visited`.
+
+    If `deferred` is True, modules are returned undecorated and decorated
+    by a background thread, which replaces their functions with the
+    checked ones one by one. References taken before that, such as names
+    imported by other modules in the meantime, stay unchecked. Use
+    :meth:`wait_ready` to wait until every loaded module is decorated.
+
+    If `in_place` is True, the functions of the modules are patched in
+    place instead of being replaced, see :mod:`typesafety.patching`.
+
+    Reloaded modules (for example with `importlib.reload`) are decorated
+    again, reusing the decorated versions of the functions that did not
+    change since the previous load.
 
     The `filter` argument is a filter function that should return
     True if the given module should be decorated. This function takes
@@ -76,14 +109,28 @@ class ModuleFinder(object):
 
     * The full name of the module and
     * the module object itself (after import).
+
+    Modules may be imported from several threads at once, the set of
+    loaded modules is guarded by a lock.
     '''
 
-    __decorator = None
+    __options = None
+    __plan_cache = None
+    __background = None
+    __queue = None
     __filter = None
     __loaded_modules = None
+    __decorations = None
+    __visited = None
 
-    def __init__(self, decorator):
-        self.__decorator = decorator
+    def __init__(self, options):
+        self.__options = options
+        if options.cache_dir is not None:
+            self.__plan_cache = PlanCache(options.cache_dir)
+
+        self.__pending = []
+
+        self.__lock = threading.Lock()
         self.__reset()
 
     @property
@@ -94,6 +141,15 @@ class ModuleFinder(object):
 
         return self in sys.meta_path
 
+    @property
+    def visited(self):
+        '''
+        The :class:`typesafety.autodecorator.VisitedSet` of the classes and
+        functions decorated by this finder.
+        '''
+
+        return self.__visited
+
     def set_filter(self, filter_func):
         '''
         Set the module filter function.
@@ -123,17 +179,28 @@ class ModuleFinder(object):
         if self.installed:
             sys.meta_path.remove(self)
 
+        with self.__lock:
+            background = self.__background
+            modules = self.__queue
+            self.__background = None
+            self.__pending = []
+
+        # Let the background thread decorate the modules queued before
+        if background is not None:
+            modules.put(None)
+            background.join()
+
         # Reload all decorated items
-        import_list = []
-        for name in self.__loaded_modules:
+        with self.__lock:
+            import_list = list(self.__loaded_modules)
+            self.__reset()
+
+        for name in import_list:
             del sys.modules[name]
-            import_list.append(name)
 
         for name in import_list:
             __import__(name)
 
-        self.__reset()
-
     def find_module(self, fullname, path=None):
         '''
         Find the module. Required for the Python meta-loading mechanism.
@@ -153,6 +220,11 @@ class ModuleFinder(object):
         '''
 
         modfile, pathname, description = loader.info
+        previous_module = sys.modules.get(loader.fullname)
+        if previous_module is not None:
+            # Reloaded, the string annotations may refer to the new contents
+            Validator.forget_module(previous_module)
+
         module = imp.load_module(
             loader.fullname,
             modfile,
@@ -160,14 +232,98 @@ class ModuleFinder(object):
             description
         )
         sys.modules[loader.fullname] = module
-        self.__loaded_modules.add(loader.fullname)
-
-        autodecorator.decorate_module(module, decorator=self.__decorator)
+        with self.__lock:
+            self.__loaded_modules.add(loader.fullname)
+            if self.__options.deferred:
+                self.__pending.append(self.__submit(module))
+                return module
 
+        self.__decorate(module)
         return module
 
+    def wait_ready(self, timeout=None):
+        '''
+        Wait until the modules loaded so far are decorated, at most
+        `timeout` seconds if given. Return False if the time ran out.
+        Errors raised while decorating a module in the background are
+        raised here.
+        '''
+
+        with self.__lock:
+            pending = self.__pending
+            self.__pending = []
+
+        done, not_done = concurrent.futures.wait(pending, timeout=timeout)
+        if not_done:
+            with self.__lock:
+                self.__pending = list(not_done) + self.__pending
+
+        for future in done:
+            future.result()
+
+        return not not_done
+
+    def __submit(self, module):
+        # A daemon thread is used instead of an executor, so exiting the
+        # process does not wait for the modules still queued
+        if self.__background is None:
+            self.__queue = queue.Queue()
+            self.__background = threading.Thread(
+                target=self.__run_background,
+                args=(self.__queue,),
+                name='typesafety-deferred',
+                daemon=True
+            )
+            self.__background.start()
+
+        future = concurrent.futures.Future()
+        self.__queue.put((future, module))
+        return future
+
+    def __run_background(self, modules):
+        while True:
+            item = modules.get()
+            if item is None:
+                return
+
+            future, module = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                self.__decorate(module)
+
+            # Raised to the caller of wait_ready()
+            except BaseException as error:  # pylint: disable=broad-except
+                future.set_exception(error)
+
+            else:
+                future.set_result(module)
+
+    def __decorate(self, module):
+        with self.__lock:
+            previous = self.__decorations.get(module.__name__)
+
+        index = prescanner.get_index(module) if self.__options.prescan else None
+        cache_scope = contextlib.ExitStack()
+        if self.__plan_cache is not None:
+            cache_scope = self.__plan_cache.module(module)
+
+        with cache_scope:
+            module_decorator = autodecorator.ModuleDecorator(
+                self.__options,
+                visited=self.__visited,
+                previous=previous
+            )
+            module_decorator.decorate(module, index=index)
+
+        with self.__lock:
+            self.__decorations[module.__name__] = module_decorator.decorations
+
     def __reset(self):
         self.__loaded_modules = set()
+        self.__decorations = {}
+        self.__visited = autodecorator.VisitedSet()
 
 
 importlib.abc.Loader.register(ModuleLoader)
@@ -0,0 +1,192 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+The options of the type safety checker.
+
+:class:`Options` holds what :meth:`typesafety.Typesafety.activate` is
+asked for, :class:`DecorationOptions` what the module finder and the
+module decorators built from them need.
+'''
+
+import importlib
+import json
+import typing
+
+
+class Options(typing.NamedTuple):
+    '''
+    The options of :meth:`typesafety.Typesafety.activate`.
+
+    The `filter_func` is called with the name of each imported module and
+    returns True if the module should be checked. All of them are checked
+    if it is None.
+
+    If `check_attributes` is True, assignments to attributes annotated
+    in class bodies are checked as well.
+
+    If `boundary_only` is True, calls are only checked when they come
+    from outside of the top level package of the called function, so
+    a package calling its own functions pays no checking cost. Property
+    accessors are always checked.
+
+    If `public_only` is True, functions and methods whose name starts
+    with an underscore are not checked at all.
+
+    If `enabled` is False, the functions are decorated but calls are
+    only checked in :func:`typesafety.checking` scopes.
+
+    If `shadow` is True, calls are checked in a background thread and
+    violations are only recorded in
+    :attr:`typesafety.Typesafety.shadow_checker`, see
+    :mod:`typesafety.shadow`. The `boundary_only` option has no effect
+    in this mode.
+
+    If `report_path` is given, the violations found in the shadow mode
+    by this process and its child processes are collected in that file,
+    see :attr:`typesafety.Typesafety.report`.
+
+    If `cache_dir` is given, the code generated for the checks is
+    cached in that directory across processes.
+
+    If `prescan` is True, the source of each imported module is scanned
+    for annotated definitions and only those are visited, see
+    :mod:`typesafety.prescan`. Functions created at runtime are then
+    not checked.
+
+    If `deferred` is True, imported modules are decorated by a
+    background thread, so imports return sooner. Names imported from a
+    module before it is decorated are not checked. Call
+    :func:`typesafety.wait_ready` where every module has to be checked,
+    such as in tests.
+
+    If `in_place` is True, the code of the imported functions is
+    patched instead of the functions being replaced by wrappers, so
+    references taken before decoration are checked too, see
+    :mod:`typesafety.patching`. Combined with `deferred`, names imported
+    before the background decoration are checked as well.
+
+    If `call_stack_depth` is positive, the violations found in the
+    shadow mode record that many frames of their callers, see
+    :class:`typesafety.shadow.ShadowChecker`. Violations raised in the
+    caller always record theirs, see
+    :attr:`typesafety.validator.Validator.CALL_STACK_DEPTH`.
+    '''
+
+    filter_func: typing.Optional[typing.Callable[[str], bool]] = None
+    check_attributes: bool = False
+    boundary_only: bool = False
+    public_only: bool = False
+    enabled: bool = True
+    shadow: bool = False
+    report_path: typing.Optional[str] = None
+    cache_dir: typing.Optional[str] = None
+    prescan: bool = False
+    deferred: bool = False
+    in_place: bool = False
+    call_stack_depth: int = 0
+
+    def encode(self):
+        '''
+        Return the options as a JSON string, see :meth:`decode`. The
+        `filter_func` is stored as its dotted import path, so it has to be
+        a module level function. Raises ValueError if the options cannot be
+        encoded.
+        '''
+
+        fields = self._asdict()
+        if self.filter_func is not None:
+            fields['filter_func'] = self.__get_import_path(self.filter_func)
+
+        try:
+            return json.dumps(fields)
+
+        except TypeError as error:
+            raise ValueError('The options cannot be encoded: {}'.format(error)) from None
+
+    @classmethod
+    def decode(cls, text):
+        '''
+        Return the options encoded by :meth:`encode`, importing the module
+        of the `filter_func`.
+        '''
+
+        fields = json.loads(text)
+        if fields.get('filter_func') is not None:
+            fields['filter_func'] = cls.__import(fields['filter_func'])
+
+        return cls(**fields)
+
+    @classmethod
+    def __get_import_path(cls, function):
+        path = '{}.{}'.format(getattr(function, '__module__', None), getattr(function, '__qualname__', None))
+        try:
+            if cls.__import(path) is function:
+                return path
+
+        except (ImportError, AttributeError, ValueError):
+            pass
+
+        raise ValueError('{!r} is not a module level function'.format(function))
+
+    @staticmethod
+    def __import(path):
+        module_name, _, name = path.rpartition('.')
+        return getattr(importlib.import_module(module_name), name)
+
+
+class DecorationOptions(typing.NamedTuple):
+    '''
+    How the modules are decorated by a
+    :class:`typesafety.finder.ModuleFinder` and the
+    :class:`typesafety.autodecorator.ModuleDecorator` instances it uses.
+
+    The `decorator` is applied to functions. The optional
+    `class_decorator` is called with each class after its methods have
+    been decorated, and should modify the class in place. The optional
+    `method_decorator` is applied instead of `decorator` to the functions
+    found in classes, with the `receiver` keyword argument, which is True
+    if the first parameter of the function is bound to the instance or
+    the class. The optional `property_decorator` is called with each
+    property and returns its replacement; without it the accessors of the
+    property are decorated one by one.
+
+    If `public_only` is True, functions, methods and properties whose
+    name starts with an underscore are left alone, as they are not part of
+    the public interface. Special methods like `__init__` are still
+    decorated.
+
+    If `in_place` is True, functions and methods are patched in place with
+    :func:`typesafety.patching.patch_function` instead of being replaced,
+    so references to them taken before are checked as well.
+
+    The `cache_dir`, `prescan` and `deferred` options are only used by the
+    module finder, see :class:`Options`.
+    '''
+
+    decorator: typing.Callable
+    class_decorator: typing.Optional[typing.Callable] = None
+    method_decorator: typing.Optional[typing.Callable] = None
+    property_decorator: typing.Optional[typing.Callable] = None
+    public_only: bool = False
+    in_place: bool = False
+    cache_dir: typing.Optional[str] = None
+    prescan: bool = False
+    deferred: bool = False
+
+
+__all__ = ['DecorationOptions', 'Options']
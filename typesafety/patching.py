@@ -0,0 +1,201 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Check calls by patching the code of functions instead of replacing them.
+
+Decorating a module normally replaces its functions with checking
+wrappers, so references taken before (names imported earlier, registered
+callbacks, dispatch tables) bypass the checks. :func:`patch_function`
+keeps the function object and replaces its code with a trampoline calling
+the checking wrapper of a copy of the original function. The identity,
+signature, defaults and attributes of the function are kept, and every
+reference to it is checked.
+
+Generator and coroutine functions, and functions whose code cannot be
+replaced, are decorated the usual way.
+'''
+
+import inspect
+import types
+import warnings
+
+# Placeholder for the wrapper in the constants of the trampoline
+TARGET = '__typesafety_target__'
+
+# The file name of the code of the trampolines
+TRAMPOLINE_FILENAME = '<typesafety trampoline>'
+
+# The trampoline of a generator or coroutine function would change its kind
+UNPATCHABLE_FLAGS = inspect.CO_GENERATOR | inspect.CO_COROUTINE | inspect.CO_ASYNC_GENERATOR | \
+    inspect.CO_ITERABLE_COROUTINE
+
+# Code of the trampolines keyed by their source
+__trampolines = {}
+
+
+def patch_function(function, *, decorator, **kwargs):
+    '''
+    Make `function` check its calls like `decorator(function, **kwargs)`
+    would, in place, and return it. If that is not possible the result of
+    the decorator is returned.
+
+    When the function is patched, its wrapper is called by the trampoline,
+    one frame further from the caller of the function. The decorator is
+    then called with `caller_depth=2` as well (see
+    :meth:`typesafety.validator.Validator.decorate`), so it must accept
+    that keyword argument.
+    '''
+
+    if not isinstance(function, types.FunctionType) or function.__code__.co_flags & UNPATCHABLE_FLAGS:
+        return decorator(function, **kwargs)
+
+    # The closure of the function is kept, so the free variables of the
+    # trampoline must be the same and in the same order
+    code = function.__code__
+    trampoline = __compile_trampoline(__generate_trampoline_source(code))
+    if trampoline.co_freevars != code.co_freevars:
+        return decorator(function, **kwargs)
+
+    original = copy_function(function)
+    wrapper = decorator(original, caller_depth=2, **kwargs)
+    if wrapper is original:
+        return function
+
+    function.__code__ = __set_target(trampoline, code, wrapper)
+    validator = getattr(wrapper, '__validator__', None)
+    if validator is not None:
+        function.__validator__ = validator
+
+    return function
+
+
+def is_patched(function):
+    '''
+    Return True if `function` was patched by :func:`patch_function`.
+    '''
+
+    return isinstance(function, types.FunctionType) and function.__code__.co_filename == TRAMPOLINE_FILENAME
+
+
+def copy_patch(patched, function):
+    '''
+    Patch `function` to call the wrapper of `patched` and return it. The
+    function must have the same code as the one `patched` was patched from,
+    and no closure, such as the same function of a reloaded module.
+    '''
+
+    function.__code__ = patched.__code__
+    validator = getattr(patched, '__validator__', None)
+    if validator is not None:
+        function.__validator__ = validator
+
+    return function
+
+
+def copy_function(function):
+    '''
+    Return a new function with the code, closure and attributes of
+    `function`.
+    '''
+
+    copy = types.FunctionType(
+        function.__code__,
+        function.__globals__,
+        function.__name__,
+        function.__defaults__,
+        function.__closure__
+    )
+    copy.__kwdefaults__ = function.__kwdefaults__
+    copy.__qualname__ = function.__qualname__
+    copy.__module__ = function.__module__
+    copy.__doc__ = function.__doc__
+    copy.__annotations__ = dict(function.__annotations__)
+    copy.__dict__.update(function.__dict__)
+    return copy
+
+
+def __set_target(trampoline, code, wrapper):
+    constants = tuple(wrapper if constant == TARGET else constant for constant in trampoline.co_consts)
+    changes = {'co_consts': constants, 'co_name': code.co_name}
+    if hasattr(code, 'co_qualname'):
+        changes['co_qualname'] = code.co_qualname
+
+    return trampoline.replace(**changes)
+
+
+def __compile_trampoline(source):
+    trampoline = __trampolines.get(source)
+    if trampoline is None:
+        with warnings.catch_warnings():
+            # The placeholder is called like a function, so it is loaded
+            # as a constant, which the compiler warns about
+            warnings.simplefilter('ignore', SyntaxWarning)
+            module = compile(source, TRAMPOLINE_FILENAME, 'exec')
+
+        make = __get_nested_code(module)
+        trampoline = __get_nested_code(make)
+        __trampolines[source] = trampoline
+
+    return trampoline
+
+
+def __get_nested_code(code):
+    return next(constant for constant in code.co_consts if isinstance(constant, types.CodeType))
+
+
+def __generate_trampoline_source(code):
+    names = code.co_varnames
+    positional_count = code.co_argcount
+    keyword_only_count = code.co_kwonlyargcount
+
+    parameters = list(names[:positional_count])
+    arguments = list(parameters)
+    positional_only_count = getattr(code, 'co_posonlyargcount', 0)
+    if positional_only_count:
+        parameters.insert(positional_only_count, '/')
+
+    index = positional_count + keyword_only_count
+    if code.co_flags & inspect.CO_VARARGS:
+        parameters.append('*' + names[index])
+        arguments.append('*' + names[index])
+        index += 1
+
+    elif keyword_only_count:
+        parameters.append('*')
+
+    for name in names[positional_count:positional_count + keyword_only_count]:
+        parameters.append(name)
+        arguments.append('{0}={0}'.format(name))
+
+    if code.co_flags & inspect.CO_VARKEYWORDS:
+        parameters.append('**' + names[index])
+        arguments.append('**' + names[index])
+
+    lines = ['def __make({}):'.format(', '.join(code.co_freevars))]
+    lines.append('    def __trampoline({}):'.format(', '.join(parameters)))
+    if code.co_freevars:
+        # Never run, only makes the closure variables free in the trampoline
+        lines.append('        if 0:')
+        lines.append('            ({},)'.format(', '.join(code.co_freevars)))
+
+    lines.append('        return {!r}({})'.format(TARGET, ', '.join(arguments)))
+    lines.append('    return __trampoline')
+    return '\n'.join(lines) + '\n'
+
+
+__all__ = ['copy_function', 'copy_patch', 'is_patched', 'patch_function']
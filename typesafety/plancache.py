@@ -0,0 +1,197 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Cache the code of the generated wrappers, in memory and on disk.
+
+Compiling the source of the generated wrappers is the most expensive part
+of decorating a function. Functions with the same parameters and checks
+get the same source, so the compiled code is shared through
+:data:`CODE_CACHE`. A :class:`PlanCache` stores the code used by each
+module in a cache directory, much like `__pycache__`, so later processes
+load it instead of compiling it again. The files are keyed by the source
+path, its modification time and size, and the Python version.
+'''
+
+import contextlib
+import marshal
+import os
+import os.path
+import sys
+import tempfile
+import threading
+
+# Bumped whenever the generated code changes in an incompatible way
+FORMAT_VERSION = 1
+
+
+class CodeCache(object):
+    '''
+    Compiled code objects keyed by their source.
+
+    While a :meth:`recording` is active, every code compiled or found in
+    the cache is recorded in it as well, from any thread.
+    '''
+
+    def __init__(self):
+        self.__codes = {}
+        self.__lock = threading.Lock()
+        self.__recorders = ()
+
+    def compile(self, source, filename):
+        code = self.__codes.get(source)
+        if code is None:
+            code = compile(source, filename, 'exec')
+            self.__codes[source] = code
+
+        for recorder in self.__recorders:
+            recorder[source] = code
+
+        return code
+
+    def update(self, codes):
+        self.__codes.update(codes)
+
+    def clear(self):
+        self.__codes.clear()
+
+    def __len__(self):
+        return len(self.__codes)
+
+    @contextlib.contextmanager
+    def recording(self):
+        '''
+        Collect the codes used in the scope into the yielded dictionary.
+        '''
+
+        recorder = {}
+        with self.__lock:
+            self.__recorders += (recorder,)
+
+        try:
+            yield recorder
+
+        finally:
+            with self.__lock:
+                self.__recorders = tuple(entry for entry in self.__recorders if entry is not recorder)
+
+
+CODE_CACHE = CodeCache()
+
+
+class PlanCache(object):
+    '''
+    Persist the generated code used by modules in `directory`.
+
+    Only the code generated while a module is decorated is stored, the
+    wrappers of functions with string annotations are compiled on their
+    first call and are not cached.
+    '''
+
+    def __init__(self, directory, *, code_cache=CODE_CACHE):
+        self.__directory = directory
+        self.__code_cache = code_cache
+
+    @contextlib.contextmanager
+    def module(self, module):
+        '''
+        Load the cached code of `module` before decorating it in the
+        scope, and store the code used when the scope ends if it was not
+        cached yet.
+        '''
+
+        key = get_source_key(module)
+        if key is None:
+            yield
+            return
+
+        path = self.__get_path(module)
+        cached = load_cached(path, key) or {}
+        if cached:
+            self.__code_cache.update(cached)
+
+        with self.__code_cache.recording() as codes:
+            yield
+
+        if codes and codes.keys() != cached.keys():
+            save_cached(path, key, dict(codes))
+
+    def __get_path(self, module):
+        return os.path.join(
+            self.__directory,
+            '{}.{}.typesafety'.format(module.__name__, sys.implementation.cache_tag)
+        )
+
+
+def get_source_key(module):
+    '''
+    The key identifying the version of the source of `module`, or None if
+    it was not loaded from a file.
+    '''
+
+    filename = getattr(module, '__file__', None)
+    try:
+        stat = os.stat(filename)
+
+    except (TypeError, OSError):
+        return None
+
+    return (FORMAT_VERSION, os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+
+
+def load_cached(path, key):
+    '''
+    Load the data stored in `path` by :func:`save_cached` if it was stored
+    with the same `key`, otherwise return None.
+    '''
+
+    try:
+        with open(path, 'rb') as cache_file:
+            cached_key, data = marshal.load(cache_file)
+
+    # A missing, truncated or foreign file is simply a cache miss
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if tuple(cached_key) != key:
+        return None
+
+    return data
+
+
+def save_cached(path, key, data):
+    '''
+    Store the marshallable `data` in `path` along with `key`.
+    '''
+
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first, so concurrent readers never
+        # see a partial cache file
+        descriptor, temporary = tempfile.mkstemp(dir=directory)
+        with os.fdopen(descriptor, 'wb') as cache_file:
+            marshal.dump((key, data), cache_file)
+
+        os.replace(temporary, path)
+
+    # The cache is an optimization, failing to write it is not an error
+    except OSError:
+        pass
+
+
+__all__ = ['CODE_CACHE', 'CodeCache', 'PlanCache', 'get_source_key', 'load_cached', 'save_cached']
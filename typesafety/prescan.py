@@ -0,0 +1,155 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Find the annotated functions and classes of a module from its source.
+
+Decorating a module visits every function and class in it, although only
+the annotated ones are checked. :func:`get_index` parses the source of the
+module once and returns the names worth visiting, so the others can be
+skipped. The index is cached in `__pycache__` next to the bytecode of the
+module and is computed again only if the source changes.
+
+Functions and classes created at runtime without a definition in the
+source (for example with `type()` or by a factory assigned to a name)
+are not in the index.
+'''
+
+import ast
+import importlib.util
+import os.path
+import sys
+import tokenize
+
+from typesafety.plancache import get_source_key, load_cached, save_cached
+
+# Bumped whenever the layout of the index changes
+INDEX_VERSION = 1
+
+
+def get_index(module):
+    '''
+    Return the index of the annotated definitions of `module`, or None if
+    it has no Python source to scan.
+
+    The index maps the names of the annotated functions and classes to
+    None if everything in them has to be visited, or, for classes whose
+    body has no annotations of its own, to the index of their members.
+    '''
+
+    filename = getattr(module, '__file__', None)
+    key = get_source_key(module)
+    if key is None or not filename.endswith('.py'):
+        return None
+
+    key += (INDEX_VERSION,)
+    path = __get_cache_path(filename)
+    if path is not None:
+        index = load_cached(path, key)
+        if index is not None:
+            return index
+
+    try:
+        with tokenize.open(filename) as source_file:
+            tree = ast.parse(source_file.read(), filename)
+
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+    index = scan(tree.body)
+    if path is not None and not sys.dont_write_bytecode:
+        save_cached(path, key, index)
+
+    return index
+
+
+def scan(statements):
+    '''
+    Build the index of the annotated definitions in `statements`, a list
+    of AST nodes.
+    '''
+
+    index = {}
+    for node in __iterate_definitions(statements):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if __is_function_annotated(node):
+                index[node.name] = None
+
+        elif __has_own_annotations(node):
+            index[node.name] = None
+
+        else:
+            members = scan(node.body)
+            if members:
+                # A name may be defined more than once, keep what was found
+                if node.name not in index:
+                    index[node.name] = members
+
+                elif index[node.name] is not None:
+                    index[node.name].update(members)
+
+    return index
+
+
+def __get_cache_path(filename):
+    try:
+        bytecode = importlib.util.cache_from_source(filename)
+
+    except NotImplementedError:
+        return None
+
+    return os.path.splitext(bytecode)[0] + '.typesafety-index'
+
+
+def __iterate_definitions(statements):
+    # Definitions nested in conditions or error handling at the top level
+    # of the scope still end up in its namespace
+    for node in statements:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            yield node
+
+        elif isinstance(node, (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith)):
+            yield from __iterate_definitions(node.body)
+            yield from __iterate_definitions(node.orelse if hasattr(node, 'orelse') else [])
+
+        elif isinstance(node, ast.Try):
+            yield from __iterate_definitions(node.body)
+            for handler in node.handlers:
+                yield from __iterate_definitions(handler.body)
+
+            yield from __iterate_definitions(node.orelse)
+            yield from __iterate_definitions(node.finalbody)
+
+
+def __is_function_annotated(node):
+    arguments = node.args
+    parameters = getattr(arguments, 'posonlyargs', []) + arguments.args + arguments.kwonlyargs + \
+        [arguments.vararg, arguments.kwarg]
+
+    return node.returns is not None or any(
+        parameter is not None and parameter.annotation is not None
+        for parameter in parameters
+    )
+
+
+def __has_own_annotations(node):
+    # Annotated attributes are checked by the class decorator, and record
+    # types generate their constructor from them
+    return any(isinstance(statement, ast.AnnAssign) for statement in node.body)
+
+
+__all__ = ['get_index', 'scan']
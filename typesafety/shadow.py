@@ -0,0 +1,299 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Check calls in a background thread instead of in the caller.
+
+A function decorated by a :class:`ShadowChecker` only records references
+to its arguments and return value in a bounded queue; a background thread
+checks them with :meth:`typesafety.validator.Validator.validate_arguments`
+and :meth:`typesafety.validator.Validator.validate_return_value` and
+records the violations. When the queue is full the sample is dropped, the
+caller never waits.
+
+This is best effort: the values are checked some time after the call, so
+a mutable value changed in the meantime is checked in its changed state,
+and violations are only reported, never raised in the caller. Since the
+caller is gone by the time a violation is found, its frames have to be
+recorded with every queued call if the violations should carry a call
+stack, see the `call_stack_depth` argument of :class:`ShadowChecker`.
+'''
+
+import collections
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+import weakref
+
+from typesafety.callstack import get_call_stack
+from typesafety.context import FULL, OFF, get_mode
+from typesafety.counter import ShardedCounter
+from typesafety.validator import Validator, TypesafetyError
+
+
+# Holds its settings, the queue, the worker thread and the statistics.
+class ShadowChecker(object):  # pylint: disable=too-many-instance-attributes
+    '''
+    Decorator checking calls in a background thread.
+
+    At most `queue_size` calls wait to be checked, further calls are
+    counted in :attr:`dropped` and not checked. The last
+    `violation_limit` violations are kept in :attr:`violations`, and each
+    one is passed to `on_violation` as well, if given. The worker polls the
+    queue every `interval` seconds when it is empty.
+
+    The worker checks at most `batch_size` calls at a time and then lets
+    the other threads run, so the callers never wait for it longer than a
+    batch takes. Without that, a caller wanting the GIL back would wait for
+    the whole switch interval of the interpreter (5 ms by default) while
+    the worker drains the queue.
+
+    If `call_stack_depth` is positive, the callers of each queued call are
+    recorded, at most that many frames, and set as the `call_stack` of its
+    violations. Unlike in the checks done in the caller, this is paid by
+    every queued call, so it is disabled by default.
+
+    In a forked child process the checker starts over, see
+    :meth:`after_fork`.
+    '''
+
+    def __init__(self, *, queue_size=10000, violation_limit=100,  # pylint: disable=too-many-arguments
+                 on_violation=None, interval=0.01, call_stack_depth=0, batch_size=16):
+        self.__queue = collections.deque()
+        self.__queue_size = queue_size
+        self.__batch_size = batch_size
+        self.__violations = collections.deque(maxlen=violation_limit)
+        self.__on_violation = on_violation
+        self.__interval = interval
+        self.__call_stack_depth = call_stack_depth
+        self.__signatures = weakref.WeakKeyDictionary()
+        self.__stopped = threading.Event()
+        self.__thread = None
+        self.__thread_lock = threading.Lock()
+        self.__checked = ShardedCounter()
+        self.__dropped = ShardedCounter()
+        self.__violation_count = ShardedCounter()
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=functools.partial(self.__after_fork_of, weakref.ref(self)))
+
+    @property
+    def violations(self):
+        '''
+        The last violations as `(function, TypesafetyError)` pairs.
+        '''
+
+        return list(self.__violations)
+
+    @property
+    def violation_count(self):
+        return self.__violation_count.value
+
+    @property
+    def checked(self):
+        return self.__checked.value
+
+    @property
+    def dropped(self):
+        return self.__dropped.value
+
+    @property
+    def running(self):
+        return self.__thread is not None
+
+    def decorate(self, function, *, receiver=False, enabled=True, caller_depth=1):
+        '''
+        Decorate `function` so its calls are queued for checking. The
+        function itself is returned if there is nothing to check.
+
+        If `enabled` is False, calls are only queued in
+        :func:`typesafety.context.checking` scopes.
+
+        The `caller_depth` is the number of frames between the wrapper and
+        the first frame of the call stack recorded, see
+        :meth:`typesafety.validator.Validator.decorate`.
+        '''
+
+        should_skip = getattr(function, 'typesafety_skip', False)
+        if Validator.is_function_validated(function) or should_skip:
+            return function
+
+        validator = Validator(function, receiver=receiver)
+        # String annotations may refer to names defined later, they are
+        # resolved by the worker when the first call is checked
+        if not validator.pending_annotations and \
+                not validator.need_validate_arguments and not validator.need_validate_return_value:
+            return function
+
+        queue = self.__queue
+        default_mode = FULL if enabled else OFF
+        call_stack_depth = self.__call_stack_depth
+
+        @functools.wraps(function)
+        def __wrapper(*args, **kwargs):
+            retval = function(*args, **kwargs)
+            if get_mode(default_mode) is not OFF:
+                # The length check and the append are not atomic together,
+                # so concurrent callers may overfill the queue slightly
+                if len(queue) < self.__queue_size:
+                    call_stack = ()
+                    if call_stack_depth:
+                        frame = sys._getframe(caller_depth)  # pylint: disable=protected-access
+                        call_stack = get_call_stack(frame, call_stack_depth)
+
+                    queue.append((validator, args, kwargs, retval, call_stack))
+
+                else:
+                    self.__dropped.increment()
+
+            return retval
+
+        __wrapper.__validator__ = validator
+        return __wrapper
+
+    def start(self):
+        '''
+        Start the background thread. Calls made before are checked once
+        it is started.
+        '''
+
+        with self.__thread_lock:
+            if self.__thread is not None:
+                return
+
+            self.__stopped.clear()
+            self.__thread = threading.Thread(target=self.__run, name='typesafety-shadow', daemon=True)
+            self.__thread.start()
+
+    def stop(self):
+        '''
+        Check the queued calls and stop the background thread.
+        '''
+
+        with self.__thread_lock:
+            if self.__thread is None:
+                return
+
+            self.__stopped.set()
+            self.__thread.join()
+            self.__thread = None
+
+    def after_fork(self):
+        '''
+        Reset the state copied from the parent process. Called in forked
+        child processes automatically: the samples queued by the parent
+        are left to the parent, the counters and violations start from
+        zero, and the background thread, which does not survive a fork, is
+        restarted if it was running.
+        '''
+
+        running = self.__thread is not None
+        self.__queue.clear()
+        self.__violations.clear()
+        self.__stopped = threading.Event()
+        self.__thread = None
+        self.__thread_lock = threading.Lock()
+        self.__checked = ShardedCounter()
+        self.__dropped = ShardedCounter()
+        self.__violation_count = ShardedCounter()
+        if running:
+            self.start()
+
+    @staticmethod
+    def __after_fork_of(reference):
+        checker = reference()
+        if checker is not None:
+            checker.after_fork()
+
+    def flush(self):
+        '''
+        Check the queued calls in the calling thread.
+        '''
+
+        while self.__check_next():
+            pass
+
+    def __run(self):
+        while not self.__stopped.is_set():
+            if not self.__check_batch():
+                self.__stopped.wait(self.__interval)
+
+            else:
+                # Releases the GIL, so a waiting caller takes it right away
+                time.sleep(0)
+
+        self.flush()
+
+    def __check_batch(self):
+        # Returns False if the queue was empty
+        checked = 0
+        while checked < self.__batch_size and self.__check_next():
+            checked += 1
+
+        return checked > 0
+
+    def __check_next(self):
+        try:
+            validator, args, kwargs, retval, call_stack = self.__queue.popleft()
+
+        except IndexError:
+            return False
+
+        try:
+            self.__check(validator, args, kwargs, retval)
+
+        except TypesafetyError as error:
+            # The frames seen by the check are those of this thread
+            error.call_stack = call_stack
+            self.__record_violation(validator.function, error)
+
+        # A failing checker must not stop the worker
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+        self.__checked.increment()
+        return True
+
+    def __check(self, validator, args, kwargs, retval):
+        signature = self.__signatures.get(validator)
+        if signature is None:
+            signature = inspect.signature(validator.function, follow_wrapped=False)
+            self.__signatures[validator] = signature
+
+        try:
+            arguments = signature.bind(*args, **kwargs)
+
+        except TypeError:
+            # The call has failed already, there is nothing to check
+            return
+
+        arguments.apply_defaults()
+        validator.validate_arguments(arguments.arguments)
+        validator.validate_return_value(retval)
+
+    def __record_violation(self, function, error):
+        # Appending to a bounded deque is atomic, older entries are dropped
+        self.__violation_count.increment()
+        self.__violations.append((function, error))
+        if self.__on_violation is not None:
+            self.__on_violation(function, error)
+
+
+__all__ = ['ShadowChecker']
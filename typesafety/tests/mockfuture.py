@@ -0,0 +1,40 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+from __future__ import annotations
+
+import typing
+
+
+def make_node(value: int, parent: typing.Optional[Node] = None) -> Node:
+    return Node(value, parent)
+
+
+# Refers to a name that is never defined, resolving it must fail
+def broken(value: Undefined) -> int:  # pylint: disable=undefined-variable
+    return value
+
+
+class Node(object):
+    def __init__(self, value: int, parent: typing.Optional[Node]):
+        self.value = value
+        self.parent = parent
+
+
+class Tree(object):
+    root: typing.Optional[Node] = None
+    size: int = 0
@@ -0,0 +1,36 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+import dataclasses
+import typing
+
+
+class Point(typing.NamedTuple):
+    column: int
+    row: int = 0
+
+
+@dataclasses.dataclass
+class Pixel(object):
+    point: Point
+    color: str = 'black'
+
+
+@dataclasses.dataclass(frozen=True)
+class Frozen(object):
+    __slots__ = ('name',)
+    name: str
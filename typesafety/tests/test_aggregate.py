@@ -0,0 +1,98 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+from typesafety.aggregate import ViolationReport
+from typesafety.shadow import ShadowChecker
+
+CHECKER = None
+
+
+def func(arg: int) -> int:
+    return arg
+
+
+def call_checked(arg):
+    return CHECKER.decorate(func)(arg)
+
+
+class TestViolationReport(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self._path = os.path.join(directory, 'violations.jsonl')
+
+    def test_violations_are_limited_per_process(self):
+        report = ViolationReport(self._path, limit=2)
+        checker = ShadowChecker(on_violation=report.record)
+        report.attach(checker)
+        self.addCleanup(report.detach)
+        decorated = checker.decorate(func)
+        for value in (1, 'a', 'b', 'c'):
+            decorated(value)
+
+        report.write_statistics()
+        self.assertEqual(
+            {
+                'processes': [os.getpid()],
+                'checked': 4,
+                'dropped': 0,
+                'violations': 3,
+                'functions': {__name__ + '.func': 2},
+            },
+            report.read()
+        )
+
+    def test_violations_record_the_call_stack(self):
+        report = ViolationReport(self._path)
+        checker = ShadowChecker(on_violation=report.record, call_stack_depth=1)
+        checker.decorate(func)('a')
+        checker.flush()
+
+        with open(self._path) as records:
+            entry, = [json.loads(line) for line in records]
+        self.assertEqual([[__file__, unittest.mock.ANY, 'test_violations_record_the_call_stack']], entry['call_stack'])
+
+    def test_missing_report_is_empty(self):
+        self.assertEqual(0, ViolationReport(self._path).read()['violations'])
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs fork')
+    def test_violations_of_forked_workers_are_merged(self):
+        global CHECKER  # pylint: disable=global-statement
+        report = ViolationReport(self._path)
+        CHECKER = ShadowChecker(on_violation=report.record)
+        self.addCleanup(CHECKER.stop)
+        report.attach(CHECKER)
+        self.addCleanup(report.detach)
+        CHECKER.start()
+
+        with multiprocessing.get_context('fork').Pool(2) as pool:
+            self.assertEqual([1, 'a', 2, 'b'], pool.map(call_checked, [1, 'a', 2, 'b'], chunksize=1))
+            pool.close()
+            pool.join()
+
+        merged = report.read()
+        self.assertNotIn(os.getpid(), merged['processes'])
+        self.assertEqual(4, merged['checked'])
+        self.assertEqual(2, merged['violations'])
+        self.assertEqual({__name__ + '.func': 2}, merged['functions'])
@@ -0,0 +1,114 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+import dataclasses
+import typing
+import unittest
+
+from typesafety.attributes import TypedAttribute, decorate_attributes
+from typesafety.validator import TypesafetyError
+
+
+class TestDecorateAttributes(unittest.TestCase):
+    def test_assignment_is_checked(self):
+        class Plain(object):
+            count: int
+            name: typing.Optional[str] = None
+
+        decorate_attributes(Plain)
+        obj = Plain()
+        obj.count = 1
+        self.assertEqual(1, obj.count)
+        self.assertIsNone(obj.name)
+        self.assertIsNone(Plain.name)
+        self.assertRaises(AttributeError, getattr, Plain(), 'count')
+
+        with self.assertRaises(TypesafetyError) as context:
+            obj.count = 'one'
+        self.assertIn("Attribute 'count' of class 'Plain'", str(context.exception))
+
+    def test_slots(self):
+        class Slotted(object):
+            __slots__ = ('value',)
+            value: float
+
+        decorate_attributes(Slotted)
+        self.assertIsInstance(Slotted.__dict__['value'], TypedAttribute)
+
+        obj = Slotted()
+        obj.value = 1.5
+        self.assertEqual(1.5, obj.value)
+        self.assertRaises(TypesafetyError, setattr, obj, 'value', 'x')
+        del obj.value
+        self.assertRaises(AttributeError, getattr, obj, 'value')
+
+    def test_dataclass_init_is_checked(self):
+        @dataclasses.dataclass
+        class Record(object):
+            name: str
+            size: int = 0
+
+        decorate_attributes(Record)
+        self.assertEqual(2, Record('a', 2).size)
+        self.assertRaises(TypesafetyError, Record, 'a', 'b')
+
+    def test_unsupported_annotations_are_ignored(self):
+        class Skipped(object):
+            items: typing.List[int]
+            limit: typing.ClassVar[int] = 10
+
+            @property
+            def total(self) -> int:
+                return 0
+
+            total: int
+
+        decorate_attributes(Skipped)
+        self.assertNotIsInstance(Skipped.__dict__.get('items'), TypedAttribute)
+        self.assertEqual(10, Skipped.__dict__['limit'])
+        self.assertIsInstance(Skipped.__dict__['total'], property)
+
+    def test_string_annotations_are_resolved_on_assignment(self):
+        from . import mockfuture
+
+        decorate_attributes(mockfuture.Tree)
+        tree = mockfuture.Tree()
+        tree.root = mockfuture.Node(1, None)
+        tree.size = 1
+        self.assertEqual((1, 1), (tree.root.value, tree.size))
+        self.assertRaises(TypesafetyError, setattr, tree, 'root', 1)
+        self.assertRaises(TypesafetyError, setattr, tree, 'size', 'a')
+        self.assertEqual(typing.Optional[mockfuture.Node], mockfuture.Tree.__dict__['root'].annotation)
+
+    def test_unresolvable_string_annotations_accept_any_value(self):
+        class Unresolvable(object):
+            missing: 'Missing'  # noqa: F821
+            items: 'typing.List[int]'
+
+        decorate_attributes(Unresolvable)
+        obj = Unresolvable()
+        obj.missing = 1
+        obj.items = 'a'
+        self.assertEqual((1, 'a'), (obj.missing, obj.items))
+
+    def test_named_tuples_are_skipped(self):
+        class Pair(typing.NamedTuple):
+            first: int
+            second: int
+
+        decorate_attributes(Pair)
+        self.assertEqual(2, Pair(1, 2).second)
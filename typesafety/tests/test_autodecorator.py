@@ -15,10 +15,14 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 #
 
+import gc
+import importlib
 import sys
 import unittest
 
-from ..autodecorator import decorate_module
+from ..autodecorator import ModuleDecorator, decorate_module, VisitedSet
+from ..options import DecorationOptions
+from ..validator import Validator, TypesafetyError
 
 
 def mock_decorator(func):
@@ -68,3 +72,192 @@ class TestAutodecorate(unittest.TestCase):
     def test_dont_decorate_objects_not_native_to_the_module(self):
         self.assertEqual(2, self._module.UndecoratedClass().method(1))
         self.assertEqual(3, self._module.undecorated_function(1))
+
+
+class TestAutodecorateRecords(unittest.TestCase):
+    def setUp(self):
+        self._module = importlib.import_module('typesafety.tests.mockrecords')
+        decorate_module(self._module, decorator=Validator.decorate)
+
+    def tearDown(self):
+        del sys.modules['typesafety.tests.mockrecords']
+
+    def test_named_tuple_fields_are_checked(self):
+        self.assertEqual((1, 0), self._module.Point(1))
+        self.assertEqual((1, 2), self._module.Point(column=1, row=2))
+        self.assertRaises(TypesafetyError, self._module.Point, 'a')
+        self.assertRaises(TypesafetyError, self._module.Point, 1, row='b')
+
+    def test_named_tuple_factories_are_checked(self):
+        point = self._module.Point(1)
+        self.assertEqual((2, 0), self._module.Point._make([2, 0]))
+        self.assertEqual((1, 3), point._replace(row=3))
+        self.assertRaises(TypesafetyError, self._module.Point._make, ['a', 0])
+        self.assertRaises(TypesafetyError, point._replace, column='a')
+        self.assertRaises(TypeError, self._module.Point._make, [1])
+
+    def test_dataclass_fields_are_checked(self):
+        point = self._module.Point(1, 2)
+        self.assertEqual(point, self._module.Pixel(point).point)
+        self.assertRaises(TypesafetyError, self._module.Pixel, (1, 2))
+        self.assertRaises(TypesafetyError, self._module.Pixel, point, color=1)
+
+    def test_dataclass_with_slots_is_checked(self):
+        self.assertEqual('a', self._module.Frozen('a').name)
+        self.assertRaises(TypesafetyError, self._module.Frozen, 1)
+
+
+class TestAutodecorateMethods(unittest.TestCase):
+    def test_method_decorator_gets_receiver(self):
+        decorated = []
+
+        def method_decorator(func, *, receiver):
+            decorated.append((func.__name__, receiver))
+            return func
+
+        sys.modules.pop('typesafety.tests.mockmodule', None)
+        mockmodule = importlib.import_module('typesafety.tests.mockmodule')
+        self.addCleanup(sys.modules.pop, 'typesafety.tests.mockmodule', None)
+        decorate_module(mockmodule, decorator=mock_decorator, method_decorator=method_decorator)
+
+        self.assertEqual(
+            {('method', True), ('value', True), ('clsmethod', True), ('staticmethod', False)},
+            set(decorated)
+        )
+        self.assertEqual(1234, mockmodule.function())
+
+    def test_public_only_skips_private_functions(self):
+        class Sample(object):
+            def __init__(self):
+                pass
+
+            def public(self):
+                return 1
+
+            def _private(self):
+                return 2
+
+            def __mangled(self):  # pylint: disable=unused-private-member
+                return 3
+
+        decorate_module(Sample, decorator=mock_decorator, public_only=True)
+
+        self.assertEqual(1234, Sample().public())
+        self.assertEqual(2, Sample()._private())  # pylint: disable=protected-access
+        self.assertEqual(3, Sample()._Sample__mangled())  # pylint: disable=protected-access
+
+    def test_keyword_arguments_override_options(self):
+        class Sample(object):
+            def public(self):
+                return 1
+
+            def _private(self):
+                return 2
+
+        decorate_module(Sample, DecorationOptions(decorator=mock_decorator), public_only=True)
+
+        self.assertEqual(1234, Sample().public())
+        self.assertEqual(2, Sample()._private())  # pylint: disable=protected-access
+
+    def test_index_limits_visited_definitions(self):
+        class Sample(object):
+            class Nested(object):
+                def inner(self):
+                    return 1
+
+                def skipped(self):
+                    return 2
+
+            def visited(self):
+                return 3
+
+            def skipped(self):
+                return 4
+
+        decorate_module(
+            Sample,
+            decorator=mock_decorator,
+            index={'Nested': {'inner': None}, 'visited': None, 'missing': None}
+        )
+
+        self.assertEqual(1234, Sample.Nested().inner())
+        self.assertEqual(2, Sample.Nested().skipped())
+        self.assertEqual(1234, Sample().visited())
+        self.assertEqual(4, Sample().skipped())
+
+    def test_previous_decorations_are_reused(self):
+        def make_sample():
+            class Sample(object):
+                def method(self, arg: int) -> int:
+                    return arg
+
+            return Sample
+
+        for in_place in (False, True):
+            options = DecorationOptions(Validator.decorate, method_decorator=Validator.decorate, in_place=in_place)
+            first = ModuleDecorator(options)
+            first.decorate(make_sample())
+            second = ModuleDecorator(options, previous=first.decorations)
+            sample = make_sample()
+            method = sample.__dict__['method']
+            second.decorate(sample)
+
+            self.assertEqual((0, 1), (first.reused, second.reused))
+            self.assertEqual(in_place, method is sample.__dict__['method'])
+            self.assertRaises(TypesafetyError, sample.__dict__['method'], sample(), 'a')
+
+
+class TestAutodecorateVisited(unittest.TestCase):
+    def setUp(self):
+        self.decorated = []
+        self.visited = VisitedSet()
+
+    def decorator(self, func):
+        self.decorated.append(func.__name__)
+        return lambda *args: 1234
+
+    def test_aliased_class_is_decorated_once(self):
+        class Sample(object):
+            def method(self):
+                return 1
+
+        class Holder(object):
+            Alias = Sample
+            Other = Sample
+
+        decorate_module(Sample, decorator=self.decorator, visited=self.visited)
+        decorate_module(Holder, decorator=self.decorator, visited=self.visited)
+
+        self.assertEqual(['method'], self.decorated)
+        self.assertEqual(2, self.visited.skipped_classes)
+        self.assertEqual(1234, Holder.Alias().method())
+
+    def test_aliased_function_gets_the_same_wrapper(self):
+        def function():
+            return 1
+
+        class Sample(object):
+            first = function
+            second = function
+
+        decorate_module(Sample, decorator=self.decorator)
+
+        self.assertEqual(['function'], self.decorated)
+        self.assertIs(Sample.__dict__['first'], Sample.__dict__['second'])
+
+    def test_visited_classes_can_be_collected(self):
+        class Sample(object):
+            def method(self):
+                return 1
+
+        decorate_module(Sample, decorator=self.decorator, visited=self.visited)
+        del Sample
+        gc.collect()
+
+        class Sample(object):  # pylint: disable=function-redefined
+            def method(self):
+                return 1
+
+        decorate_module(Sample, decorator=self.decorator, visited=self.visited)
+        self.assertEqual(['method', 'method'], self.decorated)
+        self.assertEqual(0, self.visited.skipped_classes)
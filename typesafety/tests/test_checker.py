@@ -0,0 +1,216 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+import collections.abc
+import enum
+import typing
+import unittest
+
+from typesafety import checker
+from typesafety.checker import (
+    TypeTrust,
+    compile_annotation,
+    format_annotation,
+    invalidate_protocol_cache,
+    is_type_determined,
+)
+
+
+class Color(enum.Enum):
+    RED = 1
+    GREEN = 2
+
+
+class TestChecker(unittest.TestCase):
+    def test_class_annotation(self):
+        check = compile_annotation(int)
+        self.assertTrue(check(1))
+        self.assertFalse(check('1'))
+
+    def test_union_of_classes_and_none(self):
+        check = compile_annotation((int, str, None))
+        self.assertTrue(check(1))
+        self.assertTrue(check('1'))
+        self.assertTrue(check(None))
+        self.assertFalse(check(1.0))
+
+    def test_literal_membership(self):
+        check = compile_annotation(typing.Literal['read', 'write', Color.RED])
+        self.assertTrue(check('read'))
+        self.assertTrue(check(Color.RED))
+        self.assertFalse(check('append'))
+        self.assertFalse(check(Color.GREEN))
+
+    def test_literal_does_not_accept_equal_values_of_other_types(self):
+        check = compile_annotation(typing.Literal[1])
+        self.assertTrue(check(1))
+        self.assertFalse(check(True))
+        self.assertFalse(check(1.0))
+
+    def test_literal_with_unhashable_value(self):
+        check = compile_annotation(typing.Literal['a'])
+        self.assertFalse(check(['a']))
+
+    def test_literal_in_union(self):
+        check = compile_annotation(typing.Optional[typing.Literal['a', 'b']])
+        self.assertTrue(check('a'))
+        self.assertTrue(check(None))
+        self.assertFalse(check('c'))
+
+    def test_format_long_literal_is_truncated(self):
+        annotation = typing.Literal[tuple(range(25))]
+        self.assertEqual(
+            'typing.Literal[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, ... (15 more)]',
+            format_annotation(annotation)
+        )
+
+
+class Closeable(typing.Protocol):
+    name: str
+
+    def close(self, force):
+        pass
+
+
+class File(object):
+    def __init__(self):
+        self.name = 'file'
+
+    def close(self, force=False):
+        pass
+
+
+class Socket(object):
+    name = 'socket'
+
+    def close(self):
+        pass
+
+
+class TestProtocolChecker(unittest.TestCase):
+    def tearDown(self):
+        checker.PROTOCOL_CHECK_ARITY = False
+        invalidate_protocol_cache()
+
+    def test_structural_match(self):
+        closeable = compile_annotation(Closeable)
+        self.assertTrue(closeable(File()))
+        self.assertTrue(closeable(Socket()))
+        self.assertFalse(closeable(object()))
+
+    def test_missing_data_member(self):
+        class Unnamed(object):
+            def close(self, force):
+                pass
+
+        self.assertFalse(compile_annotation(Closeable)(Unnamed()))
+
+    def test_arity_check(self):
+        checker.PROTOCOL_CHECK_ARITY = True
+        closeable = compile_annotation(Closeable)
+        self.assertTrue(closeable(File()))
+        self.assertFalse(closeable(Socket()))
+
+    def test_verdict_is_cached_until_invalidated(self):
+        class Lazy(object):
+            name = 'lazy'
+
+        closeable = compile_annotation(Closeable)
+        self.assertFalse(closeable(Lazy()))
+
+        Lazy.close = lambda self, force: None
+        self.assertFalse(closeable(Lazy()))
+
+        invalidate_protocol_cache(Lazy)
+        self.assertTrue(closeable(Lazy()))
+
+
+class Address(typing.TypedDict):
+    city: str
+    zip: typing.Optional[int]
+
+
+class Person(typing.TypedDict, total=False):
+    name: typing.Required[str]
+    address: Address
+    tags: typing.List[str]
+
+
+class Node(typing.TypedDict):
+    value: int
+    children: typing.List['Node']
+    parent: typing.Optional['Node']
+
+
+class TestTypedDictChecker(unittest.TestCase):
+    def tearDown(self):
+        checker.TYPED_DICT_MAX_DEPTH = None
+
+    def test_required_and_optional_keys(self):
+        person = compile_annotation(Person)
+        self.assertTrue(person({'name': 'x'}))
+        self.assertTrue(person({'name': 'x', 'address': {'city': 'y', 'zip': None}}))
+        self.assertFalse(person({}))
+        self.assertFalse(person({'name': 1}))
+        self.assertFalse(person([('name', 'x')]))
+
+    def test_nested_typed_dict(self):
+        person = compile_annotation(Person)
+        self.assertFalse(person({'name': 'x', 'address': {'city': 'y'}}))
+        self.assertFalse(person({'name': 'x', 'address': {'city': 1, 'zip': 1}}))
+
+    def test_unsupported_field_annotations_only_check_presence(self):
+        person = compile_annotation(Person)
+        self.assertTrue(person({'name': 'x', 'tags': 'not a list'}))
+
+    def test_self_referencing_typed_dict(self):
+        node = compile_annotation(Node)
+        leaf = {'value': 2, 'children': [], 'parent': None}
+        self.assertTrue(node({'value': 1, 'children': [leaf], 'parent': leaf}))
+        self.assertFalse(node({'value': 1, 'children': [], 'parent': {'value': 'x'}}))
+
+    def test_max_depth(self):
+        checker.TYPED_DICT_MAX_DEPTH = 1
+        person = compile_annotation(Person)
+        self.assertTrue(person({'name': 'x', 'address': {'city': 1}}))
+        self.assertFalse(person({'name': 'x', 'address': 'y'}))
+
+
+class TestTypeTrust(unittest.TestCase):
+    def test_type_determined_annotations(self):
+        self.assertTrue(is_type_determined(int))
+        self.assertTrue(is_type_determined(typing.Optional[collections.abc.Sequence]))
+        self.assertFalse(is_type_determined(typing.Literal[1]))
+        self.assertFalse(is_type_determined(Closeable))
+
+    def test_type_is_trusted_after_consecutive_hits(self):
+        trust = TypeTrust(compile_annotation((int, str)), 2)
+        self.assertTrue(trust(1))
+        self.assertIsNone(trust.trusted_type)
+        self.assertTrue(trust('a'))
+        self.assertEqual((str, 1), (trust.candidate_type, trust.hits))
+        self.assertTrue(trust('b'))
+        self.assertIs(str, trust.trusted_type)
+
+    def test_fallback_to_full_check(self):
+        trust = TypeTrust(compile_annotation(int), 1)
+        self.assertTrue(trust(True))
+        self.assertIs(bool, trust.trusted_type)
+        self.assertTrue(trust(1))
+        self.assertFalse(trust('a'))
+        self.assertEqual(2, trust.fallbacks)
+        self.assertEqual(0, trust.hits)
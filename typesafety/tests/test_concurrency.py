@@ -0,0 +1,140 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+import collections.abc
+import threading
+import typing
+import unittest
+
+from typesafety.counter import ShardedCounter
+from typesafety.shadow import ShadowChecker
+from typesafety.validator import Validator, TypesafetyError
+
+THREAD_COUNT = 16
+CALL_COUNT = 2000
+
+
+class Closeable(typing.Protocol):
+    def close(self):
+        pass
+
+
+class Resource(object):
+    def close(self):
+        pass
+
+
+def checked(value: int, resource: Closeable) -> int:
+    return value
+
+
+def resolved_later(value: 'int') -> 'int':
+    return value
+
+
+class TrustingValidator(Validator):
+    TRUST_THRESHOLD = 4
+
+
+def trusted(value: collections.abc.Sequence) -> collections.abc.Sequence:
+    return value
+
+
+class TestConcurrency(unittest.TestCase):
+    def run_threads(self, target):
+        barrier = threading.Barrier(THREAD_COUNT)
+        errors = []
+
+        def run(index):
+            barrier.wait()
+            try:
+                target(index)
+
+            except Exception as error:  # pylint: disable=broad-except
+                errors.append(error)
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(THREAD_COUNT)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+
+    def test_sharded_counter_loses_no_updates(self):
+        counter = ShardedCounter()
+
+        def increment(index):  # pylint: disable=unused-argument
+            for _ in range(CALL_COUNT):
+                counter.increment()
+
+        self.run_threads(increment)
+        self.assertEqual(THREAD_COUNT * CALL_COUNT, counter.value)
+
+    def test_sharded_counter_folds_the_cells_of_finished_threads(self):
+        counter = ShardedCounter()
+        for _ in range(THREAD_COUNT):
+            thread = threading.Thread(target=counter.increment)
+            thread.start()
+            thread.join()
+
+        counter.increment()
+        self.assertEqual(THREAD_COUNT + 1, counter.value)
+        self.assertEqual(1, counter.shards)
+
+    def test_checked_calls_from_many_threads(self):
+        functions = (
+            Validator.decorate(checked),
+            Validator.decorate(resolved_later),
+            TrustingValidator.decorate(trusted),
+        )
+        resource = Resource()
+        failures = ShardedCounter()
+
+        def call(index):
+            for number in range(CALL_COUNT):
+                self.assertEqual(number, functions[0](number, resource))
+                self.assertEqual(number, functions[1](number))
+                self.assertEqual([index], functions[2]([index]))
+                try:
+                    if number % 2:
+                        functions[0](None, resource)
+
+                    else:
+                        functions[1](None)
+
+                except TypesafetyError:
+                    failures.increment()
+
+        self.run_threads(call)
+        self.assertEqual(THREAD_COUNT * CALL_COUNT, failures.value)
+        self.assertIs(list, functions[2].__validator__.trust_state['value'].trusted_type)
+
+    def test_shadow_checker_counts_from_many_threads(self):
+        checker = ShadowChecker(queue_size=THREAD_COUNT * CALL_COUNT // 2)
+        decorated = checker.decorate(checked)
+        checker.start()
+
+        def call(index):  # pylint: disable=unused-argument
+            for number in range(CALL_COUNT):
+                decorated(number if number % 2 else 'a', Resource())
+
+        self.run_threads(call)
+        checker.stop()
+
+        self.assertEqual(THREAD_COUNT * CALL_COUNT, checker.checked + checker.dropped)
+        self.assertLessEqual(checker.violation_count, checker.checked)
@@ -0,0 +1,103 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+import asyncio
+import unittest
+
+from typesafety.context import BOUNDARY, OFF, checking
+from typesafety.validator import Validator, TypesafetyError
+
+
+def positional(arg: int) -> int:
+    return arg
+
+
+def keyword_only(*, arg: int) -> int:
+    return arg
+
+
+class Sample(object):
+    def __init__(self):
+        self._value = 1
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    @value.setter
+    def value(self, value: int):
+        self._value = value
+
+
+class TestChecking(unittest.TestCase):
+    def test_checking_can_be_turned_off(self):
+        func = Validator.decorate(positional)
+        kwfunc = Validator.decorate(keyword_only)
+        with checking(enabled=False):
+            self.assertEqual('a', func('a'))
+            self.assertEqual('a', kwfunc(arg='a'))
+
+            with checking():
+                self.assertRaises(TypesafetyError, func, 'a')
+
+        self.assertRaises(TypesafetyError, func, 'a')
+        self.assertRaises(TypesafetyError, kwfunc, arg='a')
+
+    def test_checking_can_be_turned_on(self):
+        func = Validator.decorate(positional, enabled=False)
+        self.assertEqual('a', func('a'))
+        with checking():
+            self.assertRaises(TypesafetyError, func, 'a')
+
+    def test_boundary_mode(self):
+        func = Validator.decorate(positional)
+        with checking(mode=BOUNDARY):
+            self.assertEqual('a', func('a'))
+
+    def test_properties(self):
+        prop = Validator.decorate_property(Sample.value, enabled=False)
+        obj = Sample()
+        prop.fset(obj, 'a')
+        self.assertEqual('a', prop.fget(obj))
+        with checking():
+            self.assertRaises(TypesafetyError, prop.fget, obj)
+            self.assertRaises(TypesafetyError, prop.fset, obj, 'b')
+
+        with checking(mode=OFF):
+            prop.fset(obj, 'b')
+
+    def test_mode_propagates_to_asyncio_tasks(self):
+        func = Validator.decorate(positional)
+
+        async def call(value):
+            await asyncio.sleep(0)
+            return func(value)
+
+        async def main():
+            with checking(enabled=False):
+                unchecked = asyncio.ensure_future(call('a'))
+
+            checked = asyncio.ensure_future(call('b'))
+            return await asyncio.gather(unchecked, checked, return_exceptions=True)
+
+        unchecked, checked = asyncio.run(main())
+        self.assertEqual('a', unchecked)
+        self.assertIsInstance(checked, TypesafetyError)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            with checking(mode='sometimes'):
+                pass
@@ -15,9 +15,17 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 #
 
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
 import unittest
 
 from typesafety.finder import ModuleFinder
+from typesafety.options import DecorationOptions
+from typesafety.validator import Validator, TypesafetyError
 
 
 def mock_decorator(func):
@@ -38,7 +46,7 @@ def undecorate(func):
 
 class TestModuleFinder(unittest.TestCase):
     def setUp(self):
-        self.finder = ModuleFinder(mock_decorator)
+        self.finder = ModuleFinder(DecorationOptions(mock_decorator))
 
     def tearDown(self):
         self.finder.uninstall()
@@ -64,3 +72,176 @@ class TestModuleFinder(unittest.TestCase):
         self.assertFalse(
             isdecorated(typesafety.tests.mockmodule.ModuleClass.method)
         )
+
+    def test_class_decorator_applied(self):
+        decorated_classes = []
+        self.finder = ModuleFinder(DecorationOptions(mock_decorator, class_decorator=decorated_classes.append))
+        self.finder.install()
+        # Uninstalling reimports the module undecorated, drop it afterwards
+        self.addCleanup(sys.modules.pop, 'typesafety.tests.mockmodule', None)
+        import typesafety.tests.mockmodule
+        self.assertIn(typesafety.tests.mockmodule.ModuleClass, decorated_classes)
+
+    def test_generated_code_cached(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.finder = ModuleFinder(DecorationOptions(
+            Validator.decorate,
+            method_decorator=Validator.decorate,
+            cache_dir=cache_dir
+        ))
+        self.finder.install()
+        sys.modules.pop('typesafety.tests.mockrecords', None)
+        self.addCleanup(sys.modules.pop, 'typesafety.tests.mockrecords', None)
+        import typesafety.tests.mockrecords  # noqa: F401
+        self.assertEqual(
+            ['typesafety.tests.mockrecords.{}.typesafety'.format(sys.implementation.cache_tag)],
+            os.listdir(cache_dir)
+        )
+
+    def test_prescan_skips_unannotated_definitions(self):
+        self.finder = ModuleFinder(DecorationOptions(mock_decorator, prescan=True))
+        self.finder.install()
+        sys.modules.pop('typesafety.tests.mockmodule', None)
+        self.addCleanup(sys.modules.pop, 'typesafety.tests.mockmodule', None)
+        import typesafety.tests.mockmodule
+        self.assertFalse(
+            isdecorated(typesafety.tests.mockmodule.function)
+        )
+
+
+class TestDeferredModuleFinder(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.finder = ModuleFinder(DecorationOptions(self.blocking_decorator, deferred=True))
+        self.finder.set_filter(lambda name: name == 'typesafety.tests.mockmodule')
+        self.finder.install()
+        sys.modules.pop('typesafety.tests.mockmodule', None)
+        self.addCleanup(sys.modules.pop, 'typesafety.tests.mockmodule', None)
+
+    def tearDown(self):
+        self.release.set()
+        self.finder.uninstall()
+
+    def blocking_decorator(self, func):
+        self.started.set()
+        self.release.wait()
+        return mock_decorator(func)
+
+    def test_module_is_decorated_in_background(self):
+        import typesafety.tests.mockmodule
+        self.assertFalse(isdecorated(typesafety.tests.mockmodule.function))
+        self.assertFalse(self.finder.wait_ready(timeout=0.01))
+
+        self.release.set()
+        self.assertTrue(self.finder.wait_ready())
+        self.assertTrue(isdecorated(typesafety.tests.mockmodule.function))
+
+    def test_submodules_imported_during_decoration(self):
+        package = 'typesafety.tests.mockpackage'
+        for name in (package, package + '.shapes'):
+            sys.modules.pop(name, None)
+            self.addCleanup(sys.modules.pop, name, None)
+
+        self.finder.set_filter(lambda name: name.startswith(package))
+        module = importlib.import_module(package)
+        self.assertTrue(self.started.wait(timeout=10))
+
+        # Adds the submodule to the namespace of the package being decorated
+        importlib.import_module(package + '.shapes')
+        self.release.set()
+        self.assertTrue(self.finder.wait_ready())
+        self.assertTrue(isdecorated(module.identity))
+
+    def test_decoration_errors_are_raised_when_waiting(self):
+        def failing_decorator(func):
+            raise ValueError(func.__name__)
+
+        self.finder.uninstall()
+        self.finder = ModuleFinder(DecorationOptions(failing_decorator, deferred=True))
+        self.finder.install()
+        import typesafety.tests.mockmodule  # noqa: F401
+        self.assertRaises(ValueError, self.finder.wait_ready)
+
+
+class TestReloadedModules(unittest.TestCase):
+    SOURCE = (
+        'class Value(object):\n'
+        '    pass\n'
+        '\n'
+        'def unchanged(arg: int) -> int:\n'
+        '    return arg\n'
+        '\n'
+        'def changed(arg: int) -> int:\n'
+        '    return arg + {}\n'
+        '\n'
+        'def forward(arg: "Value") -> "Value":\n'
+        '    return arg\n'
+        '\n'
+        'CALLBACKS = {{"unchanged": unchanged}}\n'
+    )
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        sys.path.insert(0, directory)
+        self.addCleanup(sys.path.remove, directory)
+        self.filename = os.path.join(directory, 'reloadedmodule.py')
+        self.__write(1)
+
+    def __install(self, *, in_place=False):
+        finder = ModuleFinder(DecorationOptions(
+            Validator.decorate,
+            method_decorator=Validator.decorate,
+            in_place=in_place
+        ))
+        finder.set_filter(lambda name: name == 'reloadedmodule')
+        finder.install()
+        self.addCleanup(sys.modules.pop, 'reloadedmodule', None)
+        self.addCleanup(finder.uninstall)
+
+    def __write(self, increment):
+        with open(self.filename, 'w') as source:
+            source.write(self.SOURCE.format(increment))
+
+        # The reload must see the new source even within the same second
+        os.utime(self.filename, ns=(increment, increment))
+
+    def test_unchanged_functions_are_reused(self):
+        self.__install()
+        import reloadedmodule  # pylint: disable=import-error
+        unchanged = reloadedmodule.unchanged
+        changed = reloadedmodule.changed
+        self.assertEqual(2, reloadedmodule.changed(1))
+
+        self.__write(2)
+        importlib.reload(reloadedmodule)
+
+        self.assertIs(unchanged, reloadedmodule.unchanged)
+        self.assertIsNot(changed, reloadedmodule.changed)
+        self.assertEqual(3, reloadedmodule.changed(1))
+        self.assertRaises(TypesafetyError, reloadedmodule.changed, 'a')
+        self.assertRaises(TypesafetyError, reloadedmodule.unchanged, 'a')
+        self.assertIn('reloadedmodule', sys.modules)
+
+    def test_unchanged_functions_are_patched_again_in_place(self):
+        self.__install(in_place=True)
+        import reloadedmodule  # pylint: disable=import-error
+
+        self.__write(2)
+        importlib.reload(reloadedmodule)
+
+        callback = reloadedmodule.CALLBACKS['unchanged']
+        self.assertIs(callback, reloadedmodule.unchanged)
+        self.assertEqual(1, callback(1))
+        self.assertRaises(TypesafetyError, callback, 'a')
+
+    def test_string_annotations_refer_to_reloaded_classes(self):
+        self.__install()
+        import reloadedmodule  # pylint: disable=import-error
+        reloadedmodule.forward(reloadedmodule.Value())
+
+        importlib.reload(reloadedmodule)
+        value = reloadedmodule.Value()
+        self.assertIs(value, reloadedmodule.forward(value))
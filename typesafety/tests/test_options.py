@@ -0,0 +1,44 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+import json
+import unittest
+
+from typesafety.options import Options
+
+
+def only_tests(name):
+    return name.startswith('tests.')
+
+
+class TestOptions(unittest.TestCase):
+    def test_encode_and_decode(self):
+        options = Options(filter_func=only_tests, shadow=True, report_path='/tmp/report', call_stack_depth=2)
+        encoded = options.encode()
+        self.assertEqual(__name__ + '.only_tests', json.loads(encoded)['filter_func'])
+        self.assertEqual(options, Options.decode(encoded))
+        self.assertEqual(Options(), Options.decode(Options().encode()))
+
+    def test_filter_function_must_be_importable(self):
+        def local_filter(name):
+            return True
+
+        self.assertRaises(ValueError, Options(filter_func=lambda name: True).encode)
+        self.assertRaises(ValueError, Options(filter_func=local_filter).encode)
+
+    def test_unencodable_fields(self):
+        self.assertRaises(ValueError, Options(cache_dir=object()).encode)
@@ -0,0 +1,112 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+import functools
+import inspect
+import types
+import unittest
+
+from typesafety.autodecorator import decorate_module
+from typesafety.patching import patch_function
+from typesafety.validator import Validator, TypesafetyError
+
+
+class TestPatchFunction(unittest.TestCase):
+    def test_function_is_checked_in_place(self):
+        def func(arg: int, *args, flag: bool = False, **kwargs) -> int:
+            return arg
+
+        reference = func
+        signature = inspect.signature(func)
+        self.assertIs(reference, patch_function(func, decorator=Validator.decorate))
+
+        self.assertEqual(signature, inspect.signature(reference))
+        self.assertEqual(1, reference(1, 2, flag=True, other=3))
+        self.assertRaises(TypesafetyError, reference, 'a')
+        self.assertRaises(TypesafetyError, reference, 1, flag=1)
+        self.assertTrue(Validator.is_function_validated(reference))
+
+    def test_positional_only_parameters(self):
+        namespace = {}
+        source = 'def func(arg: int, /, other: int = 1) -> int:\n    return arg + other\n'
+        exec(source, namespace)  # pylint: disable=exec-used
+        func = patch_function(namespace['func'], decorator=Validator.decorate)
+        self.assertEqual(3, func(1, 2))
+        self.assertRaises(TypesafetyError, func, 'a')
+
+    def test_closures_are_kept(self):
+        offset = 1
+
+        class Sample(object):
+            def method(self, arg: int) -> str:
+                return super().__str__()[:1] + str(arg + offset)
+
+        patch_function(Sample.__dict__['method'], decorator=Validator.decorate, receiver=True)
+        self.assertEqual('<2', Sample().method(1))
+        self.assertRaises(TypesafetyError, Sample().method, 'a')
+
+    def test_unchecked_functions_are_not_patched(self):
+        def func(arg):
+            return arg
+
+        code = func.__code__
+        self.assertIs(func, patch_function(func, decorator=Validator.decorate))
+        self.assertIs(code, func.__code__)
+
+    def test_generators_are_wrapped(self):
+        def func(arg: int):
+            yield arg
+
+        decorated = patch_function(func, decorator=Validator.decorate)
+        self.assertIsNot(func, decorated)
+        self.assertTrue(inspect.isgeneratorfunction(func))
+
+    def test_boundary_only_sees_the_real_caller(self):
+        def func(arg: int) -> int:
+            return arg
+
+        decorator = functools.partial(Validator.decorate, boundary_only=True)
+        patch_function(func, decorator=decorator)
+        self.assertEqual('a', func('a'))
+
+        namespace = {'__name__': 'otherpackage', 'function': func}
+        exec('def caller(arg):\n    return function(arg)\n', namespace)  # pylint: disable=exec-used
+        self.assertRaises(TypesafetyError, namespace['caller'], 'a')
+
+    def test_boundary_only_generators_see_the_real_caller(self):
+        module = types.ModuleType(__name__ + '_generated')
+        exec('def generate(arg: int):\n    yield arg\n', module.__dict__)  # pylint: disable=exec-used
+        decorator = functools.partial(Validator.decorate, boundary_only=True)
+        decorate_module(module, decorator=decorator, in_place=True)
+        self.assertEqual(['a'], list(module.generate('a')))
+
+        namespace = {'__name__': 'otherpackage', 'function': module.generate}
+        exec('def caller(arg):\n    return function(arg)\n', namespace)  # pylint: disable=exec-used
+        self.assertRaises(TypesafetyError, namespace['caller'], 'a')
+
+
+class TestDecorateInPlace(unittest.TestCase):
+    def test_references_taken_before_are_checked(self):
+        class Sample(object):
+            def method(self, arg: int) -> int:
+                return arg
+
+        method = Sample.method
+        registry = {'callback': Sample.method}
+        decorate_module(Sample, decorator=Validator.decorate, in_place=True)
+
+        self.assertIs(method, Sample.method)
+        self.assertRaises(TypesafetyError, registry['callback'], Sample(), 'a')
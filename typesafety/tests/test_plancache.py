@@ -0,0 +1,109 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+import os
+import os.path
+import shutil
+import tempfile
+import types
+import unittest
+
+from typesafety.plancache import CodeCache, PlanCache
+
+SOURCE = 'def function(value):\n    return value\n'
+
+
+class TestCodeCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = CodeCache()
+
+    def test_same_source_is_compiled_once(self):
+        code = self.cache.compile(SOURCE, '<test>')
+        self.assertIs(code, self.cache.compile(SOURCE, '<test>'))
+        self.assertEqual(1, len(self.cache))
+
+    def test_recording_collects_used_codes(self):
+        cached = self.cache.compile(SOURCE, '<test>')
+        with self.cache.recording() as codes:
+            self.cache.compile(SOURCE, '<test>')
+            compiled = self.cache.compile('x = 1\n', '<test>')
+
+        self.cache.compile('y = 1\n', '<test>')
+        self.assertEqual({SOURCE: cached, 'x = 1\n': compiled}, codes)
+
+
+class TestPlanCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.module = self.__make_module('module_source = 1\n')
+        self.cache_dir = os.path.join(self.directory, 'cache')
+
+    def __make_module(self, content):
+        filename = os.path.join(self.directory, 'cachedmodule.py')
+        with open(filename, 'w') as source:
+            source.write(content)
+
+        module = types.ModuleType('cachedmodule')
+        module.__file__ = filename
+        return module
+
+    def __decorate(self, code_cache, source=SOURCE):
+        with PlanCache(self.cache_dir, code_cache=code_cache).module(self.module):
+            return code_cache.compile(source, '<test>')
+
+    def test_code_is_loaded_by_later_processes(self):
+        self.__decorate(CodeCache())
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))
+
+        code_cache = CodeCache()
+        with PlanCache(self.cache_dir, code_cache=code_cache).module(self.module):
+            self.assertEqual(1, len(code_cache))
+
+        namespace = {}
+        exec(code_cache.compile(SOURCE, '<test>'), namespace)  # pylint: disable=exec-used
+        self.assertEqual(1, namespace['function'](1))
+
+    def test_changed_source_invalidates_cache(self):
+        self.__decorate(CodeCache())
+        self.module = self.__make_module('module_source = 22\n')
+
+        code_cache = CodeCache()
+        with PlanCache(self.cache_dir, code_cache=code_cache).module(self.module):
+            self.assertEqual(0, len(code_cache))
+
+    def test_unchanged_cache_is_not_rewritten(self):
+        self.__decorate(CodeCache())
+        path = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        os.utime(path, ns=(0, 0))
+
+        self.__decorate(CodeCache())
+        self.assertEqual(0, os.stat(path).st_mtime_ns)
+
+    def test_corrupt_cache_is_a_miss(self):
+        self.__decorate(CodeCache())
+        path = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        with open(path, 'wb') as cache_file:
+            cache_file.write(b'garbage')
+
+        code_cache = CodeCache()
+        with PlanCache(self.cache_dir, code_cache=code_cache).module(self.module):
+            self.assertEqual(0, len(code_cache))
+
+    def test_modules_without_file_are_not_cached(self):
+        self.module = types.ModuleType('builtinmodule')
+        self.__decorate(CodeCache())
+        self.assertFalse(os.path.exists(self.cache_dir))
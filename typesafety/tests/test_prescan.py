@@ -0,0 +1,138 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+import ast
+import importlib.util
+import os
+import os.path
+import shutil
+import sys
+import tempfile
+import textwrap
+import types
+import unittest
+import unittest.mock
+
+from typesafety.prescan import get_index, scan
+
+SOURCE = textwrap.dedent('''
+    import typing
+
+    def plain(value):
+        return value
+
+    def argument(value: int):
+        return value
+
+    async def result() -> int:
+        return 1
+
+    def keyword(*, value: int = 1, **kwargs: str):
+        return value
+
+    class Plain(object):
+        def method(self):
+            pass
+
+    class Methods(object):
+        def method(self, value: int):
+            pass
+
+        def other(self):
+            pass
+
+        class Inner(object):
+            def method(self) -> int:
+                pass
+
+    class Record(typing.NamedTuple):
+        value: int
+
+    try:
+        def conditional(value: int):
+            pass
+
+    except ImportError:
+        def fallback(value: str):
+            pass
+''')
+
+
+class TestScan(unittest.TestCase):
+    def test_annotated_definitions_are_indexed(self):
+        self.assertEqual(
+            {
+                'argument': None,
+                'result': None,
+                'keyword': None,
+                'Methods': {'method': None, 'Inner': {'method': None}},
+                'Record': None,
+                'conditional': None,
+                'fallback': None,
+            },
+            scan(ast.parse(SOURCE).body)
+        )
+
+    def test_redefined_names_keep_annotated_members(self):
+        source = textwrap.dedent('''
+            class Sample(object):
+                def first(self, value: int):
+                    pass
+
+            class Sample(object):
+                def second(self, value: int):
+                    pass
+        ''')
+        self.assertEqual({'Sample': {'first': None, 'second': None}}, scan(ast.parse(source).body))
+
+
+class TestGetIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.filename = os.path.join(self.directory, 'scannedmodule.py')
+        self.module = types.ModuleType('scannedmodule')
+        self.module.__file__ = self.filename
+        self.__write('def function(value: int):\n    pass\n')
+        patcher = unittest.mock.patch.object(sys, 'dont_write_bytecode', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def __write(self, source):
+        with open(self.filename, 'w') as source_file:
+            source_file.write(source)
+
+    def test_index_is_cached_next_to_bytecode(self):
+        self.assertEqual({'function': None}, get_index(self.module))
+        cache_path = os.path.splitext(importlib.util.cache_from_source(self.filename))[0] + '.typesafety-index'
+        self.assertTrue(os.path.exists(cache_path))
+
+        with unittest.mock.patch('ast.parse') as parse:
+            self.assertEqual({'function': None}, get_index(self.module))
+
+        parse.assert_not_called()
+
+    def test_changed_source_is_scanned_again(self):
+        get_index(self.module)
+        self.__write('def other(value: int) -> int:\n    pass\n')
+        self.assertEqual({'other': None}, get_index(self.module))
+
+    def test_invalid_source_has_no_index(self):
+        self.__write('def broken(:\n')
+        self.assertIsNone(get_index(self.module))
+
+    def test_modules_without_source_have_no_index(self):
+        self.assertIsNone(get_index(types.ModuleType('builtinmodule')))
@@ -0,0 +1,116 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+import unittest
+
+from typesafety.context import checking
+from typesafety.shadow import ShadowChecker
+from typesafety.validator import TypesafetyError
+
+
+def func(arg: int, scale: int = 1) -> int:
+    return arg * scale
+
+
+class TestShadowChecker(unittest.TestCase):
+    def setUp(self):
+        self._violations = []
+        self._checker = ShadowChecker(
+            queue_size=3,
+            on_violation=lambda function, error: self._violations.append(function)
+        )
+
+    def test_calls_are_checked_later(self):
+        decorated = self._checker.decorate(func)
+        self.assertEqual('aa', decorated('a', scale=2))
+        self.assertEqual(2, decorated(1, 2))
+        self.assertEqual([], self._checker.violations)
+
+        self._checker.flush()
+        self.assertEqual(2, self._checker.checked)
+        self.assertEqual(1, self._checker.violation_count)
+        self.assertEqual([func], self._violations)
+        function, error = self._checker.violations[0]
+        self.assertIs(func, function)
+        self.assertIsInstance(error, TypesafetyError)
+
+    def test_samples_are_dropped_when_the_queue_is_full(self):
+        decorated = self._checker.decorate(func)
+        for _ in range(5):
+            decorated(1)
+
+        self.assertEqual(2, self._checker.dropped)
+        self._checker.flush()
+        self.assertEqual(3, self._checker.checked)
+
+    def test_background_thread(self):
+        decorated = self._checker.decorate(func)
+        self._checker.start()
+        self.assertTrue(self._checker.running)
+        decorated(1, 'a')
+        self._checker.stop()
+
+        self.assertFalse(self._checker.running)
+        self.assertEqual(1, self._checker.violation_count)
+
+    def test_background_thread_checks_in_batches(self):
+        checker = ShadowChecker(queue_size=10, batch_size=2)
+        decorated = checker.decorate(func)
+        for _ in range(5):
+            decorated('a')
+
+        checker.start()
+        checker.stop()
+        self.assertEqual((5, 5), (checker.checked, checker.violation_count))
+
+    def test_call_stack_of_violations(self):
+        checker = ShadowChecker(call_stack_depth=1)
+        decorated = checker.decorate(func)
+        decorated('a', 2)
+        self._checker.decorate(func)('a', 2)
+        checker.flush()
+        self._checker.flush()
+
+        (_, error), = checker.violations
+        self.assertEqual('test_call_stack_of_violations', error.call_stack[0][2])
+        (_, error), = self._checker.violations
+        self.assertEqual((), error.call_stack)
+
+    def test_unchecked_scope_is_not_queued(self):
+        decorated = self._checker.decorate(func)
+        with checking(enabled=False):
+            decorated('a')
+
+        self._checker.flush()
+        self.assertEqual((0, 0), (self._checker.checked, self._checker.dropped))
+
+    def test_string_annotations_are_resolved_by_the_worker(self):
+        namespace = {}
+        exec('def later(arg: "LaterDefinedClass"):\n    return arg\n', namespace)  # pylint: disable=exec-used
+        decorated = self._checker.decorate(namespace['later'])
+        self.assertIsNot(namespace['later'], decorated)
+
+        namespace['LaterDefinedClass'] = type('LaterDefinedClass', (), {})
+        decorated(namespace['LaterDefinedClass']())
+        decorated(1)
+        self._checker.flush()
+        self.assertEqual((2, 1), (self._checker.checked, self._checker.violation_count))
+
+    def test_functions_without_annotations_are_not_decorated(self):
+        def plain(arg):
+            return arg
+
+        self.assertIs(plain, self._checker.decorate(plain))
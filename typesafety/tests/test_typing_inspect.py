@@ -18,7 +18,18 @@
 import typing
 import unittest
 
-from typesafety.typing_inspect import is_union_type, get_union_args
+from typesafety.typing_inspect import (
+    get_callable_args,
+    get_literal_args,
+    get_protocol_members,
+    get_typed_dict_fields,
+    get_union_args,
+    is_callable_type,
+    is_literal_type,
+    is_protocol_type,
+    is_typed_dict_type,
+    is_union_type,
+)
 
 
 class TestTypingInspect(unittest.TestCase):
@@ -33,3 +44,43 @@ class TestTypingInspect(unittest.TestCase):
         self.assertEqual((int, type(None)), get_union_args(typing.Optional[int]))
         self.assertRaises(TypeError, get_union_args, typing.List[int])
         self.assertRaises(TypeError, get_union_args, typing.Any)
+
+    def test_inspect_literal_type(self):
+        self.assertTrue(is_literal_type(typing.Literal['a', 'b']))
+        self.assertFalse(is_literal_type(typing.Union[int, str]))
+        self.assertFalse(is_literal_type(str))
+
+    def test_get_literal_args(self):
+        self.assertEqual(('a', 1), get_literal_args(typing.Literal['a', 1]))
+        self.assertRaises(TypeError, get_literal_args, typing.Optional[int])
+
+    def test_inspect_protocol_type(self):
+        class Sized(typing.Protocol):
+            size: int
+
+            def resize(self, size):
+                pass
+
+        class Box(Sized):
+            pass
+
+        self.assertTrue(is_protocol_type(Sized))
+        self.assertFalse(is_protocol_type(Box))
+        self.assertFalse(is_protocol_type(typing.Protocol))
+        self.assertEqual({'size', 'resize'}, get_protocol_members(Sized))
+
+    def test_get_callable_args(self):
+        self.assertTrue(is_callable_type(typing.Callable[[int], str]))
+        self.assertFalse(is_callable_type(typing.Union[int, str]))
+        self.assertEqual(([int], str), get_callable_args(typing.Callable[[int], str]))
+        self.assertEqual((Ellipsis, typing.Any), get_callable_args(typing.Callable))
+        self.assertRaises(TypeError, get_callable_args, typing.Optional[int])
+
+    def test_get_typed_dict_fields(self):
+        class Movie(typing.TypedDict, total=False):
+            title: typing.Required[str]
+            year: int
+
+        self.assertTrue(is_typed_dict_type(Movie))
+        self.assertFalse(is_typed_dict_type(dict))
+        self.assertEqual(({'title': str, 'year': int}, {'title'}), get_typed_dict_fields(Movie))
@@ -14,7 +14,9 @@
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 #
+import collections.abc
 import contextlib
+import inspect
 import typing
 import unittest
 import warnings
@@ -285,3 +287,292 @@ class TestValidator(unittest.TestCase):  # pylint: disable=too-many-public-metho
             Validator(deprecated)
 
         self.assertEqual(0, len(log), msg="Some warnings found after executing the action")
+
+    def test_validate_typing_literal(self):
+        def func(mode: typing.Literal['r', 'w']) -> typing.Literal[0, 1]:
+            return 0 if mode == 'r' else 2
+
+        validator = Validator(func)
+
+        self.assertEqual(0, validator('r'))
+        self.assertRaises(TypesafetyError, validator, 'w')
+        with self.assertRaises(TypesafetyError) as context:
+            validator('a')
+        self.assertIn("typing.Literal['r', 'w']", str(context.exception))
+
+    def test_validate_typing_callable_arguments(self):
+        def func(callback: typing.Callable[[int, str], bool]):
+            return callback
+
+        def two_args(number, text):
+            pass
+
+        def with_default(number, text, flag=False):
+            pass
+
+        def one_arg(number):
+            pass
+
+        validator = Validator(func)
+
+        validator(two_args)
+        validator(with_default)
+        validator(lambda *args: None)
+        self.assertRaises(TypesafetyError, validator, one_arg)
+        self.assertRaises(TypesafetyError, validator, 1)
+
+    def test_validate_callback_return_value(self):
+        def func(callback: typing.Callable[[int], str]):
+            return callback(1)
+
+        class CallbackValidator(Validator):
+            CHECK_CALLBACK_RETURN_VALUE = True
+
+        validator = CallbackValidator(func)
+        self.assertEqual('1', validator(str))
+        with self.assertRaises(TypesafetyError) as context:
+            validator(lambda number: number)
+        self.assertIn("callback 'callback'", str(context.exception))
+
+    def test_decorated_function_with_defaults_and_keywords(self):
+        @Validator.decorate
+        def func(number: int, text: str = 'a', flag=None) -> str:
+            return text * number
+
+        self.assertEqual('aa', func(2))
+        self.assertEqual('bbb', func(text='b', number=3))
+        self.assertRaises(TypesafetyError, func, 'a')
+        self.assertRaises(TypesafetyError, func, 1, text=2)
+        self.assertRaises(TypeError, func, 1, 'a', None, 'extra')
+
+    def test_decorated_function_missing_argument(self):
+        @Validator.decorate
+        def func(first, number: int):
+            return number
+
+        self.assertRaises(TypesafetyError, func, 1)
+        self.assertRaises(TypeError, func, number=1)
+
+    def test_parameter_shadowing_isinstance(self):
+        @Validator.decorate
+        def func(isinstance: int) -> int:  # pylint: disable=redefined-builtin
+            return isinstance
+
+        self.assertEqual(1, func(1))
+        self.assertRaises(TypesafetyError, func, 'a')
+
+    def test_string_annotations_are_resolved_on_first_call(self):
+        from . import mockfuture
+
+        make_node = Validator.decorate(mockfuture.make_node)
+        self.assertTrue(Validator.is_function_validated(make_node))
+
+        root = make_node(1)
+        self.assertEqual(root, make_node(2, root).parent)
+        self.assertRaises(TypesafetyError, make_node, 'a')
+        self.assertRaises(TypesafetyError, make_node, 1, 'root')
+
+    def test_string_annotations_refer_to_later_definitions(self):
+        def func(arg: 'LaterDefinedClass') -> 'int':
+            return 1
+
+        validator = Validator(func)
+        self.assertEqual(1, validator(LaterDefinedClass()))
+        self.assertRaises(TypesafetyError, validator, 1)
+
+    def test_unresolvable_string_annotations_are_ignored(self):
+        from . import mockfuture
+
+        broken = Validator.decorate(mockfuture.broken)
+        self.assertRaises(TypesafetyError, broken, 'not an int')
+        self.assertFalse(Validator(mockfuture.broken).need_validate_arguments)
+
+    def test_validate_all_parameter_kinds(self):
+        def func(first: int, /, second: str, *args: float, flag: bool, **kwargs: bytes):
+            return first
+
+        validator = Validator(func)
+
+        self.assertEqual(1, validator(1, 'a', 1.0, 2.0, flag=True, extra=b'x', first=b'y'))
+        self.assertRaises(TypesafetyError, validator, 'a', 'a', flag=True)
+        self.assertRaises(TypesafetyError, validator, 1, second=2, flag=True)
+        self.assertRaises(TypesafetyError, validator, 1, 'a', 1.0, 'b', flag=True)
+        self.assertRaises(TypesafetyError, validator, 1, 'a', flag=None)
+        self.assertRaises(TypesafetyError, validator, 1, 'a', flag=True, extra='x')
+        self.assertRaises(TypesafetyError, validator, 1, 'a')
+
+    def test_validate_arguments_with_var_arguments(self):
+        def func(*args: int, **kwargs: str):
+            pass
+
+        validator = Validator(func)
+        validator.validate_arguments(dict(args=(1, 2), kwargs={'a': 'b'}))
+        validator.validate_arguments({})
+        self.assertRaises(TypesafetyError, validator.validate_arguments, dict(args=(1, 'a')))
+        self.assertRaises(TypesafetyError, validator.validate_arguments, dict(kwargs={'a': 1}))
+
+    def test_default_values_are_checked(self):
+        def func(arg: int = None):
+            return arg
+
+        self.assertEqual(1, Validator(func)(1))
+        self.assertRaises(TypesafetyError, Validator(func))
+
+    def test_receiver_is_not_checked(self):
+        class Sample(object):
+            def method(self: int, arg: int) -> int:
+                return arg
+
+        method = Validator.decorate(Sample.__dict__['method'], receiver=True)
+        self.assertEqual(1, method(Sample(), 1))
+        self.assertEqual(1, method(Sample(), arg=1))
+        self.assertRaises(TypesafetyError, method, Sample(), 'a')
+        self.assertRaises(TypesafetyError, Validator.decorate(Sample.__dict__['method']), Sample(), 1)
+
+    def test_receiver_in_var_arguments_is_not_checked(self):
+        class Sample(object):
+            def method(*args: int):  # pylint: disable=no-self-argument
+                return args[1:]
+
+        validator = Validator(Sample.__dict__['method'], receiver=True)
+        method = Validator.decorate(Sample.__dict__['method'], receiver=True)
+        self.assertEqual((1, 2), method(Sample(), 1, 2))
+        self.assertRaises(TypesafetyError, method, Sample(), 1, 'a')
+        validator.validate_arguments(dict(args=(Sample(), 1)))
+        self.assertRaises(TypesafetyError, validator.validate_arguments, dict(args=(Sample(), 'a')))
+
+    def test_decorate_property(self):
+        class Sample(object):
+            def __init__(self):
+                self._value = 1
+
+            @property
+            def value(self) -> int:
+                return self._value
+
+            @value.setter
+            def value(self, value: int):
+                self._value = value
+
+            @property
+            def unchecked(self):
+                return self._value
+
+        unchecked = Sample.value
+        checked = Validator.decorate_property(unchecked)
+        self.assertTrue(Validator.is_function_validated(checked.fget))
+        self.assertTrue(Validator.is_function_validated(checked.fset))
+        self.assertIs(Sample.unchecked, Validator.decorate_property(Sample.unchecked))
+        Sample.value = checked
+
+        obj = Sample()
+        obj.value = 2
+        self.assertEqual(2, obj.value)
+        self.assertRaises(TypesafetyError, setattr, obj, 'value', 'a')
+
+        unchecked.fset(obj, 'a')
+        with self.assertRaises(TypesafetyError) as context:
+            obj.value  # pylint: disable=pointless-statement
+        self.assertIn("Return value of function 'value'", str(context.exception))
+
+    def test_boundary_only_skips_calls_from_the_same_package(self):
+        def func(arg: int) -> int:
+            return arg
+
+        def func_with_keywords(arg: int, *, flag: bool = False) -> int:
+            return arg
+
+        for function in (func, func_with_keywords):
+            decorated = Validator.decorate(function, boundary_only=True)
+            self.assertEqual('a', decorated('a'))
+
+            caller = self.__define_caller('otherpackage.module', decorated)
+            self.assertEqual(1, caller(1))
+            self.assertRaises(TypesafetyError, caller, 'a')
+
+            caller = self.__define_caller('typesafety.other', decorated)
+            self.assertEqual('a', caller('a'))
+
+    def test_boundary_only_with_string_annotations(self):
+        def func(arg: 'int'):
+            return arg
+
+        decorated = Validator.decorate(func, boundary_only=True)
+        self.assertEqual('a', decorated('a'))
+        self.assertRaises(TypesafetyError, self.__define_caller('otherpackage', decorated), 'a')
+
+    @staticmethod
+    def __define_caller(module_name, function):
+        namespace = {'__name__': module_name, 'function': function}
+        exec('def caller(arg):\n    return function(arg)\n', namespace)  # pylint: disable=exec-used
+        return namespace['caller']
+
+    def test_adaptive_trust(self):
+        def func(arg: collections.abc.Sequence, other: typing.Literal[1]) -> typing.Optional[int]:
+            return None
+
+        class TrustingValidator(Validator):
+            TRUST_THRESHOLD = 2
+
+        decorated = TrustingValidator.decorate(func)
+        trust_state = decorated.__validator__.trust_state
+        self.assertEqual({'arg', 'return'}, set(trust_state))
+
+        for _ in range(3):
+            decorated([], 1)
+        self.assertIs(list, trust_state['arg'].trusted_type)
+        self.assertIs(type(None), trust_state['return'].trusted_type)
+
+        self.assertIsNone(decorated((), 1))
+        self.assertRaises(TypesafetyError, decorated, 1, 1)
+        self.assertRaises(TypesafetyError, decorated, [], 2)
+        self.assertEqual(2, trust_state['arg'].fallbacks)
+
+    def test_adaptive_trust_with_parameter_shadowing_type(self):
+        class TrustingValidator(Validator):
+            TRUST_THRESHOLD = 2
+
+        @TrustingValidator.decorate
+        def func(name: str, type: str) -> str:  # pylint: disable=redefined-builtin
+            return name + type
+
+        for _ in range(3):
+            self.assertEqual('ab', func('a', 'b'))
+        self.assertRaises(TypesafetyError, func, 'a', 1)
+
+    def test_violations_record_the_caller(self):
+        @Validator.decorate
+        def func(first, number: int) -> str:
+            return number
+
+        line = inspect.currentframe().f_lineno + 3
+        for args in [(1, 'a'), (1, 2), (1,)]:
+            with self.assertRaises(TypesafetyError) as context:
+                func(*args)
+            self.assertEqual(
+                ((__file__, line, 'test_violations_record_the_caller'),),
+                context.exception.call_stack
+            )
+
+    def test_call_stack_depth(self):
+        def func(number: int):
+            return number
+
+        class DeepValidator(Validator):
+            CALL_STACK_DEPTH = 2
+
+        class QuietValidator(Validator):
+            CALL_STACK_DEPTH = 0
+
+        with self.assertRaises(TypesafetyError) as context:
+            DeepValidator.decorate(func)('a')
+        self.assertEqual(2, len(context.exception.call_stack))
+        self.assertEqual('test_call_stack_depth', context.exception.call_stack[0][2])
+
+        with self.assertRaises(TypesafetyError) as context:
+            QuietValidator.decorate(func)('a')
+        self.assertEqual((), context.exception.call_stack)
+
+
+class LaterDefinedClass(object):
+    pass
@@ -0,0 +1,58 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+import importlib
+import sys
+import unittest
+import unittest.mock
+
+from typesafety.autodecorator import decorate_module
+from typesafety.validator import Validator, TypesafetyError
+from typesafety.warmup import warmup
+
+PACKAGE = 'typesafety.tests.mockpackage'
+
+
+class TestWarmup(unittest.TestCase):
+    def setUp(self):
+        for name in (PACKAGE, PACKAGE + '.shapes'):
+            sys.modules.pop(name, None)
+            self.addCleanup(sys.modules.pop, name, None)
+            decorate_module(
+                importlib.import_module(name),
+                decorator=Validator.decorate,
+                method_decorator=Validator.decorate
+            )
+
+    def test_validators_are_prepared(self):
+        with unittest.mock.patch.object(Validator, 'prepare', autospec=True) as prepare:
+            self.assertEqual(4, warmup([PACKAGE], freeze=False))
+
+        self.assertEqual(
+            {'identity', '__init__', 'area', 'unit'},
+            {call[0][0].function.__name__ for call in prepare.call_args_list}
+        )
+
+    def test_prepared_functions_are_checked(self):
+        warmup([PACKAGE], freeze=False)
+        package = sys.modules[PACKAGE]
+        self.assertEqual(1, package.identity(1))
+        self.assertRaises(TypesafetyError, package.identity, 'a')
+        self.assertEqual(1, package.shapes.Square.unit().area)
+
+    def test_missing_packages_are_skipped(self):
+        with self.assertWarns(RuntimeWarning):
+            self.assertEqual(0, warmup([PACKAGE + '.missing'], freeze=False))
@@ -28,6 +28,7 @@ tool for this.
 # There is no good, idiomatic way to determine if an annotation is a union or not,
 # so we're saddled with this hacky solution.
 # pylint: disable=unidiomatic-typecheck,protected-access
+import collections.abc
 import typing
 
 
@@ -52,3 +53,135 @@ def get_union_args(cls):
         res = cls.__union_params__
 
     return res if res is not None else ()
+
+
+def is_literal_type(cls):
+    literal = getattr(typing, 'Literal', None)
+    if literal is None:
+        return False
+
+    return typing.get_origin(cls) is literal
+
+
+def get_literal_args(cls):
+    if not is_literal_type(cls):
+        raise TypeError('expected literal type')
+
+    return cls.__args__
+
+
+def is_protocol_type(cls):
+    protocol = getattr(typing, 'Protocol', None)
+    if protocol is None or not isinstance(cls, type) or cls is protocol:
+        return False
+
+    # Concrete subclasses of a protocol inherit the flag as False
+    return bool(cls.__dict__.get('_is_protocol', False))
+
+
+def get_protocol_members(cls):
+    if not is_protocol_type(cls):
+        raise TypeError('expected protocol type')
+
+    if hasattr(cls, '__protocol_attrs__'):
+        return frozenset(cls.__protocol_attrs__)
+
+    return frozenset(typing._get_protocol_attrs(cls))
+
+
+def is_callable_type(cls):
+    return typing.get_origin(cls) is collections.abc.Callable
+
+
+def get_callable_args(cls):
+    '''
+    Return the parameter list (or Ellipsis if any arguments are accepted)
+    and the return annotation of a callable type.
+    '''
+
+    if not is_callable_type(cls):
+        raise TypeError('expected callable type')
+
+    args = typing.get_args(cls)
+    if not args:
+        return Ellipsis, typing.Any
+
+    return args[0], args[1]
+
+
+def is_typed_dict_type(cls):
+    return isinstance(cls, type) and issubclass(cls, dict) and hasattr(cls, '__required_keys__')
+
+
+def get_typed_dict_fields(cls):
+    '''
+    Return the field annotations of a TypedDict and the set of required
+    keys. Required[] and NotRequired[] qualifiers are stripped, forward
+    references that cannot be resolved are left as they are.
+    '''
+
+    if not is_typed_dict_type(cls):
+        raise TypeError('expected TypedDict type')
+
+    try:
+        annotations = typing.get_type_hints(cls)
+
+    # Any error can happen while evaluating forward references
+    except Exception:  # pylint: disable=broad-except
+        annotations = {
+            name: __strip_qualifiers(annotation)
+            for name, annotation in cls.__annotations__.items()
+        }
+
+    return annotations, frozenset(cls.__required_keys__)
+
+
+def __strip_qualifiers(annotation):
+    qualifiers = tuple(
+        getattr(typing, name) for name in ('Required', 'NotRequired') if hasattr(typing, name)
+    )
+    while typing.get_origin(annotation) in qualifiers and qualifiers:
+        annotation = typing.get_args(annotation)[0]
+
+    return annotation
+
+
+def has_forward_references(annotation):
+    '''
+    Return True if the annotation is a string or contains forward
+    references that need to be evaluated before it can be used.
+    '''
+
+    if isinstance(annotation, (str, typing.ForwardRef)):
+        return True
+
+    if isinstance(annotation, tuple):
+        return any(has_forward_references(entry) for entry in annotation)
+
+    # Literal values can be strings, they are not forward references
+    if isinstance(annotation, type) or is_literal_type(annotation):
+        return False
+
+    args = getattr(annotation, '__args__', None)
+    return isinstance(args, tuple) and any(has_forward_references(arg) for arg in args)
+
+
+def resolve_annotation(annotation, globalns):
+    '''
+    Evaluate a string annotation and the forward references it contains in
+    the `globalns` namespace. Raises whatever the evaluation raises.
+    '''
+
+    if isinstance(annotation, str):
+        annotation = eval(annotation, globalns)  # pylint: disable=eval-used
+
+    if isinstance(annotation, typing.ForwardRef):
+        annotation = eval(annotation.__forward_arg__, globalns)  # pylint: disable=eval-used
+
+    if isinstance(annotation, tuple):
+        return tuple(resolve_annotation(entry, globalns) for entry in annotation)
+
+    if hasattr(typing, '_eval_type'):
+        annotation = typing._eval_type(annotation, globalns, None)
+
+    return annotation
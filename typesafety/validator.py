@@ -17,9 +17,31 @@
 
 import functools
 import inspect
+import sys
+import threading
+import typing
 import warnings
-
-from typesafety.typing_inspect import is_union_type, get_union_args
+import weakref
+
+from typesafety.checker import (
+    TypeTrust,
+    compile_annotation,
+    format_annotation,
+    get_instance_check_classes,
+    is_type_determined,
+)
+from typesafety.callstack import CALLER_PACKAGES, get_call_stack, get_caller_package, get_package
+from typesafety.context import BOUNDARY, FULL, OFF, get_mode
+from typesafety.plancache import CODE_CACHE
+from typesafety.typing_inspect import (
+    is_union_type,
+    get_union_args,
+    is_literal_type,
+    is_callable_type,
+    get_callable_args,
+    has_forward_references,
+    resolve_annotation,
+)
 
 
 class TypesafetyError(Exception):
@@ -28,10 +50,17 @@ class TypesafetyError(Exception):
     with the builtin TypeError so one does not accidentally write an
     assertion in a unit test on a Typesafety error when intending to
     assert on a TypeError raised by actual production code.
+
+    The `call_stack` of the errors raised by checked calls holds the
+    `(filename, line, function name)` of the callers, innermost first, see
+    :attr:`Validator.CALL_STACK_DEPTH`.
     '''
 
+    call_stack = ()
 
-class Validator(object):
+
+# Keeps the parameters, checkers and generated code of the checked function together.
+class Validator(object):  # pylint: disable=too-many-instance-attributes
     '''
     A Validator is a class that can check the function argument
     and return value types as specified in the function annotations.
@@ -41,18 +70,60 @@ class Validator(object):
     The given function and it's annotations will be checked if they
     conform to the following rules:
 
-    * The annotation is a class (subclass of `type`),
-    * the annotation is a callable object (`callable` returns true on it) or
+    * The annotation is a class (subclass of `type`; `typing.TypedDict`
+      classes are checked key by key),
+    * the annotation is a callable object (`callable` returns true on it),
+    * the annotation is a `typing.Literal` (values are checked by membership),
+    * the annotation is a `typing.Protocol` (checked structurally),
+    * the annotation is a `typing.Callable` (the number of positional
+      arguments is checked if the parameters are specified) or
     * is a tuple whose elements conform to the same rules.
 
     Any annotations not conforming to the above rules will be ignored
     as they might belong to a different purpose.
+
+    String annotations (including the ones created by ``from __future__
+    import annotations``) and forward references are evaluated in the
+    namespace of the function when it is first called, so they may refer
+    to names defined after the function or imported circularly.
+
+    If `CHECK_CALLBACK_RETURN_VALUE` is set, arguments annotated with
+    `typing.Callable[..., R]` are wrapped before the call, so the return
+    value of the callback is checked against `R` whenever it is invoked.
+
+    If `TRUST_THRESHOLD` is set to a number, the generated wrappers check
+    arguments and return values whose annotation is a plain class (or a
+    union of them) adaptively: once that many consecutive values of the
+    same concrete type have passed, values of that type are only compared
+    by identity, see :class:`typesafety.checker.TypeTrust`. The state of
+    the adaptive checks is available in :attr:`trust_state`.
+
+    The errors raised record the callers of the failed call in their
+    `call_stack`, at most `CALL_STACK_DEPTH` frames. The frames are only
+    looked at when a check fails, so passing calls cost nothing extra.
+    Set it to 0 to record nothing.
     '''
 
+    CHECK_CALLBACK_RETURN_VALUE = False
+    TRUST_THRESHOLD = None
+    CALL_STACK_DEPTH = 1
+
+    __GENERATED_PREFIX = '_typesafety_'
+    __missing = object()
+
+    # Evaluated string annotations keyed on the module, then on the string
+    __resolved_by_module = weakref.WeakKeyDictionary()
+
+    # Serializes the one-time resolution of string annotations. Reentrant,
+    # since evaluating an annotation may call other decorated functions.
+    __resolve_lock = threading.RLock()
+
     ARG_TYPE_ERROR_MESSAGE = "Argument {0} of function {1!r} is invalid " + \
                              "(expected: {2}; got: {3})"
     RET_TYPE_ERROR_MESSAGE = "Return value of function {0!r} is invalid " + \
                              "(expected: {1}; got: {2})"
+    CALLBACK_RET_TYPE_ERROR_MESSAGE = "Return value of callback {0} passed to function {1!r} " + \
+                                      "is invalid (expected: {2}; got: {3})"
 
     @classmethod
     def get_function_validator(cls, function):
@@ -72,12 +143,36 @@ class Validator(object):
         return cls.get_function_validator(function) is not None
 
     @classmethod
-    def decorate(cls, function):
+    def forget_module(cls, module):
+        '''
+        Forget the string annotations evaluated in `module`, which is
+        reloaded, so they are evaluated again with its new contents.
+        '''
+
+        with cls.__resolve_lock:
+            cls.__resolved_by_module.pop(module, None)
+
+    @classmethod
+    def decorate(cls, function, *, receiver=False, boundary_only=False, enabled=True, caller_depth=1):
         '''
         Decorate a function so the function call is checked whenever
         a call is made. The calls that do not need any checks are skipped.
 
-        The `function` argument is the function to be decorated.
+        The `function` argument is the function to be decorated. If
+        `receiver` is True, the function is a method and its first
+        parameter (`self` or `cls`) is never checked. For a method taking
+        only `*args`, the first of the variable arguments is the receiver.
+
+        If `boundary_only` is True, only the calls coming from outside of
+        the top level package of the function are checked; calls made by
+        the package itself are passed through unchecked. If `enabled` is
+        False, calls are not checked at all. Either can be overridden for
+        the calls made in a :func:`typesafety.context.checking` scope.
+
+        The `caller_depth` is the number of frames between the wrapper and
+        the caller it checks the package of; it is 2 when the wrapper is
+        called by the trampoline of a patched function, which
+        :func:`typesafety.patching.patch_function` passes itself.
 
         The return value will be either
 
@@ -89,20 +184,104 @@ class Validator(object):
         if cls.is_function_validated(function) or should_skip:
             return function
 
-        validator = cls(function)
+        validator = cls(function, receiver=receiver)
+        package = get_package(function)
+        default_mode = cls.__get_default_mode(boundary_only=boundary_only, enabled=enabled)
 
-        if not validator.need_validate_arguments and \
+        if validator.__pending_annotations:
+            __wrapper = cls.__make_lazy_wrapper(
+                validator,
+                default_mode=default_mode,
+                package=package,
+                caller_depth=caller_depth
+            )
+
+        elif not validator.need_validate_arguments and \
                 not validator.need_validate_return_value:
             return function
 
-        @functools.wraps(function)
-        def __wrapper(*args, **kwargs):
-            return validator(*args, **kwargs)
+        else:
+            __wrapper = validator.__compile_wrapper(
+                default_mode=default_mode,
+                package=package,
+                caller_depth=caller_depth
+            )
+            if __wrapper is None:
+                def __wrapper(*args, **kwargs):
+                    mode = get_mode(default_mode)
+                    if mode is not FULL and \
+                            (mode is OFF or get_caller_package(cls.__get_frame(caller_depth)) == package):
+                        return function(*args, **kwargs)
 
+                    return validator(*args, **kwargs)
+
+        __wrapper = functools.wraps(function)(__wrapper)
         __wrapper.__validator__ = validator
 
         return __wrapper
 
+    @staticmethod
+    def __get_default_mode(*, boundary_only, enabled):
+        if not enabled:
+            return OFF
+
+        return BOUNDARY if boundary_only else FULL
+
+    @staticmethod
+    def __get_frame(depth):
+        # The frame `depth` levels above the caller of this helper
+        return sys._getframe(depth + 1)  # pylint: disable=protected-access
+
+    @classmethod
+    def decorate_property(cls, prop, *, enabled=True):
+        '''
+        Decorate the accessors of a property. Getters only have their
+        return value checked and setters only the assigned value, by
+        accessors generated for exactly that, so a property read costs a
+        single extra call.
+
+        If `enabled` is False, the accessors are only checked in
+        :func:`typesafety.context.checking` scopes. Accessors are checked
+        in the boundary only mode as well.
+
+        The return value is either `prop` itself, if there is nothing to
+        validate, or a new property with the checked accessors.
+        '''
+
+        default_mode = cls.__get_default_mode(boundary_only=False, enabled=enabled)
+        fget = cls.__decorate_accessor(prop.fget, cls.__compile_getter, default_mode=default_mode)
+        fset = cls.__decorate_accessor(prop.fset, cls.__compile_setter, default_mode=default_mode)
+        if fget is prop.fget and fset is prop.fset:
+            return prop
+
+        return property(fget=fget, fset=fset, fdel=prop.fdel, doc=prop.__doc__)
+
+    @classmethod
+    def __decorate_accessor(cls, function, compiler, *, default_mode):
+        should_skip = getattr(function, 'typesafety_skip', False)
+        if function is None or should_skip or cls.is_function_validated(function) or \
+                not inspect.isfunction(function):
+            return function
+
+        enabled = default_mode is not OFF
+        validator = cls(function, receiver=True)
+        if validator.__pending_annotations:
+            return cls.decorate(function, receiver=True, enabled=enabled)
+
+        accessor = compiler(validator, default_mode=default_mode)
+        if accessor is None:
+            return cls.decorate(function, receiver=True, enabled=enabled)
+
+        if accessor is function:
+            return function
+
+        accessor.__name__ = function.__name__
+        accessor.__qualname__ = function.__qualname__
+        accessor.__doc__ = function.__doc__
+        accessor.__wrapped__ = function
+        accessor.__validator__ = validator
+        return accessor
+
     @classmethod
     def undecorate(cls, function):
         '''
@@ -117,16 +296,135 @@ class Validator(object):
 
         return function
 
-    def __init__(self, function):
+    def __init__(self, function, *, receiver=False):
         self.__function = function
-        self.__spec = inspect.getfullargspec(function)
+        self.__signature = inspect.signature(function, follow_wrapped=False)
+        self.__receiver = None
+        self.__positional_names = ()
+        self.__keyword_names = frozenset()
+        self.__var_positional = None
+        self.__var_positional_skip = 0
+        self.__var_keyword = None
+        self.__argument_plan = ()
+        self.__var_positional_checker = None
+        self.__var_keyword_checker = None
         self.__argument_annotation = {}
+        self.__argument_checkers = {}
         self.__return_annotation = None
+        self.__return_checker = None
+        self.__callback_return_checkers = {}
+        self.__trust = {}
         self.__defaults = {}
+        self.__annotations = {}
+        self.__resolved_call = None
+
+        self.__process_parameters(receiver=receiver)
+
+        self.__pending_annotations = any(
+            has_forward_references(value) for value in self.__annotations.values()
+        )
+        self.__lazy = self.__pending_annotations
+        if not self.__pending_annotations:
+            self.__process_annotations()
 
+    def __process_annotations(self):
         self.__process_type_annotations()
         self.__process_return_value_annotation()
-        self.__process_default_values()
+        self.__build_argument_plan()
+
+    def __ensure_resolved(self):
+        if self.__pending_annotations:
+            with self.__resolve_lock:
+                # Another thread may have resolved them in the meantime
+                if self.__pending_annotations:
+                    self.__resolve_annotations()
+
+    def __resolve_annotations(self):
+        globalns = getattr(self.__function, '__globals__', {})
+        module = sys.modules.get(getattr(self.__function, '__module__', None))
+        if module is not None and vars(module) is globalns:
+            cache = self.__resolved_by_module.setdefault(module, {})
+
+        else:
+            cache = {}
+
+        annotations = {}
+        for name, value in self.__annotations.items():
+            if not has_forward_references(value):
+                annotations[name] = value
+                continue
+
+            try:
+                if isinstance(value, str) and value in cache:
+                    annotations[name] = cache[value]
+                    continue
+
+                resolved = resolve_annotation(value, globalns)
+
+            # Annotations that cannot be evaluated are ignored, the same
+            # way as other invalid annotations are.
+            except Exception:  # pylint: disable=broad-except
+                continue
+
+            if isinstance(value, str):
+                cache[value] = resolved
+
+            annotations[name] = resolved
+
+        self.__annotations = annotations
+        self.__process_annotations()
+        self.__pending_annotations = False
+
+    def __resolve_call(self):
+        with self.__resolve_lock:
+            if self.__resolved_call is not None:
+                return self.__resolved_call
+
+            self.__ensure_resolved()
+            if not self.need_validate_arguments and not self.need_validate_return_value:
+                call = self.__function
+
+            else:
+                call = self.__compile_wrapper() or self
+
+            self.__resolved_call = call
+            return call
+
+    def __make_lazy_wrapper(self, *, default_mode, package, caller_depth):
+        # The wrapper to use is only known once the first call resolved the annotations
+        function = self.__function
+
+        def __wrapper(*args, **kwargs):
+            mode = get_mode(default_mode)
+            if mode is not FULL and \
+                    (mode is OFF or get_caller_package(self.__get_frame(caller_depth)) == package):
+                return function(*args, **kwargs)
+
+            call = self.__resolved_call
+            if call is None:
+                call = self.__resolve_call()
+
+            return call(*args, **kwargs)
+
+        return __wrapper
+
+    def prepare(self):
+        '''
+        Resolve the string annotations and build the checks now instead of
+        on the first call of the decorated function.
+        '''
+
+        if self.__lazy and self.__resolved_call is None:
+            self.__resolve_call()
+
+    @property
+    def pending_annotations(self):
+        '''
+        True if the string annotations of the function are only resolved on
+        the first call or by :meth:`prepare`.
+        '''
+
+        return self.__pending_annotations
 
     @property
     def need_validate_arguments(self):
@@ -134,6 +432,7 @@ class Validator(object):
         True if any of the function arguments need to be checked.
         '''
 
+        self.__ensure_resolved()
         return bool(self.__argument_annotation)
 
     @property
@@ -142,8 +441,19 @@ class Validator(object):
         True if the return value of the function needs to be be checked.
         '''
 
+        self.__ensure_resolved()
         return self.__return_annotation is not None
 
+    @property
+    def trust_state(self):
+        '''
+        The adaptive checks of the generated wrapper keyed on the parameter
+        name (or `'return'` for the return value). Empty unless
+        `TRUST_THRESHOLD` is set.
+        '''
+
+        return dict(self.__trust)
+
     @property
     def function(self):
         '''
@@ -161,31 +471,54 @@ class Validator(object):
         the function. An example call would be like:
         '''
 
-        for key, value, validator in self.__map_arguments(locals_dict):
-            if not self.__is_valid(value, validator):
-                key_name = repr(key)
-                func_name = self.__function.__name__
-                annotation = self.__argument_annotation.get(key)
-                message = self.ARG_TYPE_ERROR_MESSAGE.format(
-                    key_name,
-                    func_name,
-                    self.__format_expectation(annotation),
-                    value.__class__.__name__)
-                raise TypesafetyError(message)
+        self.__ensure_resolved()
+        for name, checker in self.__argument_checkers.items():
+            if name not in locals_dict:
+                if name in (self.__var_positional, self.__var_keyword):
+                    continue
 
-    def __format_expectation(self, annotation):
-        if is_union_type(annotation):
-            return 'typing.Union[{}]'.format(', '.join(entry.__name__ for entry in get_union_args(annotation)))
+                raise self.__missing_argument_error(name)
 
-        if isinstance(annotation, tuple):
-            return "({})".format(
-                ", ".join(self.__format_expectation(a) for a in annotation)
-            )
+            value = locals_dict[name]
+            if name == self.__var_positional:
+                values = value[self.__var_positional_skip:]
+
+            elif name == self.__var_keyword:
+                values = value.values()
+
+            else:
+                values = (value,)
+
+            for entry in values:
+                if not checker(entry):
+                    raise self.__argument_error(name, entry)
+
+    def __missing_argument_error(self, name):
+        return self.__with_call_stack(TypesafetyError('Missing required argument {!r}'.format(name)))
+
+    def __argument_error(self, key, value):
+        message = self.ARG_TYPE_ERROR_MESSAGE.format(
+            repr(key),
+            self.__function.__name__,
+            format_annotation(self.__argument_annotation.get(key)),
+            value.__class__.__name__)
+        return self.__with_call_stack(TypesafetyError(message))
 
-        if annotation is None:
-            return "None"
+    def __return_value_error(self, retval):
+        message = self.RET_TYPE_ERROR_MESSAGE.format(
+            self.__function.__name__,
+            format_annotation(self.__return_annotation),
+            retval.__class__.__name__
+        )
+        return self.__with_call_stack(TypesafetyError(message))
 
-        return getattr(annotation, '__name__', str(annotation))
+    def __with_call_stack(self, error):
+        # Only called on the failure path, the frames of the checks are
+        # skipped by get_call_stack
+        if self.CALL_STACK_DEPTH:
+            error.call_stack = get_call_stack(self.__get_frame(1), self.CALL_STACK_DEPTH)
+
+        return error
 
     def validate_return_value(self, retval):
         '''
@@ -195,25 +528,23 @@ class Validator(object):
         The `retval` should contain the return value of the function call.
         '''
 
-        if self.__return_annotation is None:
+        self.__ensure_resolved()
+        if self.__return_checker is None:
             return
 
-        if not self.__is_valid(retval, self.__return_annotation):
-            func_name = self.__function.__name__
-            msg = self.RET_TYPE_ERROR_MESSAGE.format(
-                func_name,
-                self.__format_expectation(self.__return_annotation),
-                retval.__class__.__name__
-            )
-            raise TypesafetyError(msg)
+        if not self.__return_checker(retval):
+            raise self.__return_value_error(retval)
 
     def __call__(self, *args, **kwargs):
         '''
         Proxy function to the function call including the validations.
         '''
 
-        locals_dict = self.__collect_argument_dictionary(args, kwargs)
-        self.validate_arguments(locals_dict)
+        self.__ensure_resolved()
+        self.__check_arguments(args, kwargs)
+
+        if self.__callback_return_checkers:
+            args = self.__wrap_callbacks(args, kwargs)
 
         # The function property is callable, but pylint sees it as a
         # simple property object.
@@ -222,79 +553,393 @@ class Validator(object):
         self.validate_return_value(return_value)
         return return_value
 
+    def __check_arguments(self, args, kwargs):
+        # Walks the precomputed plan of the annotated parameters, looking
+        # each argument up directly in `args` or `kwargs`
+        count = len(args)
+        missing = self.__missing
+        for name, index, by_keyword, checker, default in self.__argument_plan:
+            if index is not None and index < count:
+                value = args[index]
+
+            else:
+                value = kwargs.get(name, missing) if by_keyword else missing
+                if value is missing:
+                    value = default
+                    if value is missing:
+                        raise self.__missing_argument_error(name)
+
+            if not checker(value):
+                raise self.__argument_error(name, value)
+
+        checker = self.__var_positional_checker
+        if checker is not None:
+            for value in args[len(self.__positional_names) + self.__var_positional_skip:]:
+                if not checker(value):
+                    raise self.__argument_error(self.__var_positional, value)
+
+        checker = self.__var_keyword_checker
+        if checker is not None:
+            for name, value in kwargs.items():
+                if name not in self.__keyword_names and not checker(value):
+                    raise self.__argument_error(self.__var_keyword, value)
+
+    def __compile_wrapper(self, *, default_mode=None, package=None, caller_depth=1):
+        '''
+        Generate a wrapper with the same positional parameters as the
+        function, so arguments are checked in order without collecting
+        them into a dictionary first. Returns None if the signature is not
+        a plain list of positional parameters.
+
+        If `default_mode` is given, the checks depend on the current
+        checking mode, and in the boundary mode the calls made from
+        `package` are not checked. Otherwise every call is checked.
+        '''
+
+        names = self.__positional_names
+        kinds = set(parameter.kind for parameter in self.__signature.parameters.values())
+        if not inspect.isfunction(self.__function) or \
+                kinds - {inspect.Parameter.POSITIONAL_OR_KEYWORD} or \
+                self.__callback_return_checkers or \
+                any(name.startswith(self.__GENERATED_PREFIX) for name in names):
+            return None
+
+        namespace = {
+            '_typesafety_function': self.__function,
+            '_typesafety_missing': self.__missing,
+            '_typesafety_call_with_missing': self.__call_with_missing_arguments,
+            '_typesafety_argument_error': self.__argument_error,
+            '_typesafety_return_error': self.__return_value_error,
+        }
+        parameters = []
+        checks = []
+        for name in names:
+            if name in self.__defaults:
+                namespace['_typesafety_default_' + name] = self.__defaults[name]
+                parameters.append('{0}=_typesafety_default_{0}'.format(name))
+
+            elif name == self.__receiver:
+                # The receiver is always bound, it cannot be missing
+                parameters.append(name)
+
+            else:
+                # Missing arguments are reported the same way as by __call__
+                parameters.append('{}=_typesafety_missing'.format(name))
+                checks.append(
+                    '    if {0} is _typesafety_missing:\n'
+                    '        return _typesafety_call_with_missing({{{1}}})\n'.format(
+                        name,
+                        ', '.join('{0!r}: {0}'.format(arg) for arg in names)
+                    )
+                )
+
+        call = '_typesafety_function({})'.format(', '.join(names))
+        if default_mode is not None:
+            namespace.update(
+                _typesafety_package=package,
+                _typesafety_caller_packages=CALLER_PACKAGES,
+                _typesafety_get_caller_package=get_caller_package,
+                _typesafety_getframe=sys._getframe,  # pylint: disable=protected-access
+            )
+            checks.append(
+                self.__generate_mode_check(namespace, default_mode, call) +
+                '    if _typesafety_mode is _typesafety_boundary:\n'
+                '        _typesafety_caller = _typesafety_caller_packages.get(\n'
+                '            _typesafety_getframe({0}).f_globals.get(\'__name__\'))\n'
+                '        if _typesafety_caller is None:\n'
+                '            _typesafety_caller = _typesafety_get_caller_package(_typesafety_getframe({0}))\n'
+                '        if _typesafety_caller == _typesafety_package:\n'
+                '            return {1}\n'.format(caller_depth, call)
+            )
+
+        for name in names:
+            if name in self.__argument_checkers:
+                condition = self.__generate_check(
+                    namespace,
+                    name,
+                    self.__argument_annotation[name],
+                    self.__argument_checkers[name],
+                    trust_key=name
+                )
+                checks.append(
+                    '    if not {condition}:\n'
+                    '        raise _typesafety_argument_error({name!r}, {name})\n'.format(
+                        condition=condition,
+                        name=name
+                    )
+                )
+
+        if self.__return_checker is None:
+            body = '    return {}\n'.format(call)
+
+        else:
+            condition = self.__generate_check(
+                namespace,
+                '_typesafety_return_value',
+                self.__return_annotation,
+                self.__return_checker,
+                trust_key='return'
+            )
+            body = (
+                '    _typesafety_return_value = {}\n'
+                '    if not {}:\n'
+                '        raise _typesafety_return_error(_typesafety_return_value)\n'
+                '    return _typesafety_return_value\n'
+            ).format(call, condition)
+
+        source = 'def __wrapper({}):\n{}{}'.format(', '.join(parameters), ''.join(checks), body)
+        return self.__exec_generated(source, namespace, '__wrapper')
+
+    def __compile_getter(self, *, default_mode):
+        # Returns None if the function is not a plain getter
+        if self.__positional_names != (self.__receiver,) or \
+                len(self.__signature.parameters) != 1:
+            return None
+
+        if self.__return_checker is None:
+            return self.__function
+
+        namespace = {
+            '_typesafety_function': self.__function,
+            '_typesafety_return_error': self.__return_value_error,
+        }
+        condition = self.__generate_check(
+            namespace,
+            '_typesafety_return_value',
+            self.__return_annotation,
+            self.__return_checker,
+            trust_key='return'
+        )
+        source = (
+            'def __getter(_typesafety_instance):\n'
+            '{}'
+            '    _typesafety_return_value = _typesafety_function(_typesafety_instance)\n'
+            '    if not {}:\n'
+            '        raise _typesafety_return_error(_typesafety_return_value)\n'
+            '    return _typesafety_return_value\n'
+        ).format(
+            self.__generate_mode_check(namespace, default_mode, '_typesafety_function(_typesafety_instance)'),
+            condition
+        )
+        return self.__exec_generated(source, namespace, '__getter')
+
+    def __compile_setter(self, *, default_mode):
+        # Returns None if the function is not a plain setter. The return
+        # value of setters is discarded by the property, so it is not
+        # checked.
+        if len(self.__positional_names) != 2 or \
+                self.__positional_names[0] != self.__receiver or \
+                len(self.__signature.parameters) != 2:
+            return None
+
+        name = self.__positional_names[1]
+        if name not in self.__argument_checkers:
+            return self.__function
+
+        namespace = {
+            '_typesafety_function': self.__function,
+            '_typesafety_argument_error': self.__argument_error,
+        }
+        condition = self.__generate_check(
+            namespace,
+            '_typesafety_value',
+            self.__argument_annotation[name],
+            self.__argument_checkers[name],
+            trust_key=name
+        )
+        call = '_typesafety_function(_typesafety_instance, _typesafety_value)'
+        source = (
+            'def __setter(_typesafety_instance, _typesafety_value):\n'
+            '{}'
+            '    if not {}:\n'
+            '        raise _typesafety_argument_error({!r}, _typesafety_value)\n'
+            '    {}\n'
+        ).format(self.__generate_mode_check(namespace, default_mode, call), condition, name, call)
+        return self.__exec_generated(source, namespace, '__setter')
+
+    @staticmethod
+    def __exec_generated(source, namespace, name):
+        # Functions of the same shape share the compiled code
+        code = CODE_CACHE.compile(source, '<typesafety wrapper>')
+        exec(code, namespace)  # pylint: disable=exec-used
+        return namespace[name]
+
+    @staticmethod
+    def __generate_mode_check(namespace, default_mode, call):
+        # Reads the checking mode of the current context into
+        # _typesafety_mode and returns the result of `call` unchecked if
+        # checking is turned off
+        namespace.update(
+            _typesafety_get_mode=get_mode,
+            _typesafety_default_mode=default_mode,
+            _typesafety_boundary=BOUNDARY,
+            _typesafety_off=OFF,
+        )
+        return (
+            '    _typesafety_mode = _typesafety_get_mode(_typesafety_default_mode)\n'
+            '    if _typesafety_mode is _typesafety_off:\n'
+            '        return {}\n'
+        ).format(call)
+
+    def __generate_check(self, namespace, expression, annotation, checker, *, trust_key):
+        symbol = '_typesafety_check_' + trust_key
+
+        # Type determined checks can be replaced by an identity test once
+        # the type of the values has proven stable
+        if self.TRUST_THRESHOLD is not None and is_type_determined(annotation):
+            trust = TypeTrust(checker, self.TRUST_THRESHOLD)
+            self.__trust[trust_key] = trust
+            namespace[symbol] = trust
+            namespace['_typesafety_type'] = type
+            return '(_typesafety_type({0}) is {1}.trusted_type or {1}({0}))'.format(expression, symbol)
+
+        # Plain class checks are inlined as an isinstance() call, saving
+        # the call of the checker function
+        classes = get_instance_check_classes(annotation)
+        if classes is not None:
+            namespace[symbol] = classes
+            namespace['_typesafety_isinstance'] = isinstance
+            return '_typesafety_isinstance({}, {})'.format(expression, symbol)
+
+        namespace[symbol] = checker
+        return '{}({})'.format(symbol, expression)
+
+    def __call_with_missing_arguments(self, arguments):
+        kwargs = {name: value for name, value in arguments.items() if value is not self.__missing}
+        return self(**kwargs)
+
     def __process_type_annotations(self):
-        for name, value in self.__spec.annotations.items():
+        for name, value in self.__annotations.items():
             if name == 'return' or \
                     not self.__is_valid_typecheck_annotation(value):
                 continue
 
             self.__argument_annotation[name] = value
+            self.__argument_checkers[name] = compile_annotation(value)
 
-    def __process_return_value_annotation(self):
-        if 'return' in self.__spec.annotations:
-            return_annotation = self.__spec.annotations['return']
-            if self.__is_valid_typecheck_annotation(return_annotation):
-                self.__return_annotation = return_annotation
+            if self.CHECK_CALLBACK_RETURN_VALUE and is_callable_type(value):
+                self.__process_callback_return_annotation(name, value)
 
-    def __process_default_values(self):
-        if self.__spec.defaults is not None:
-            args_with_defaults = self.__spec.args[-len(self.__spec.defaults):]
-            for index, name in enumerate(args_with_defaults):
-                self.__defaults[name] = self.__spec.defaults[index]
+    def __process_callback_return_annotation(self, name, annotation):
+        _, return_annotation = get_callable_args(annotation)
+        if return_annotation is typing.Any or \
+                not self.__is_valid_typecheck_annotation(return_annotation):
+            return
 
-        if self.__spec.kwonlydefaults is not None:
-            for name in self.__spec.kwonlyargs:
-                if name in self.__spec.kwonlydefaults:
-                    self.__defaults[name] = self.__spec.kwonlydefaults[name]
+        self.__callback_return_checkers[name] = (
+            return_annotation,
+            compile_annotation(return_annotation)
+        )
 
-    def __collect_argument_dictionary(self, args, kwargs):
-        locals_dict = dict(self.__defaults)
+    def __wrap_callbacks(self, args, kwargs):
+        # Replaces the callback arguments in place in `kwargs`, returns
+        # the new positional argument tuple
+        args = list(args)
+        for name, (annotation, checker) in self.__callback_return_checkers.items():
+            if name in kwargs:
+                kwargs[name] = self.__wrap_callback(name, kwargs[name], annotation, checker)
 
-        for index, value in enumerate(args):
-            if index < len(self.__spec.args):
-                locals_dict[self.__spec.args[index]] = value
+            elif name in self.__positional_names:
+                index = self.__positional_names.index(name)
+                if index < len(args):
+                    args[index] = self.__wrap_callback(name, args[index], annotation, checker)
 
-        for name, value in kwargs.items():
-            locals_dict[name] = value
+        return tuple(args)
 
-        return locals_dict
+    def __wrap_callback(self, name, callback, annotation, checker):
+        func_name = self.__function.__name__
+        message = self.CALLBACK_RET_TYPE_ERROR_MESSAGE
 
-    def __map_arguments(self, locals_dict):
-        for name in self.__spec.args + self.__spec.kwonlyargs:
-            if name not in self.__argument_annotation:
-                continue
+        @functools.wraps(callback)
+        def __wrapper(*args, **kwargs):
+            return_value = callback(*args, **kwargs)
+            if not checker(return_value):
+                raise self.__with_call_stack(TypesafetyError(message.format(
+                    repr(name),
+                    func_name,
+                    format_annotation(annotation),
+                    return_value.__class__.__name__
+                )))
 
-            if name not in locals_dict:
-                msg = 'Missing required argument {!r}'.format(name)
-                raise TypesafetyError(msg)
+            return return_value
 
-            annotation = self.__argument_annotation[name]
-            yield name, locals_dict[name], annotation
+        return __wrapper
 
-    def __is_valid(self, value, validator):
-        if isinstance(validator, tuple):
-            return any(
-                self.__is_valid(value, subvalidator)
-                for subvalidator in validator
-            )
+    def __process_return_value_annotation(self):
+        if 'return' in self.__annotations:
+            return_annotation = self.__annotations['return']
+            if self.__is_valid_typecheck_annotation(return_annotation):
+                self.__return_annotation = return_annotation
+                self.__return_checker = compile_annotation(return_annotation)
+
+    def __process_parameters(self, *, receiver):
+        positional = []
+        keyword = []
+        parameters = list(self.__signature.parameters.values())
+        if receiver and parameters and parameters[0].kind in (
+                inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD):
+            self.__receiver = parameters[0].name
+
+        elif receiver and parameters and parameters[0].kind == inspect.Parameter.VAR_POSITIONAL:
+            # The receiver is the first of the variable arguments
+            self.__var_positional_skip = 1
+
+        for parameter in parameters:
+            if parameter.annotation is not parameter.empty and parameter.name != self.__receiver:
+                self.__annotations[parameter.name] = parameter.annotation
+
+            if parameter.default is not parameter.empty:
+                self.__defaults[parameter.name] = parameter.default
+
+            if parameter.kind == parameter.VAR_POSITIONAL:
+                self.__var_positional = parameter.name
+
+            elif parameter.kind == parameter.VAR_KEYWORD:
+                self.__var_keyword = parameter.name
+
+            else:
+                if parameter.kind != parameter.KEYWORD_ONLY:
+                    positional.append(parameter.name)
+
+                if parameter.kind != parameter.POSITIONAL_ONLY:
+                    keyword.append(parameter.name)
+
+        if self.__signature.return_annotation is not self.__signature.empty:
+            self.__annotations['return'] = self.__signature.return_annotation
+
+        self.__positional_names = tuple(positional)
+        self.__keyword_names = frozenset(keyword)
+
+    def __build_argument_plan(self):
+        # One entry for each annotated parameter in signature order:
+        # (name, positional index or None, can be passed by keyword,
+        # checker, default value or the missing marker)
+        plan = []
+        for name, parameter in self.__signature.parameters.items():
+            checker = self.__argument_checkers.get(name)
+            if checker is None:
+                continue
 
-        if is_union_type(validator):
-            return any(
-                self.__is_valid(value, subvalidator)
-                for subvalidator in get_union_args(validator)
-            )
+            if parameter.kind == parameter.VAR_POSITIONAL:
+                self.__var_positional_checker = checker
 
-        if isinstance(validator, type):
-            return isinstance(value, validator)
+            elif parameter.kind == parameter.VAR_KEYWORD:
+                self.__var_keyword_checker = checker
 
-        if hasattr(validator, '__call__'):
-            return validator(value)
+            else:
+                index = None
+                if name in self.__positional_names:
+                    index = self.__positional_names.index(name)
 
-        if validator is None:
-            return value is None
+                plan.append((
+                    name,
+                    index,
+                    name in self.__keyword_names,
+                    checker,
+                    self.__defaults.get(name, self.__missing)
+                ))
 
-        # This line will probably never be reached
-        return True
+        self.__argument_plan = tuple(plan)
 
     def __is_valid_typecheck_annotation(self, validator):
         if isinstance(validator, tuple):
@@ -313,7 +958,7 @@ class Validator(object):
                 for subvalidator in get_union_args(validator)
             )
 
-        if isinstance(validator, type):
+        if isinstance(validator, type) or is_literal_type(validator) or is_callable_type(validator):
             return True
 
         if callable(validator):
@@ -0,0 +1,115 @@
+#
+# Copyright (c) 2013-2018 Balabit
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+
+'''
+Prepare the checks of whole packages before forking worker processes.
+
+Validators resolve string annotations and build their checks on the first
+call of a function. In a preforking server that first call happens in
+every worker, after each deploy. :func:`warmup` imports the packages and
+prepares every validator in the master process instead, then moves all
+objects into the permanent generation of the garbage collector with
+`gc.freeze()`, so the collections of the workers do not write to them and
+the memory pages stay shared.
+
+Call it with the checking active, right before forking the workers.
+'''
+
+import gc
+import importlib
+import inspect
+import pkgutil
+import warnings
+
+from typesafety.validator import Validator
+
+
+def warmup(packages, *, freeze=True):
+    '''
+    Import the packages (given by name) with all their submodules, and
+    prepare the validators of the decorated functions in them. If `freeze`
+    is True, `gc.freeze()` is called at the end.
+
+    Modules that fail to import are skipped with a warning. Returns the
+    number of prepared validators.
+    '''
+
+    count = 0
+    for module in __import_packages(packages):
+        count += __prepare_namespace(vars(module), module.__name__, set())
+
+    if freeze:
+        gc.freeze()
+
+    return count
+
+
+def __import_packages(packages):
+    for name in packages:
+        package = __import(name)
+        if package is None:
+            continue
+
+        yield package
+
+        for info in pkgutil.walk_packages(getattr(package, '__path__', []), package.__name__ + '.'):
+            module = __import(info.name)
+            if module is not None:
+                yield module
+
+
+def __import(name):
+    try:
+        return importlib.import_module(name)
+
+    # Any error of the imported code is only reported, like by the
+    # decorators
+    except Exception as error:  # pylint: disable=broad-except
+        warnings.warn('Could not import {}: {}'.format(name, error), category=RuntimeWarning)
+        return None
+
+
+def __prepare_namespace(namespace, module_name, visited):
+    count = 0
+    for value in list(namespace.values()):
+        if isinstance(value, (staticmethod, classmethod)):
+            value = value.__func__
+
+        if isinstance(value, property):
+            functions = (value.fget, value.fset, value.fdel)
+
+        elif inspect.isclass(value):
+            if value.__module__ != module_name or value in visited:
+                continue
+
+            visited.add(value)
+            count += __prepare_namespace(vars(value), module_name, visited)
+            continue
+
+        else:
+            functions = (value,)
+
+        for function in functions:
+            validator = Validator.get_function_validator(function)
+            if isinstance(validator, Validator):
+                validator.prepare()
+                count += 1
+
+    return count
+
+
+__all__ = ['warmup']